@@ -1,60 +1,66 @@
 import streamlit as st
 import plotly.graph_objects as go
 import numpy as np
-
-# Configuração da página
-st.set_page_config(page_title="Simulador Constructa", layout="wide")
-
-def calculate_payments(principal, months, admin_fee, dropdowns, agio):
-    balance = principal
-    amortization = principal / months
-    payments = []
-    balances = [principal]
-    
-    for month in range(1, months + 1):
-        if month % 12 == 0 and month > 1:
-            balance *= 1.05
-            amortization = balance / (months - month + 1)
-        
-        admin_fee_value = balance * admin_fee
-        monthly_payment = amortization + admin_fee_value
-        
-        if month in dropdowns:
-            dropdown_value = dropdowns[month]
-            dropdown_impact = dropdown_value * (1 + agio/100)
-            balance -= dropdown_impact
-            amortization = balance / (months - month + 1)
-        
-        payments.append(monthly_payment)
-        balance -= amortization
-        balances.append(balance)
-        
-        if balance <= 0 or monthly_payment < 500:
-            break
-    
+from constructa.cache import memoizar
+from constructa.instrumentacao import etapa, medir
+from constructa import pagamentos
+from constructa.metricas import indicadores_cota
+from constructa.regras import PLANOS
+import painel_cenarios
+import painel_desempenho
+import painel_mercado
+from graficos import adicionar_linhas
+
+@medir("calculate_payments")
+@memoizar("analise_dados.calculate_payments")
+def calculate_payments(principal, months, admin_fee, dropdowns, agio, plano):
+    # Nesta variante a parcela do mês é calculada antes de aplicar o dropdown (PLANOS['analise_dados'])
+    payments, balances, _, _ = pagamentos.calculate_payments(principal, months, admin_fee, dropdowns, agio, plano)
     return payments, balances
 
 def main():
+    # Configuração da página
+    st.set_page_config(page_title="Simulador Constructa", layout="wide")
+    painel_desempenho.iniciar("analise_dados")
     st.title("Simulador Constructa")
 
+    # Um cenário salvo carregado substitui os valores iniciais; a versão troca as chaves dos widgets
+    carregados = st.session_state.get('parametros_carregados', {})
+    versao = st.session_state.get('versao_parametros', 0)
+
     # Sidebar
     with st.sidebar:
-        principal = st.number_input("Valor do Crédito (R$)", min_value=10000, value=1800000, step=10000)
-        months = st.number_input("Prazo (meses)", min_value=12, value=210, step=12)
-        admin_fee = st.number_input("Taxa de Administração Mensal (%)", min_value=0.1, value=0.12, step=0.01) / 100
-        agio = st.number_input("Ágio dos Dropdowns (%)", min_value=0.0, value=25.0, step=1.0)
-        tlr = st.number_input("Taxa Livre de Risco (% a.a.)", min_value=0.0, value=10.75, step=0.1) / 100
+        principal = st.number_input("Valor do Crédito (R$)", min_value=10000, value=carregados.get('principal', 1800000), step=10000, key=f"principal_{versao}")
+        months = st.number_input("Prazo (meses)", min_value=12, value=carregados.get('months', 210), step=12, key=f"months_{versao}")
+        admin_fee = st.number_input("Taxa de Administração Mensal (%)", min_value=0.1, value=carregados.get('admin_fee', 0.12), step=0.01, key=f"admin_fee_{versao}") / 100
+        agio = st.number_input("Ágio dos Dropdowns (%)", min_value=0.0, value=carregados.get('agio', 25.0), step=1.0, key=f"agio_{versao}")
+        tlr = st.number_input("Taxa Livre de Risco (% a.a.)", min_value=0.0, value=carregados.get('tlr', 10.75), step=0.1, key=f"tlr_{versao}") / 100
+
+        # Regras do cronograma: a base da taxa e o tratamento do ágio são os desta variante
+        with st.expander("Regras do Cronograma"):
+            correcao = st.number_input("Correção do Crédito (% por período)", value=carregados.get('correcao', 5.0), step=0.5, key=f"correcao_{versao}")
+            meses_correcao = st.number_input("Periodicidade da Correção (meses)", min_value=1, value=carregados.get('meses_correcao', 12), step=1, key=f"meses_correcao_{versao}")
+            parcela_minima = st.number_input("Parcela Mínima para Encerrar (R$)", min_value=0.0, value=carregados.get('parcela_minima', 500.0), step=100.0, key=f"parcela_minima_{versao}")
+        plano = dict(PLANOS['analise_dados'], correcao=1 + correcao / 100, meses_correcao=int(meses_correcao),
+                     parcela_minima=parcela_minima)
 
     # Inicialização dos dropdowns
     if 'dropdowns' not in st.session_state:
         st.session_state.dropdowns = {}
+    # Retoma o cronograma com dropdowns a partir do primeiro mês afetado pela edição
+    if 'calculadora' not in st.session_state:
+        st.session_state.calculadora = pagamentos.CalculadoraIncremental(PLANOS['analise_dados'])
+    calculadora = st.session_state.calculadora
 
     # Cálculos
-    payments_with_drops, balances_with_drops = calculate_payments(principal, months, admin_fee, st.session_state.dropdowns, agio)
-    payments_no_drops, balances_no_drops = calculate_payments(principal, months, admin_fee, {}, agio)
+    with etapa("calculadora.calcular"):
+        payments_with_drops, balances_with_drops, _, _ = calculadora.calcular(principal, months, admin_fee, st.session_state.dropdowns, agio, plano)
+    payments_no_drops, balances_no_drops = calculate_payments(principal, months, admin_fee, {}, agio, plano)
 
     # Determinar o mês do último dropdown
     last_dropdown_month = max(st.session_state.dropdowns.keys()) if st.session_state.dropdowns else months
+    # A regra de parada pode encerrar os cronogramas antes desse mês
+    last_dropdown_month = min(last_dropdown_month, len(payments_with_drops), len(payments_no_drops))
 
     # Resumo Financeiro e KPIs
     st.subheader("Resumo Financeiro e KPIs")
@@ -77,9 +83,14 @@ def main():
         p_cl = payments_with_drops[0] / principal * 100
         p_dn = payments_with_drops[0] / (principal - sum(st.session_state.dropdowns.values())) * 100 if st.session_state.dropdowns else p_cl
         cet = (sum(payments_with_drops) / principal - 1) * 100
+        # Nesta variante o ágio já reduz o saldo e não entra como receita no fluxo
+        indicadores = indicadores_cota(principal, payments_with_drops, st.session_state.dropdowns, agio, tlr,
+                                       agio_como_receita=plano['agio_como_receita'])
         st.metric("P/CL", f"{p_cl:.2f}%")
         st.metric("P/DN", f"{p_dn:.2f}%")
         st.metric("CET", f"{cet:.2f}%")
+        st.metric("CET Anual", f"{indicadores['cet_anual']*100:.2f}%")
+        st.metric("VPL à Taxa Livre de Risco", f"R$ {indicadores['vpl']:,.0f}")
 
     economia = sum(payments_no_drops[:last_dropdown_month]) - sum(payments_with_drops[:last_dropdown_month])
     st.metric("Economia até o Mês " + str(last_dropdown_month), f"R$ {economia:,.0f}", f"{economia/sum(payments_no_drops[:last_dropdown_month])*100:.2f}% de redução")
@@ -90,11 +101,11 @@ def main():
     with col1:
         dropdown_month = st.number_input("Mês do Dropdown", min_value=1, max_value=months, value=12)
     with col2:
-        dropdown_amount = st.number_input("Valor do Dropdown (R$)", min_value=0, max_value=int(balances_with_drops[dropdown_month]), value=10000, step=1000)
+        dropdown_amount = st.number_input("Valor do Dropdown (R$)", min_value=0, max_value=int(balances_with_drops[min(dropdown_month, len(balances_with_drops) - 1)]), value=10000, step=1000)
     with col3:
         if st.button("Adicionar Dropdown"):
             st.session_state.dropdowns[dropdown_month] = dropdown_amount
-            st.experimental_rerun()
+            st.rerun()
 
     # Exibir Dropdowns adicionados
     if st.session_state.dropdowns:
@@ -104,22 +115,24 @@ def main():
             col1.write(f"Mês {month}: R$ {amount:,.2f}")
             if col2.button("Remover", key=f"remove_{month}"):
                 del st.session_state.dropdowns[month]
-                st.experimental_rerun()
+                st.rerun()
 
     # Gráficos
     st.subheader("Evolução do Saldo Devedor")
-    fig_saldo = go.Figure()
-    fig_saldo.add_trace(go.Scatter(x=list(range(len(balances_no_drops))), y=balances_no_drops, mode='lines', name='Sem Dropdowns'))
-    fig_saldo.add_trace(go.Scatter(x=list(range(len(balances_with_drops))), y=balances_with_drops, mode='lines', name='Com Dropdowns'))
-    st.plotly_chart(fig_saldo, use_container_width=True)
+    fig_saldo = adicionar_linhas(go.Figure(), [
+        (np.arange(len(balances_no_drops)), balances_no_drops, dict(mode='lines', name='Sem Dropdowns')),
+        (np.arange(len(balances_with_drops)), balances_with_drops, dict(mode='lines', name='Com Dropdowns')),
+    ])
+    painel_desempenho.exibir_plotly(fig_saldo, "saldo", use_container_width=True)
 
     # Gráfico opcional de evolução das parcelas
     if st.checkbox("Mostrar Evolução das Parcelas"):
         st.subheader("Evolução das Parcelas")
-        fig_parcelas = go.Figure()
-        fig_parcelas.add_trace(go.Scatter(x=list(range(len(payments_no_drops))), y=payments_no_drops, mode='lines', name='Sem Dropdowns'))
-        fig_parcelas.add_trace(go.Scatter(x=list(range(len(payments_with_drops))), y=payments_with_drops, mode='lines', name='Com Dropdowns'))
-        st.plotly_chart(fig_parcelas, use_container_width=True)
+        fig_parcelas = adicionar_linhas(go.Figure(), [
+            (np.arange(len(payments_no_drops)), payments_no_drops, dict(mode='lines', name='Sem Dropdowns')),
+            (np.arange(len(payments_with_drops)), payments_with_drops, dict(mode='lines', name='Com Dropdowns')),
+        ])
+        painel_desempenho.exibir_plotly(fig_parcelas, "parcelas", use_container_width=True)
 
     # Análise de Arbitragem
     st.subheader("Análise de Arbitragem")
@@ -134,5 +147,28 @@ def main():
     col3.metric("Ganho na Arbitragem", f"R$ {ganho_arbitragem/1e6:.2f}M")
     col4.metric("ROI da Estratégia", f"{roi:.2f}%")
 
+    # Ágio negociado no mercado secundário de cotas contempladas
+    with st.expander("Mercado Secundário"):
+        painel_mercado.mostrar_mercado(
+            'analise_dados', agio, lambda agio_negociado: painel_cenarios.aplicar_campos_cota(agio=agio_negociado),
+            (principal, months, admin_fee, dict(st.session_state.dropdowns), plano))
+
+    # Cenários gravados com os cronogramas já calculados, para reabrir e comparar sem recalcular
+    with st.expander("Cenários Salvos"):
+        painel_cenarios.mostrar_cenarios_salvos('analise_dados', dict(
+            principal=principal, prazo=months,
+            parametros={'principal': principal, 'months': months, 'admin_fee': admin_fee, 'agio': agio, 'tlr': tlr,
+                        'correcao': plano['correcao'], 'meses_correcao': plano['meses_correcao'],
+                        'parcela_minima': plano['parcela_minima'], 'dropdowns': st.session_state.dropdowns},
+            series={'Parcelas com Dropdowns': payments_with_drops, 'Saldo com Dropdowns': balances_with_drops,
+                    'Parcelas sem Dropdowns': payments_no_drops, 'Saldo sem Dropdowns': balances_no_drops},
+            indicadores={'Quitação (meses)': len(payments_with_drops), 'P/CL (%)': p_cl, 'P/DN (%)': p_dn,
+                         'CET (%)': cet, 'CET Anual (%)': indicadores['cet_anual'] * 100,
+                         'VPL (R$)': indicadores['vpl'], 'Ganho na Arbitragem (R$)': ganho_arbitragem,
+                         'ROI da Estratégia (%)': roi},
+        ), painel_cenarios.aplicar_parametros_cota, ('principal', 'prazo'))
+
+    painel_desempenho.finalizar()
+
 if __name__ == "__main__":
     main()
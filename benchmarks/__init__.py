@@ -0,0 +1 @@
+# Benchmarks dos motores financeiros: python -m benchmarks executar | comparar
@@ -0,0 +1,150 @@
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+from benchmarks.casos import Grandezas, casos
+
+
+def chave(nome, parametros):
+    return f"{nome}[{','.join(f'{k}={v}' for k, v in parametros.items())}]"
+
+
+def selecionado(nome, parametros, filtro):
+    # Filtro = termos separados por vírgula, todos exigidos: o nome do caso ou chave=valor de um
+    # parâmetro, sempre inteiros (meses=60 não seleciona meses=600)
+    for termo in filtro.split(','):
+        parametro, igual, valor = (parte.strip() for parte in termo.partition('='))
+        if igual:
+            if parametro not in parametros or str(parametros[parametro]) != valor:
+                return False
+        elif parametro != nome:
+            return False
+    return True
+
+
+def _metadados():
+    import numpy
+    import pandas
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'plataforma': platform.platform(),
+        'processador': platform.processor() or platform.machine(),
+    }
+
+
+def medir(funcao, repeticoes=5, tempo_minimo=0.1):
+    # Calibra o número de chamadas por repetição como o timeit e guarda o tempo por chamada
+    temporizador = timeit.Timer(funcao)
+    numero = 1
+    while True:
+        duracao = temporizador.timeit(numero)
+        if duracao >= tempo_minimo or numero >= 1_000_000:
+            break
+        numero = max(numero * 2, int(numero * tempo_minimo / max(duracao, 1e-9) * 1.1))
+    tempos = [t / numero for t in temporizador.repeat(repeat=repeticoes, number=numero)]
+    return {
+        'numero': numero,
+        'repeticoes': repeticoes,
+        'minimo_s': min(tempos),
+        'mediana_s': statistics.median(tempos),
+        'maximo_s': max(tempos),
+    }
+
+
+def executar(args):
+    resultados = []
+    inicio = time.perf_counter()
+    for nome, parametros, fabrica in casos():
+        if args.filtro and not any(selecionado(nome, parametros, filtro) for filtro in args.filtro):
+            continue
+        identificador = chave(nome, parametros)
+        funcao = fabrica()
+        retorno = funcao()
+        medida = medir(funcao, args.repeticoes, args.tempo_minimo)
+        resultado = {'chave': identificador, 'nome': nome, 'parametros': parametros, **medida}
+        if isinstance(retorno, Grandezas):
+            resultado.update(retorno)
+        resultados.append(resultado)
+        print(f"{identificador:<90} {medida['minimo_s'] * 1e3:10.3f} ms", file=sys.stderr)
+
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump({'metadados': _metadados(), 'resultados': resultados}, arquivo, ensure_ascii=False, indent=1)
+    print(f"{len(resultados)} casos em {time.perf_counter() - inicio:.1f}s -> {args.saida}", file=sys.stderr)
+
+
+def comparar(args):
+    # Compara os mínimos (a medida menos ruidosa) e falha se algum caso ficou mais lento que a tolerância
+    with open(args.base, encoding='utf-8') as arquivo:
+        base = {r['chave']: r for r in json.load(arquivo)['resultados']}
+    with open(args.atual, encoding='utf-8') as arquivo:
+        atual = {r['chave']: r for r in json.load(arquivo)['resultados']}
+
+    regressoes = []
+    for identificador, resultado in atual.items():
+        if identificador not in base:
+            print(f"{'NOVO':<10} {identificador}")
+            continue
+        razao = resultado['minimo_s'] / base[identificador]['minimo_s']
+        if razao > 1 + args.tolerancia:
+            situacao = 'REGRESSÃO'
+            regressoes.append(identificador)
+        elif razao < 1 / (1 + args.tolerancia):
+            situacao = 'MELHORA'
+        else:
+            situacao = 'ok'
+        if situacao != 'ok' or not args.so_mudancas:
+            print(f"{situacao:<10} {identificador:<90} {base[identificador]['minimo_s'] * 1e3:10.3f} ms"
+                  f" -> {resultado['minimo_s'] * 1e3:10.3f} ms  x{razao:.2f}")
+    for identificador in base.keys() - atual.keys():
+        print(f"{'AUSENTE':<10} {identificador}")
+
+    print(f"{len(regressoes)} regressões acima de {args.tolerancia:.0%}", file=sys.stderr)
+    return 1 if regressoes else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmarks dos motores financeiros do Simulador Constructa.')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    execucao = subparsers.add_parser('executar', help='mede todos os casos e grava os resultados em JSON')
+    execucao.add_argument('--saida', default='benchmarks.json', help='arquivo JSON de resultados')
+    execucao.add_argument('--filtro', action='append',
+                          help='só casos com o nome e os parâmetros informados, separados por vírgula '
+                               '(pode repetir, ex.: calculate_payments,meses=60,dropdowns=0)')
+    execucao.add_argument('--repeticoes', type=int, default=5)
+    execucao.add_argument('--tempo-minimo', type=float, default=0.1,
+                          help='duração mínima de cada repetição, em segundos')
+
+    comparacao = subparsers.add_parser('comparar', help='compara dois arquivos de resultados')
+    comparacao.add_argument('base', help='resultados de referência')
+    comparacao.add_argument('atual', help='resultados novos')
+    comparacao.add_argument('--tolerancia', type=float, default=0.10,
+                            help='aumento relativo tolerado antes de acusar regressão (padrão 0.10)')
+    comparacao.add_argument('--so-mudancas', action='store_true', help='lista só regressões e melhoras')
+    args = parser.parse_args(argv)
+
+    if args.comando == 'executar':
+        executar(args)
+        return 0
+    return comparar(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+import numpy as np
+
+# Grade de parâmetros: prazos de 60 a 600 meses, de 0 a 200 dropdowns e lotes de 1 a 10 mil cotas
+HORIZONTES = (60, 120, 240, 360, 600)
+NUM_DROPDOWNS = (0, 1, 10, 50, 200)
+HORIZONTES_LOTE = (60, 240, 600)
+NUM_DROPDOWNS_LOTE = (0, 10, 200)
+TAMANHOS_LOTE = (1, 100, 10_000)
+VARIANTES = ('finance_app', 'analise_dados')
+# Estratégias de saída sobrepostas no gráfico de dropdowns do constructa_mvp
+NUM_ESTRATEGIAS = (1, 50)
+# Degraus do simplex lançamento/balões/parcelas na busca de mix de vendas
+PASSOS_MIX = (10, 5)
+# Faixas de lance pago (% do DND) na fronteira de lances do PLE
+MAXIMOS_LANCE_PAGO = (10, 50)
+# Lotes colunares de 240 meses: leitura de um cenário, de um mês e faixas de percentis
+CENARIOS_RESULTADOS = (10_000, 100_000)
+OPERACOES_RESULTADOS = ('cenario', 'mes', 'faixas')
+# Fluxos sintéticos de ordens do livro de ofertas do mercado secundário
+NUM_ORDENS = (10_000, 1_000_000)
+# Níveis por choque na grade do pacote de estresse (4 choques: níveis ** 4 cenários, mais o pacote padrão)
+NIVEIS_ESTRESSE = (1, 5)
+
+PRINCIPAL = 5_000_000.0
+ADMIN_FEE = 0.001
+AGIO = 10.0
+
+
+class Grandezas(dict):
+    # Retorno de um caso com grandezas rotuladas além do tempo ({'bytes': ...}, {'linhas': ...}),
+    # copiadas para o resultado do caso
+    pass
+
+
+def gerar_dropdowns(horizonte, quantidade, semente=0):
+    # Meses distintos sorteados com semente fixa; o total fica em 30% do crédito para que o
+    # cronograma não quite antes do fim e o custo medido seja o do prazo inteiro
+    rng = np.random.default_rng(semente)
+    quantidade = min(quantidade, horizonte)
+    meses = np.sort(rng.choice(np.arange(1, horizonte + 1), size=quantidade, replace=False))
+    valores = rng.uniform(0.5, 1.5, quantidade)
+    valores *= 0.3 * PRINCIPAL / max(valores.sum(), 1.0)
+    return {int(mes): float(valor) for mes, valor in zip(meses, valores)}
+
+
+def _fluxo_padrao(prazo_meses):
+    from constructa.fluxo import calcular_fluxo_auto_financiado
+
+    return calcular_fluxo_auto_financiado(35.0, 24.5, prazo_meses, 30, 40, 30, 20, 30, 50, min(48, prazo_meses))
+
+
+def _caso_calculate_payments(variante, horizonte, dropdowns):
+    from constructa.pagamentos import calculate_payments
+    from constructa.regras import PLANOS
+
+    drops = gerar_dropdowns(horizonte, dropdowns)
+    plano = PLANOS[variante]
+    return lambda: calculate_payments(PRINCIPAL, horizonte, ADMIN_FEE, drops, AGIO, plano)
+
+
+def _caso_calculate_payments_batch(variante, horizonte, dropdowns, lote):
+    from constructa.pagamentos import calculate_payments_batch, empacotar_dropdowns
+    from constructa.regras import PLANOS
+
+    rng = np.random.default_rng(1)
+    principal = rng.uniform(0.5, 1.5, lote) * PRINCIPAL
+    meses, valores = empacotar_dropdowns([gerar_dropdowns(horizonte, dropdowns, semente=i % 16) for i in range(lote)])
+    plano = PLANOS[variante]
+    return lambda: calculate_payments_batch(principal, horizonte, ADMIN_FEE, meses, valores, AGIO, plano=plano)
+
+
+def _caso_fluxo(horizonte):
+    return lambda: _fluxo_padrao(horizonte)
+
+
+def _caso_fluxo_diario(horizonte):
+    from constructa.fluxo_diario import calcular_fluxo_diario, curva_logistica
+
+    # Mesmo projeto de _fluxo_padrao, ~30x mais períodos, com feriados fixos e curva S
+    feriados = np.arange('2025-01-01', '2080-01-01', dtype='datetime64[Y]').astype('datetime64[D]')
+    curva = curva_logistica()
+    return lambda: calcular_fluxo_diario(35.0, 24.5, horizonte, 20, 30, 50, min(48, horizonte),
+                                         curva=curva, feriados=feriados)
+
+
+def _caso_fluxos_lote(horizonte, lote):
+    from constructa.fluxo import calcular_fluxos_lote
+
+    rng = np.random.default_rng(2)
+    vgv = rng.uniform(10, 100, lote)
+    return lambda: calcular_fluxos_lote(vgv, vgv * 0.7, horizonte, 30, 40, 30, 20, 30, 50, min(48, horizonte))
+
+
+def _caso_grafico_dropdown(horizonte, estrategias):
+    # Projeção das estratégias, montagem da figura e serialização em JSON, que é o que o Streamlit envia
+    from constructa import projecao
+    from constructa_mvp import criar_grafico_com_dropdown
+
+    rng = np.random.default_rng(3)
+    cronogramas = [[(horizonte // 4, 100_000.0, 20.0)]]
+    cronogramas += [[(int(rng.integers(1, horizonte)), 50_000.0, 20.0) for _ in range(3)]
+                    for _ in range(estrategias - 1)]
+    nomes = [f"Estratégia {i}" for i in range(estrategias)]
+
+    def executar():
+        saldo_sem, saldos_com = projecao.projetar_saldos(1_000_000, horizonte,
+                                                         *projecao.empacotar_estrategias(cronogramas))
+        return Grandezas(bytes=len(criar_grafico_com_dropdown(saldo_sem, saldos_com, nomes).to_json()))
+    return executar
+
+
+def _caso_mix_vendas(horizonte, passo):
+    from constructa.mix_vendas import otimizar_mix_vendas
+
+    base = dict(vgv=35.0, custo_construcao_percentual=70, prazo_meses=horizonte,
+                percentual_inicio=30, percentual_meio=40, percentual_fim=30)
+    return lambda: otimizar_mix_vendas(base, exposicao_maxima=0.0, passo=passo)
+
+
+def _caso_lances(horizonte, maximo_pago):
+    from constructa.lances import fronteira_lances, varrer_lances
+
+    return lambda: fronteira_lances(varrer_lances(1_000_000.0, horizonte, ADMIN_FEE, maximo_pago=maximo_pago))
+
+
+def _lote_colunar(cenarios, horizonte=240):
+    # Gravado uma vez por tamanho em um diretório temporário, apagado quando o objeto é coletado
+    import tempfile
+
+    import pandas as pd
+
+    from constructa.resultados import gravar_resultados
+
+    pasta = tempfile.TemporaryDirectory(prefix='constructa_bench_')
+    rng = np.random.default_rng(4)
+    parametros = pd.DataFrame({'principal': rng.uniform(0.5, 1.5, cenarios) * PRINCIPAL,
+                               'quitacao': rng.integers(horizonte // 2, horizonte + 1, cenarios)})
+
+    def calcular(parte):
+        meses = np.arange(horizonte)[None, :]
+        saldo = parte['principal'].to_numpy()[:, None] * (1 - meses / horizonte)
+        return {'saldo': np.where(meses < parte['quitacao'].to_numpy()[:, None], saldo, np.nan)}
+    gravar_resultados(pasta.name, parametros, ['saldo'], horizonte, calcular)
+    return pasta
+
+
+def _caso_resultados(operacao, cenarios):
+    from constructa.resultados import ResultadosColunares
+
+    pasta = _lote_colunar(cenarios)
+
+    def executar():
+        # A abertura entra na medida: é o que o painel faz a cada lote escolhido
+        resultados = ResultadosColunares(pasta.name)
+        if operacao == 'cenario':
+            return Grandezas(linhas=len(resultados.cenario(cenarios // 2)))
+        if operacao == 'mes':
+            return Grandezas(linhas=len(resultados.mes(120)))
+        return Grandezas(linhas=len(resultados.faixas('saldo')))
+    return executar
+
+
+def _caso_livro_ofertas(ordens):
+    # Fluxo gerado uma vez; cada repetição casa tudo num livro vazio
+    from constructa.livro_ofertas import gerar_ordens, reproduzir_ordens
+
+    fluxo = gerar_ordens(ordens)
+    return lambda: Grandezas(ordens_abertas=len(reproduzir_ordens(fluxo)))
+
+
+def _caso_estresse(niveis):
+    # Pacote padrão mais a grade completa dos choques, num processo só
+    import pandas as pd
+
+    from constructa.estresse import BASE_PADRAO, PACOTE_PADRAO, executar_pacote, grade_choques, montar_pacote
+
+    grade = grade_choques(atraso_vendas=np.linspace(0, 12, niveis), sobrecusto=np.linspace(0, 40, niveis),
+                          choque_indice=np.linspace(0, 10, niveis), queda_agio=np.linspace(0, 100, niveis))
+    pacote = pd.concat([montar_pacote(PACOTE_PADRAO), grade], ignore_index=True)
+    return lambda: executar_pacote(BASE_PADRAO, pacote, processos=1)
+
+
+def _caso_grafico_fluxo(horizonte):
+    # Preparação dos dados de mostrar_graficos (melt + especificação Altair serializada)
+    from cenarios import montar_grafico_fluxo
+
+    fluxo = _fluxo_padrao(horizonte)
+    return lambda: Grandezas(bytes=len(str(montar_grafico_fluxo(fluxo).to_dict())))
+
+
+def casos():
+    # (nome, parâmetros, fábrica que prepara os dados e devolve a função medida)
+    for variante in VARIANTES:
+        for horizonte in HORIZONTES:
+            for dropdowns in NUM_DROPDOWNS:
+                yield ('calculate_payments', {'variante': variante, 'meses': horizonte, 'dropdowns': dropdowns},
+                       lambda v=variante, h=horizonte, d=dropdowns: _caso_calculate_payments(v, h, d))
+        for horizonte in HORIZONTES_LOTE:
+            for dropdowns in NUM_DROPDOWNS_LOTE:
+                for lote in TAMANHOS_LOTE:
+                    yield ('calculate_payments_batch',
+                           {'variante': variante, 'meses': horizonte, 'dropdowns': dropdowns, 'lote': lote},
+                           lambda v=variante, h=horizonte, d=dropdowns, n=lote: _caso_calculate_payments_batch(v, h, d, n))
+    for horizonte in HORIZONTES:
+        yield ('calcular_fluxo_auto_financiado', {'meses': horizonte}, lambda h=horizonte: _caso_fluxo(h))
+        yield ('calcular_fluxo_diario', {'meses': horizonte}, lambda h=horizonte: _caso_fluxo_diario(h))
+        for estrategias in NUM_ESTRATEGIAS:
+            yield ('criar_grafico_com_dropdown', {'meses': horizonte, 'estrategias': estrategias},
+                   lambda h=horizonte, e=estrategias: _caso_grafico_dropdown(h, e))
+        yield ('mostrar_graficos', {'meses': horizonte}, lambda h=horizonte: _caso_grafico_fluxo(h))
+    for horizonte in HORIZONTES_LOTE:
+        for lote in TAMANHOS_LOTE:
+            yield ('calcular_fluxos_lote', {'meses': horizonte, 'lote': lote},
+                   lambda h=horizonte, n=lote: _caso_fluxos_lote(h, n))
+        for passo in PASSOS_MIX:
+            yield ('otimizar_mix_vendas', {'meses': horizonte, 'passo': passo},
+                   lambda h=horizonte, p=passo: _caso_mix_vendas(h, p))
+        for maximo_pago in MAXIMOS_LANCE_PAGO:
+            yield ('varrer_lances', {'meses': horizonte, 'lance_pago': maximo_pago},
+                   lambda h=horizonte, m=maximo_pago: _caso_lances(h, m))
+    for cenarios in CENARIOS_RESULTADOS:
+        for operacao in OPERACOES_RESULTADOS:
+            yield ('resultados_colunares', {'operacao': operacao, 'cenarios': cenarios},
+                   lambda o=operacao, n=cenarios: _caso_resultados(o, n))
+    for ordens in NUM_ORDENS:
+        yield ('reproduzir_ordens', {'ordens': ordens}, lambda n=ordens: _caso_livro_ofertas(n))
+    for niveis in NIVEIS_ESTRESSE:
+        yield ('executar_pacote', {'niveis': niveis}, lambda n=niveis: _caso_estresse(n))
@@ -1,79 +1,69 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
-import pandas as pd
 import numpy as np
 import altair as alt
+import plotly.graph_objects as go
+from constructa.cache import memoizar
+from constructa.instrumentacao import etapa, medir
+import constructa.fluxo
+import constructa.fluxo_diario
+from constructa.estresse import BASE_PADRAO
+from constructa.metricas import taxa_anual, taxa_mensal, tir, trocas_de_sinal, vpl
+from constructa.mix_vendas import otimizar_mix_vendas
+from constructa.portfolio import COLUNAS_PROJETO, consolidar_portfolio
+from constructa.sensibilidade import METRICAS, PARAMETROS, grade_sensibilidade, tornado
+import painel_cenarios
+import painel_desempenho
+import painel_estresse
+import painel_resultados
+import painel_tarefas
+from constructa.reducao import indices_lttb_uniao
+from graficos import PONTOS_POR_SERIE, adicionar_linhas
 
-# Configuração da página
-st.set_page_config(page_title="Análise de Fluxo de Caixa", layout="wide")
-
-# Tema personalizado
-st.markdown("""
-<style>
-    .reportview-container {
-        background: #ffffff
-    }
-    .sidebar .sidebar-content {
-        background: #ffffff
-    }
-    .Widget>label {
-        color: #808495;
-        font-family: "Source Sans Pro", sans-serif;
-    }
-    .stButton>button {
-        color: #ffffff;
-        background-color: #0068c9;
-        border-radius: 4px;
-    }
-    .stTextInput>div>div>input {
-        color: #31333F;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-def calcular_fluxo_auto_financiado(vgv, custo_construcao, prazo_meses, 
-                                   percentual_inicio, percentual_meio, percentual_fim,
-                                   percentual_lancamento, percentual_baloes, percentual_parcelas,
-                                   prazo_parcelas):
-    fluxo = pd.DataFrame(index=range(prazo_meses), columns=['Mês', 'Receitas', 'Custos', 'Saldo Mensal', 'Saldo Acumulado'])
-    
-    custos = np.zeros(prazo_meses)
-    tercio_obra = prazo_meses // 3
-    custos[:tercio_obra] = custo_construcao * percentual_inicio / 100 / tercio_obra
-    custos[tercio_obra:2*tercio_obra] = custo_construcao * percentual_meio / 100 / tercio_obra
-    custos[2*tercio_obra:] = custo_construcao * percentual_fim / 100 / (prazo_meses - 2*tercio_obra)
-    fluxo['Custos'] = custos
-    
-    fluxo['Receitas'] = 0
-    fluxo.loc[0, 'Receitas'] += vgv * percentual_lancamento / 100
-    
-    valor_baloes = vgv * percentual_baloes / 100
-    num_baloes = 3
-    for i in range(1, num_baloes + 1):
-        mes_balao = i * prazo_meses // (num_baloes + 1)
-        fluxo.loc[mes_balao, 'Receitas'] += valor_baloes / num_baloes
-    
-    valor_parcelas = vgv * percentual_parcelas / 100
-    parcela_mensal = valor_parcelas / min(prazo_parcelas, prazo_meses)
-    fluxo.loc[:min(prazo_parcelas, prazo_meses)-1, 'Receitas'] += parcela_mensal
-    
-    fluxo['Saldo Mensal'] = fluxo['Receitas'] - fluxo['Custos']
-    fluxo['Saldo Acumulado'] = fluxo['Saldo Mensal'].cumsum()
-    
-    fluxo['Mês'] = range(1, prazo_meses + 1)
-    
-    return fluxo
+calcular_fluxo_auto_financiado = medir("calcular_fluxo_auto_financiado")(memoizar(
+    "cenarios.calcular_fluxo_auto_financiado")(constructa.fluxo.calcular_fluxo_auto_financiado))
+calcular_fluxo_diario = medir("calcular_fluxo_diario")(memoizar(
+    "cenarios.calcular_fluxo_diario")(constructa.fluxo_diario.calcular_fluxo_diario))
 
-def mostrar_graficos(fluxo):
-    # Prepare os dados
-    df_long = pd.melt(fluxo, id_vars=['Mês'], value_vars=['Receitas', 'Custos', 'Saldo Mensal', 'Saldo Acumulado'])
+def aplicar_tema():
+    # Tema personalizado
+    st.markdown("""
+    <style>
+        .reportview-container {
+            background: #ffffff
+        }
+        .sidebar .sidebar-content {
+            background: #ffffff
+        }
+        .Widget>label {
+            color: #808495;
+            font-family: "Source Sans Pro", sans-serif;
+        }
+        .stButton>button {
+            color: #ffffff;
+            background-color: #0068c9;
+            border-radius: 4px;
+        }
+        .stTextInput>div>div>input {
+            color: #31333F;
+        }
+    </style>
+    """, unsafe_allow_html=True)
+
+@medir("montar_grafico_fluxo")
+def montar_grafico_fluxo(fluxo):
+    # Prepare os dados: formato largo (o fold para variable/value é feito no navegador, sem
+    # quadruplicar as linhas), reduzido por LTTB em horizontes longos e com 4 casas decimais
+    series = ['Receitas', 'Custos', 'Saldo Mensal', 'Saldo Acumulado']
+    indices = indices_lttb_uniao(fluxo['Mês'].to_numpy(), [fluxo[s].to_numpy() for s in series], PONTOS_POR_SERIE)
+    dados = fluxo.iloc[indices][['Mês'] + series].round(4)
     
     # Defina a escala de cores
     color_scale = alt.Scale(domain=['Receitas', 'Custos', 'Saldo Mensal', 'Saldo Acumulado'],
                             range=['#0068c9', '#ff2b2b', '#29b09d', '#ffabab'])
 
     # Crie o gráfico base
-    base = alt.Chart(df_long).encode(
+    base = alt.Chart(dados).transform_fold(series, as_=['variable', 'value']).encode(
         x=alt.X('Mês:Q', axis=alt.Axis(grid=False, tickMinStep=1)),
         y=alt.Y('value:Q', axis=alt.Axis(grid=True, title='Valor (milhões R$)')),
         color=alt.Color('variable:N', scale=color_scale, legend=alt.Legend(orient='bottom', title=None))
@@ -109,47 +99,54 @@ def mostrar_graficos(fluxo):
     ).configure_view(
         strokeWidth=0
     )
+    return chart
 
+def mostrar_graficos(fluxo):
     # Exiba o gráfico no Streamlit
-    st.altair_chart(chart, use_container_width=True)
-
-# Menu de navegação lateral
-with st.sidebar:
-    selected = option_menu(
-        "Menu Principal", ["Home", "Parâmetros", "Fluxo de Caixa", "Análise"],
-        icons=["house", "gear", "cash", "graph-up"],
-        menu_icon="cast", default_index=0
-    )
+    painel_desempenho.exibir_altair(montar_grafico_fluxo(fluxo), "fluxo", use_container_width=True)
 
-# Variáveis de estado para armazenar os inputs
-if 'vgv' not in st.session_state:
-    st.session_state.vgv = 35.0
-if 'custo_construcao_percentual' not in st.session_state:
-    st.session_state.custo_construcao_percentual = 70
-if 'prazo_meses' not in st.session_state:
-    st.session_state.prazo_meses = 48
-if 'percentual_inicio' not in st.session_state:
-    st.session_state.percentual_inicio = 30
-if 'percentual_meio' not in st.session_state:
-    st.session_state.percentual_meio = 40
-if 'percentual_fim' not in st.session_state:
-    st.session_state.percentual_fim = 30
-if 'percentual_lancamento' not in st.session_state:
-    st.session_state.percentual_lancamento = 20
-if 'percentual_baloes' not in st.session_state:
-    st.session_state.percentual_baloes = 30
-if 'percentual_parcelas' not in st.session_state:
-    st.session_state.percentual_parcelas = 50
-if 'prazo_parcelas' not in st.session_state:
-    st.session_state.prazo_parcelas = 48
-
-# Conteúdo principal
-if selected == "Home":
+def inicializar_estado():
+    # Variáveis de estado para armazenar os inputs
+    if 'vgv' not in st.session_state:
+        st.session_state.vgv = 35.0
+    if 'custo_construcao_percentual' not in st.session_state:
+        st.session_state.custo_construcao_percentual = 70
+    if 'prazo_meses' not in st.session_state:
+        st.session_state.prazo_meses = 48
+    if 'percentual_inicio' not in st.session_state:
+        st.session_state.percentual_inicio = 30
+    if 'percentual_meio' not in st.session_state:
+        st.session_state.percentual_meio = 40
+    if 'percentual_fim' not in st.session_state:
+        st.session_state.percentual_fim = 30
+    if 'percentual_lancamento' not in st.session_state:
+        st.session_state.percentual_lancamento = 20
+    if 'percentual_baloes' not in st.session_state:
+        st.session_state.percentual_baloes = 30
+    if 'percentual_parcelas' not in st.session_state:
+        st.session_state.percentual_parcelas = 50
+    if 'prazo_parcelas' not in st.session_state:
+        st.session_state.prazo_parcelas = 48
+    if 'num_baloes' not in st.session_state:
+        st.session_state.num_baloes = 3
+    if 'fim_baloes' not in st.session_state:
+        st.session_state.fim_baloes = 100
+    if 'tlr' not in st.session_state:
+        st.session_state.tlr = 11.0
+
+def indicadores_financeiros(saldo_mensal):
+    # Fluxo mensal descontado a partir do mês 1 pela taxa livre de risco
+    # Com várias trocas de sinal (balões entre custos) a TIR não é única e não é exibida
+    tir_projeto = taxa_anual(tir(saldo_mensal))[0] if trocas_de_sinal(saldo_mensal)[0] == 1 else np.nan
+    vpl_projeto = vpl(saldo_mensal, taxa_mensal(st.session_state.tlr / 100))[0]
+    return tir_projeto, vpl_projeto
+
+def mostrar_home():
     st.title("Análise de Fluxo de Caixa - Modelo Auto Financiado")
     st.write("Bem-vindo à ferramenta de análise de fluxo de caixa para projetos imobiliários.")
     st.write("Use o menu lateral para navegar entre as diferentes seções.")
 
-elif selected == "Parâmetros":
+def mostrar_parametros():
     st.header("Parâmetros do Projeto")
     
     col1, col2 = st.columns(2)
@@ -157,6 +154,7 @@ elif selected == "Parâmetros":
         st.session_state.vgv = st.number_input('VGV (Valor Geral de Vendas) em milhões R$', value=st.session_state.vgv, step=0.1)
         st.session_state.custo_construcao_percentual = st.slider('Custo de Construção (% do VGV)', 50, 90, st.session_state.custo_construcao_percentual)
         st.session_state.prazo_meses = st.number_input('Prazo de Construção (meses)', value=st.session_state.prazo_meses, step=1)
+        st.session_state.tlr = st.number_input('Taxa Livre de Risco (% a.a.)', min_value=0.0, value=st.session_state.tlr, step=0.1)
 
     with col2:
         st.subheader("Distribuição dos Custos")
@@ -175,11 +173,15 @@ elif selected == "Parâmetros":
     with col4:
         st.session_state.percentual_parcelas = st.slider('% Vendas em Parcelas', 0, 100, st.session_state.percentual_parcelas)
         st.session_state.prazo_parcelas = st.slider('Prazo das Parcelas (meses)', 1, 120, st.session_state.prazo_parcelas)
+    with col3:
+        st.session_state.num_baloes = st.slider('Número de Balões', 1, 12, st.session_state.num_baloes)
+    with col4:
+        st.session_state.fim_baloes = st.slider('Último Balão até (% do prazo)', 10, 100, st.session_state.fim_baloes)
     
     if st.session_state.percentual_lancamento + st.session_state.percentual_baloes + st.session_state.percentual_parcelas != 100:
         st.warning("A soma dos percentuais de vendas deve ser 100%")
 
-elif selected == "Fluxo de Caixa":
+def mostrar_fluxo_caixa():
     st.header("Fluxo de Caixa")
     
     custo_construcao = st.session_state.vgv * st.session_state.custo_construcao_percentual / 100
@@ -187,15 +189,94 @@ elif selected == "Fluxo de Caixa":
         st.session_state.vgv, custo_construcao, st.session_state.prazo_meses, 
         st.session_state.percentual_inicio, st.session_state.percentual_meio, st.session_state.percentual_fim,
         st.session_state.percentual_lancamento, st.session_state.percentual_baloes, st.session_state.percentual_parcelas,
-        st.session_state.prazo_parcelas
+        st.session_state.prazo_parcelas, st.session_state.num_baloes, st.session_state.fim_baloes
     )
 
+    resolucao = st.radio("Resolução", ["Mensal", "Diária"], horizontal=True, key="resolucao_fluxo")
+    if resolucao == "Diária":
+        mostrar_fluxo_diario(custo_construcao, fluxo_auto)
+        return
+
     mostrar_graficos(fluxo_auto)
 
     st.subheader('Fluxo de Caixa Mensal')
     st.dataframe(fluxo_auto)
 
-elif selected == "Análise":
+def selecionar_feriados():
+    # Calendário de dias úteis: arquivo carregado, o arquivo local padrão ou só fins de semana
+    arquivo = st.file_uploader("Feriados (CSV com uma data por linha)", type="csv", key="feriados_fluxo")
+    try:
+        feriados = constructa.fluxo_diario.carregar_feriados(arquivo)
+    except ValueError as erro:
+        st.error(str(erro))
+        feriados = constructa.fluxo_diario.carregar_feriados()
+    if len(feriados):
+        st.caption(f"{len(feriados)} feriados de {feriados.min()} a {feriados.max()}")
+    else:
+        st.caption(f"Sem arquivo de feriados ({constructa.fluxo_diario.CAMINHO_FERIADOS}): "
+                   "só sábados e domingos deixam de ser dias úteis")
+    return feriados
+
+def selecionar_curva_custos():
+    # Curva acumulada dos custos da obra: as três fases dos parâmetros, uma curva S ou fases livres
+    opcao = st.radio("Curva de Custos", ["Fases dos Parâmetros", "Curva S", "Fases Personalizadas"],
+                     horizontal=True, key="curva_custos_fluxo")
+    if opcao == "Curva S":
+        inclinacao = st.slider("Inclinação da Curva S", 2.0, 20.0, 10.0, step=0.5, key="inclinacao_fluxo")
+        return constructa.fluxo_diario.curva_logistica(inclinacao)
+    if opcao == "Fases Personalizadas":
+        col1, col2 = st.columns(2)
+        custos = col1.text_input("Custos por Fase (% do custo)", "10, 20, 30, 25, 15", key="custos_fases_fluxo")
+        duracoes = col2.text_input("Duração Relativa das Fases (vazio = iguais)", "", key="duracoes_fases_fluxo")
+        try:
+            custos = [float(v) for v in custos.split(',')]
+            duracoes = [float(v) for v in duracoes.split(',')] if duracoes.strip() else None
+            return constructa.fluxo_diario.curva_fases(custos, duracoes)
+        except ValueError as erro:
+            st.error(f"Fases inválidas: {erro}")
+            return None
+    return constructa.fluxo_diario.curva_fases(
+        (st.session_state.percentual_inicio, st.session_state.percentual_meio, st.session_state.percentual_fim))
+
+def mostrar_fluxo_diario(custo_construcao, fluxo_mensal):
+    # Receitas nos vencimentos reais (dia útil seguinte) e custos nos dias úteis da obra
+    col1, col2 = st.columns(2)
+    data_inicio = col1.date_input("Data de Lançamento", key="data_inicio_fluxo")
+    dia_vencimento = col2.number_input("Dia de Vencimento", min_value=1, max_value=31, value=data_inicio.day,
+                                       key="dia_vencimento_fluxo")
+    curva = selecionar_curva_custos()
+    if curva is None:
+        return
+    feriados = selecionar_feriados()
+
+    diario = calcular_fluxo_diario(
+        st.session_state.vgv, custo_construcao, st.session_state.prazo_meses,
+        st.session_state.percentual_lancamento, st.session_state.percentual_baloes, st.session_state.percentual_parcelas,
+        st.session_state.prazo_parcelas, st.session_state.num_baloes, st.session_state.fim_baloes,
+        data_inicio, curva, int(dia_vencimento), feriados
+    )
+    metricas = constructa.fluxo_diario.metricas_diarias(diario)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Exposição Máxima Diária", f"R$ {metricas['exposicao_maxima']:,.2f}M")
+    col2.metric("Data da Exposição Máxima", f"{metricas['data_exposicao_maxima']:%d/%m/%Y}")
+    col3.metric("Exposição Máxima Mensal", f"R$ {max(0.0, -fluxo_mensal['Saldo Acumulado'].min()):,.2f}M")
+
+    fig = adicionar_linhas(go.Figure(), [(diario['Data'].to_numpy(), diario[serie].to_numpy(),
+                                          dict(mode='lines', name=serie))
+                                         for serie in constructa.fluxo_diario.SERIES_DIARIAS])
+    fig.update_layout(xaxis_title='Data', yaxis_title='Valor (milhões R$)', legend=dict(orientation='h'))
+    painel_desempenho.exibir_plotly(fig, "fluxo_diario", use_container_width=True)
+
+    if st.checkbox("Agregar por Mês", key="agregar_fluxo_diario"):
+        mensal = constructa.fluxo_diario.agregar_mensal(diario)
+        mostrar_graficos(mensal)
+        st.subheader('Fluxo de Caixa Mensal (a partir do diário)')
+        st.dataframe(mensal)
+    else:
+        st.subheader('Fluxo de Caixa Diário')
+        st.dataframe(diario)
+
+def mostrar_analise():
     st.header("Análise do Projeto")
     
     custo_construcao = st.session_state.vgv * st.session_state.custo_construcao_percentual / 100
@@ -203,7 +284,7 @@ elif selected == "Análise":
         st.session_state.vgv, custo_construcao, st.session_state.prazo_meses, 
         st.session_state.percentual_inicio, st.session_state.percentual_meio, st.session_state.percentual_fim,
         st.session_state.percentual_lancamento, st.session_state.percentual_baloes, st.session_state.percentual_parcelas,
-        st.session_state.prazo_parcelas
+        st.session_state.prazo_parcelas, st.session_state.num_baloes, st.session_state.fim_baloes
     )
 
     lucro_total = fluxo_auto['Saldo Mensal'].sum()
@@ -218,6 +299,8 @@ elif selected == "Análise":
         mes_payback = "Não atingido"
         valor_payback = None
 
+    tir_projeto, vpl_projeto = indicadores_financeiros(fluxo_auto['Saldo Mensal'].to_numpy())
+
     st.subheader('Métricas do Projeto')
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -226,18 +309,20 @@ elif selected == "Análise":
     with col2:
         st.metric("Lucro Total", f"R$ {lucro_total:.2f} milhões")
         st.metric("Margem", f"{margem:.2f}%")
+        st.metric(f"VPL ({st.session_state.tlr:.2f}% a.a.)", f"R$ {vpl_projeto:.2f} milhões")
     with col3:
         st.metric("Exposição Máxima de Caixa", f"R$ {exposicao_maxima:.2f} milhões")
         if isinstance(mes_payback, int):
             st.metric("Mês de Payback", f"{mes_payback} (R$ {valor_payback:.2f} milhões)")
         else:
             st.metric("Mês de Payback", mes_payback)
+        st.metric("TIR do Projeto", f"{tir_projeto*100:.2f}% a.a." if np.isfinite(tir_projeto) else "Não definida")
 
     st.subheader('Análise Detalhada')
     st.write(f"""
     No modelo auto financiado:
     1. O incorporador recebe R$ {st.session_state.vgv * st.session_state.percentual_lancamento / 100:.2f} milhões no lançamento.
-    2. R$ {st.session_state.vgv * st.session_state.percentual_baloes / 100:.2f} milhões são recebidos em 3 balões ao longo do projeto.
+    2. R$ {st.session_state.vgv * st.session_state.percentual_baloes / 100:.2f} milhões são recebidos em {st.session_state.num_baloes} balões até {st.session_state.fim_baloes}% do prazo da obra.
     3. R$ {st.session_state.vgv * st.session_state.percentual_parcelas / 100:.2f} milhões são recebidos em {st.session_state.prazo_parcelas} parcelas mensais.
     4. Os custos de construção são distribuídos da seguinte forma:
        - {st.session_state.percentual_inicio}% no início da obra
@@ -250,10 +335,276 @@ elif selected == "Análise":
 
     mostrar_graficos(fluxo_auto)
 
-if __name__ == "__main__":
+def mostrar_portfolio():
+    st.header("Portfólio de Empreendimentos")
+    st.write("Consolida o fluxo de vários empreendimentos lançados em meses diferentes em um calendário comum.")
+    st.caption("Colunas do CSV: " + ", ".join(COLUNAS_PROJETO) + " e custo_construcao_percentual (ou custo_construcao).")
+
+    arquivo = st.file_uploader("Arquivo CSV do portfólio", type="csv")
+    if arquivo is not None:
+        try:
+            with etapa("consolidar_portfolio"):
+                consolidado, metricas = consolidar_portfolio(arquivo)
+        except ValueError as erro:
+            st.error(str(erro))
+        else:
+            st.subheader('Métricas Consolidadas')
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Empreendimentos", f"{metricas['num_projetos']}")
+                st.metric("VGV Total", f"R$ {metricas['vgv_total']:.2f} milhões")
+            with col2:
+                st.metric("Lucro Total", f"R$ {metricas['lucro_total']:.2f} milhões")
+                st.metric("Margem", f"{metricas['margem']:.2f}%")
+            with col3:
+                st.metric("Exposição Máxima de Caixa", f"R$ {metricas['exposicao_maxima']:.2f} milhões")
+                st.metric("Mês de Payback", metricas['mes_payback'] or "Não atingido")
+
+            mostrar_graficos(consolidado)
+
+            st.subheader('Fluxo de Caixa Consolidado')
+            st.dataframe(consolidado)
+
+def _faixa_eixo(nome, rotulo):
+    # Faixa padrão de ±50% em torno do valor atual do parâmetro
+    valor = float(st.session_state[nome])
+    col1, col2 = st.columns(2)
+    minimo = col1.number_input(f"{rotulo} - mínimo", value=valor * 0.5, key=f"min_{rotulo}_{nome}")
+    maximo = col2.number_input(f"{rotulo} - máximo", value=max(valor * 1.5, 1.0), key=f"max_{rotulo}_{nome}")
+    return minimo, maximo
+
+def mostrar_sensibilidade():
+    st.header("Análise de Sensibilidade")
+    base = {nome: st.session_state[nome] for nome in [*PARAMETROS, 'num_baloes', 'fim_baloes']}
+
+    col1, col2 = st.columns(2)
+    with col1:
+        eixo_x = st.selectbox("Parâmetro do Eixo X", list(PARAMETROS), index=list(PARAMETROS).index('vgv'),
+                              format_func=PARAMETROS.get)
+    with col2:
+        eixo_y = st.selectbox("Parâmetro do Eixo Y", list(PARAMETROS),
+                              index=list(PARAMETROS).index('custo_construcao_percentual'), format_func=PARAMETROS.get)
+    if eixo_x == eixo_y:
+        st.warning("Escolha parâmetros diferentes para os dois eixos")
+        return
+    x_min, x_max = _faixa_eixo(eixo_x, "Eixo X")
+    y_min, y_max = _faixa_eixo(eixo_y, "Eixo Y")
+    resolucao = st.slider('Pontos por Eixo', 10, 200, 100)
+
+    valores_x = np.linspace(x_min, x_max, resolucao)
+    valores_y = np.linspace(y_min, y_max, resolucao)
+    # A grade roda em segundo plano e vai sendo desenhada por blocos; mudar os eixos cancela a anterior
+    tarefa = painel_tarefas.submeter('tarefa_sensibilidade', "grade_sensibilidade", grade_sensibilidade,
+                                     base, {eixo_y: valores_y, eixo_x: valores_x})
+
+    def mostrar_grade(grade, final):
+        col1, col2 = st.columns(2)
+        for coluna, metrica in ((col1, 'exposicao_maxima'), (col2, 'mes_payback')):
+            z = grade[metrica].astype(float)
+            if metrica == 'mes_payback':
+                z[z == 0] = np.nan  # payback não atingido
+            fig = go.Figure(go.Heatmap(z=z, x=valores_x, y=valores_y, colorscale='RdBu_r',
+                                       colorbar=dict(title=METRICAS[metrica])))
+            fig.update_layout(title=METRICAS[metrica], xaxis_title=PARAMETROS[eixo_x], yaxis_title=PARAMETROS[eixo_y])
+            painel_desempenho.exibir_plotly(fig, f"mapa {metrica}", destino=coluna, use_container_width=True)
+
+    painel_tarefas.acompanhar(tarefa, mostrar_grade, "Grade de sensibilidade")
+
+    st.subheader("Gráfico Tornado")
+    col1, col2 = st.columns(2)
+    with col1:
+        metrica = st.selectbox("Métrica", list(METRICAS), format_func=METRICAS.get)
+    with col2:
+        variacao = st.slider('Variação de cada parâmetro (%)', 1, 50, 10)
+    with etapa("tornado"):
+        tabela = tornado(base, metrica, variacao / 100)
+    referencia = tabela['referencia'].iloc[0]
+    fig = go.Figure([
+        go.Bar(y=tabela['rotulo'], x=tabela['baixo'] - referencia, base=referencia, orientation='h',
+               name=f'-{variacao}%', marker_color='#ff2b2b'),
+        go.Bar(y=tabela['rotulo'], x=tabela['alto'] - referencia, base=referencia, orientation='h',
+               name=f'+{variacao}%', marker_color='#0068c9'),
+    ])
+    fig.update_layout(barmode='overlay', xaxis_title=METRICAS[metrica])
+    painel_desempenho.exibir_plotly(fig, "tornado", use_container_width=True)
+
+def aplicar_mix(mix):
+    # Leva o mix escolhido para os parâmetros do projeto
+    for nome in ('percentual_lancamento', 'percentual_baloes', 'percentual_parcelas',
+                 'prazo_parcelas', 'num_baloes', 'fim_baloes'):
+        st.session_state[nome] = int(round(mix[nome]))
+
+def mostrar_mix_vendas():
+    st.header("Mix de Vendas")
+    st.write("Busca as combinações de vendas no lançamento, em balões e em parcelas que respeitam um teto de "
+             "exposição de caixa ou um mês alvo de payback, preferindo as que recebem mais cedo.")
+    base = {nome: st.session_state[nome] for nome in PARAMETROS}
+
+    col1, col2 = st.columns(2)
+    with col1:
+        restricao = st.radio("Restrição", ["Teto de Exposição", "Mês Alvo de Payback", "Ambos"])
+        exposicao = st.number_input("Exposição Máxima de Caixa (milhões R$)", value=0.0, step=0.1,
+                                    disabled=restricao == "Mês Alvo de Payback")
+        payback = st.number_input("Payback até o Mês", min_value=1, value=int(st.session_state.prazo_meses), step=1,
+                                  disabled=restricao == "Teto de Exposição")
+    with col2:
+        faixa_lancamento = st.slider("% Vendas no Lançamento (faixa)", 0, 100,
+                                     (0, int(st.session_state.percentual_lancamento)))
+        faixa_prazo = st.slider("Prazo das Parcelas (faixa, meses)", 6, 120, (6, 120), step=6)
+        passo = st.select_slider("Degrau do Mix (%)", options=[10, 5, 2], value=5)
+
+    # Receita ponderada pelo lançamento: receitas descontadas pela taxa livre de risco a partir do mês 0
+    opcoes = dict(
+        exposicao_maxima=exposicao if restricao != "Mês Alvo de Payback" else None,
+        mes_payback=int(payback) if restricao != "Teto de Exposição" else None,
+        taxa_mensal_desconto=float(taxa_mensal(st.session_state.tlr / 100)),
+        passo=passo, faixa_lancamento=faixa_lancamento,
+        prazos_parcelas=tuple(range(faixa_prazo[0], faixa_prazo[1] + 1, 6)),
+    )
+    if st.button("Buscar Mix"):
+        tarefa = painel_tarefas.submeter(None, "otimizar_mix_vendas", otimizar_mix_vendas, base, **opcoes)
+    else:
+        tarefa = painel_tarefas.obter("otimizar_mix_vendas", base, **opcoes)
+
+    def mostrar_mixes(resultado, final):
+        if not final:
+            st.write(f"{resultado['avaliados']:,} de {resultado['total']:,} mixes avaliados")
+            return
+        st.write(f"{resultado['avaliados']:,} mixes avaliados ({resultado['mixes_por_segundo']:,.0f} por segundo), "
+                 f"{resultado['viaveis']:,} viáveis")
+        mixes = resultado['mixes']
+        if mixes.empty:
+            st.warning("Nenhum mix atende à restrição; relaxe o teto, o mês alvo ou as faixas")
+        else:
+            st.dataframe(mixes.rename(columns={
+                'percentual_lancamento': 'Lançamento (%)', 'percentual_baloes': 'Balões (%)',
+                'percentual_parcelas': 'Parcelas (%)', 'prazo_parcelas': 'Prazo das Parcelas',
+                'num_baloes': 'Nº de Balões', 'fim_baloes': 'Último Balão (% do prazo)',
+                'receita_ponderada': 'Receita Ponderada (milhões R$)', **METRICAS,
+            }).style.format(precision=2), hide_index=True)
+            rotulos = [f"{i + 1}º: {m.percentual_lancamento:.0f}/{m.percentual_baloes:.0f}/{m.percentual_parcelas:.0f}"
+                       for i, m in enumerate(mixes.itertuples())]
+            escolhido = st.selectbox("Mix a aplicar", rotulos)
+            st.button("Aplicar aos Parâmetros", on_click=aplicar_mix,
+                      args=(mixes.iloc[rotulos.index(escolhido)],))
+
+        fronteira = resultado['fronteira']
+        fig = go.Figure(go.Scatter(x=fronteira['exposicao_maxima'], y=fronteira['receita_ponderada'],
+                                   mode='lines+markers', name='Fronteira de Pareto',
+                                   text=[f"{m.percentual_lancamento:.0f}/{m.percentual_baloes:.0f}/"
+                                         f"{m.percentual_parcelas:.0f}" for m in fronteira.itertuples()]))
+        if opcoes['exposicao_maxima'] is not None:
+            fig.add_vline(x=opcoes['exposicao_maxima'], line_dash='dash', annotation_text='Teto')
+        fig.update_layout(xaxis_title=METRICAS['exposicao_maxima'], yaxis_title='Receita Ponderada (milhões R$)')
+        painel_desempenho.exibir_plotly(fig, "fronteira_mix", use_container_width=True)
+
+    painel_tarefas.acompanhar(tarefa, mostrar_mixes, "Mix de vendas")
+
+def aplicar_cenario(cenario):
+    # Os widgets da página Parâmetros leem os valores do session_state
+    for nome, valor in cenario['parametros'].items():
+        st.session_state[nome] = valor
+
+def mostrar_salvos():
+    st.header("Cenários Salvos")
+    st.write("Grava os parâmetros e o fluxo calculado para reabrir e comparar cenários sem recalcular.")
+
+    custo_construcao = st.session_state.vgv * st.session_state.custo_construcao_percentual / 100
+    fluxo_auto = calcular_fluxo_auto_financiado(
+        st.session_state.vgv, custo_construcao, st.session_state.prazo_meses, 
+        st.session_state.percentual_inicio, st.session_state.percentual_meio, st.session_state.percentual_fim,
+        st.session_state.percentual_lancamento, st.session_state.percentual_baloes, st.session_state.percentual_parcelas,
+        st.session_state.prazo_parcelas, st.session_state.num_baloes, st.session_state.fim_baloes
+    )
+    saldo_mensal = fluxo_auto['Saldo Mensal'].to_numpy()
+    indicadores = {METRICAS[nome]: float(valor[0])
+                   for nome, valor in constructa.fluxo.metricas_fluxos(saldo_mensal, st.session_state.vgv).items()}
+    tir_projeto, vpl_projeto = indicadores_financeiros(saldo_mensal)
+    indicadores['VPL (milhões R$)'] = vpl_projeto
+    indicadores['TIR do Projeto (% a.a.)'] = tir_projeto * 100
+
+    series = ['Receitas', 'Custos', 'Saldo Mensal', 'Saldo Acumulado']
+    painel_cenarios.mostrar_cenarios_salvos('cenarios', dict(
+        vgv=st.session_state.vgv, prazo=st.session_state.prazo_meses,
+        parametros={nome: st.session_state[nome] for nome in [*PARAMETROS, 'num_baloes', 'fim_baloes', 'tlr']},
+        series={serie: fluxo_auto[serie].to_numpy() for serie in series},
+        indicadores=indicadores,
+    ), aplicar_cenario, ('vgv', 'prazo'))
+
+def mostrar_resultados_lote():
+    st.header("Resultados em Lote")
+    st.write("Abre lotes de milhares de fluxos gravados em formato colunar sem carregá-los na memória.")
+    painel_resultados.mostrar_resultados_lote('cenarios')
+
+def mostrar_estresse():
+    st.header("Teste de Estresse")
+    st.write("Roda o projeto, a cota e a saída por dropdowns juntos sob atraso nas vendas, estouro de custo, "
+             "alta do índice e queda do ágio, e consolida o pior caso de cada indicador.")
+
+    # O projeto é o dos Parâmetros; a cota e a saída partem dos valores iniciais dos outros simuladores
+    cota, saida = dict(BASE_PADRAO['cota']), dict(BASE_PADRAO['saida'])
+    col1, col2 = st.columns(2)
+    with col1.expander("Cota (Simulador Constructa)"):
+        cota['principal'] = st.number_input("Valor do Crédito (R$)", min_value=10000.0, value=cota['principal'], step=10000.0, key="estresse_principal")
+        cota['months'] = int(st.number_input("Prazo da Cota (meses)", min_value=12, value=cota['months'], step=12, key="estresse_months"))
+        cota['admin_fee'] = st.number_input("Taxa de Administração Mensal (%)", min_value=0.0, value=cota['admin_fee'] * 100, step=0.01, key="estresse_admin_fee") / 100
+        cota['agio'] = st.number_input("Ágio dos Dropdowns (%)", min_value=0.0, value=cota['agio'], step=1.0, key="estresse_agio")
+        cota['correcao'] = 1 + st.number_input("Correção do Crédito (% por período)", value=(cota['correcao'] - 1) * 100, step=0.5, key="estresse_correcao") / 100
+        mes, valor = next(iter(cota['dropdowns'].items()))
+        mes = st.number_input("Mês do Dropdown da Cota", min_value=1, max_value=cota['months'], value=mes, key="estresse_mes_cota")
+        valor = st.number_input("Valor do Dropdown da Cota (R$)", min_value=0.0, value=valor, step=10000.0, key="estresse_valor_cota")
+        cota['dropdowns'] = {int(mes): valor} if valor else {}
+    with col2.expander("Saída (Constructa MVP)"):
+        saida['dnd'] = st.number_input("Dinheiro Novo Desejado (R$)", min_value=100000.0, value=saida['dnd'], step=10000.0, key="estresse_dnd")
+        saida['prazo'] = st.slider("Prazo da Saída (meses)", min_value=60, max_value=240, value=saida['prazo'], key="estresse_prazo")
+        mes, valor, agio = saida['estrategia'][0]
+        mes = st.number_input("Mês do Dropdown da Saída", min_value=1, max_value=saida['prazo'], value=mes, key="estresse_mes_saida")
+        valor = st.number_input("Valor do Dropdown da Saída (R$)", min_value=0.0, value=valor, step=10000.0, key="estresse_valor_saida")
+        agio = st.number_input("Ágio do Dropdown da Saída (%)", min_value=0.0, max_value=50.0, value=agio, step=1.0, key="estresse_agio_saida")
+        saida['estrategia'] = [(int(mes), valor, agio)]
+
+    projeto = {nome: st.session_state[nome] for nome in [*PARAMETROS, 'num_baloes', 'fim_baloes']}
+    painel_estresse.mostrar_estresse('cenarios', {'projeto': projeto, 'cota': cota, 'saida': saida})
+
+PAGINAS = {
+    "Home": mostrar_home,
+    "Parâmetros": mostrar_parametros,
+    "Fluxo de Caixa": mostrar_fluxo_caixa,
+    "Análise": mostrar_analise,
+    "Portfólio": mostrar_portfolio,
+    "Sensibilidade": mostrar_sensibilidade,
+    "Mix de Vendas": mostrar_mix_vendas,
+    "Cenários Salvos": mostrar_salvos,
+    "Resultados em Lote": mostrar_resultados_lote,
+    "Teste de Estresse": mostrar_estresse,
+}
+
+def main():
+    # Configuração da página
+    st.set_page_config(page_title="Análise de Fluxo de Caixa", layout="wide")
+    painel_desempenho.iniciar("cenarios")
+    aplicar_tema()
+
+    # Menu de navegação lateral
+    with st.sidebar:
+        selected = option_menu(
+            "Menu Principal", list(PAGINAS),
+            icons=["house", "gear", "cash", "graph-up", "collection", "grid-3x3", "sliders", "archive", "database", "exclamation-triangle"],
+            menu_icon="cast", default_index=0
+        )
+
+    inicializar_estado()
+
+    # Conteúdo principal
+    PAGINAS[selected]()
+
     st.sidebar.title("Sobre")
     st.sidebar.info(
         "Esta é uma aplicação de análise de fluxo de caixa "
         "para projetos imobiliários auto financiados. "
         "Desenvolvida com Streamlit e Altair."
     )
+    painel_desempenho.finalizar()
+
+if __name__ == "__main__":
+    main()
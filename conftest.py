@@ -0,0 +1 @@
+# Raiz do repositório no sys.path: os testes importam constructa e os módulos dos apps direto
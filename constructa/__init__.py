@@ -0,0 +1 @@
+# Núcleo de cálculo do Simulador Constructa, sem dependência de Streamlit
@@ -0,0 +1,3 @@
+from constructa.cli import main
+
+main()
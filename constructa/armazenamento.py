@@ -0,0 +1,155 @@
+import contextlib
+import datetime
+import io
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+CAMINHO_PADRAO = os.environ.get("CONSTRUCTA_CENARIOS_DB", "cenarios.db")
+
+# Colunas indexadas para busca por faixa; parâmetros e indicadores completos ficam em JSON
+# e as séries calculadas em um blob npz compactado, carregado só quando o cenário é aberto
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cenarios (
+    id INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    criado_em TEXT NOT NULL,
+    principal REAL,
+    prazo INTEGER,
+    vgv REAL,
+    parametros TEXT NOT NULL,
+    indicadores TEXT NOT NULL,
+    series BLOB NOT NULL,
+    UNIQUE (tipo, nome)
+);
+CREATE INDEX IF NOT EXISTS idx_cenarios_principal ON cenarios (tipo, principal);
+CREATE INDEX IF NOT EXISTS idx_cenarios_prazo ON cenarios (tipo, prazo);
+CREATE INDEX IF NOT EXISTS idx_cenarios_vgv ON cenarios (tipo, vgv);
+"""
+FAIXAS = ('principal', 'prazo', 'vgv')
+
+
+def serializar_series(series):
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **{nome: np.asarray(valores, dtype=np.float64) for nome, valores in series.items()})
+    return buffer.getvalue()
+
+
+def desserializar_series(blob):
+    with np.load(io.BytesIO(blob), allow_pickle=False) as arquivo:
+        return {nome: arquivo[nome] for nome in arquivo.files}
+
+
+def _json(valor):
+    # Chaves de dicionário viram texto no JSON (dropdowns {mês: valor}); números numpy viram float
+    return json.dumps(valor, ensure_ascii=False, default=float)
+
+
+def _numero(valor, tipo):
+    # O sqlite3 não aceita escalares numpy inteiros
+    return None if valor is None else tipo(valor)
+
+
+class RepositorioCenarios:
+    # Uma conexão por operação: o Streamlit atende cada sessão em uma thread diferente
+
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self.caminho = caminho
+        with self._conectar() as conexao:
+            conexao.executescript(ESQUEMA)
+
+    @contextlib.contextmanager
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=10)
+        conexao.row_factory = sqlite3.Row
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def salvar(self, nome, tipo, parametros, series, indicadores, principal=None, prazo=None, vgv=None):
+        # Salvar com um nome já usado no mesmo tipo substitui o cenário anterior
+        registro = (nome, tipo, datetime.datetime.now().isoformat(timespec='seconds'), _numero(principal, float),
+                    _numero(prazo, int), _numero(vgv, float), _json(parametros), _json(indicadores),
+                    serializar_series(series))
+        with self._conectar() as conexao:
+            cursor = conexao.execute(
+                "INSERT OR REPLACE INTO cenarios (nome, tipo, criado_em, principal, prazo, vgv, parametros, "
+                "indicadores, series) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", registro)
+            return cursor.lastrowid
+
+    def listar(self, tipo=None, limite=1000, **faixas):
+        # faixas: principal=(mín, máx), prazo=(mín, máx), vgv=(mín, máx); None deixa o lado aberto
+        condicoes, valores = [], []
+        if tipo is not None:
+            condicoes.append("tipo = ?")
+            valores.append(tipo)
+        for coluna, (minimo, maximo) in faixas.items():
+            if coluna not in FAIXAS:
+                raise ValueError(f"Faixa desconhecida: {coluna}")
+            if minimo is not None:
+                condicoes.append(f"{coluna} >= ?")
+                valores.append(minimo)
+            if maximo is not None:
+                condicoes.append(f"{coluna} <= ?")
+                valores.append(maximo)
+        onde = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        consulta = (f"SELECT id, nome, tipo, criado_em, principal, prazo, vgv, indicadores "
+                    f"FROM cenarios {onde} ORDER BY criado_em DESC, id DESC LIMIT ?")
+        with self._conectar() as conexao:
+            linhas = conexao.execute(consulta, valores + [limite]).fetchall()
+
+        tabela = pd.DataFrame([dict(linha) for linha in linhas],
+                              columns=['id', 'nome', 'tipo', 'criado_em', 'principal', 'prazo', 'vgv', 'indicadores'])
+        indicadores = pd.DataFrame([json.loads(texto) for texto in tabela.pop('indicadores')], index=tabela.index)
+        return pd.concat([tabela, indicadores], axis=1)
+
+    def carregar(self, identificador):
+        with self._conectar() as conexao:
+            linha = conexao.execute("SELECT * FROM cenarios WHERE id = ?", (int(identificador),)).fetchone()
+        if linha is None:
+            raise KeyError(f"Cenário {identificador} não encontrado")
+        cenario = dict(linha)
+        cenario['parametros'] = json.loads(cenario['parametros'])
+        cenario['indicadores'] = json.loads(cenario['indicadores'])
+        cenario['series'] = desserializar_series(cenario['series'])
+        return cenario
+
+    def excluir(self, identificador):
+        with self._conectar() as conexao:
+            conexao.execute("DELETE FROM cenarios WHERE id = ?", (int(identificador),))
+
+
+def comparar_cenarios(cenario_a, cenario_b):
+    # Parâmetros e indicadores lado a lado e séries alinhadas por mês (NaN onde uma termina antes)
+    chaves = list(dict.fromkeys([*cenario_a['parametros'], *cenario_b['parametros']]))
+    parametros = pd.DataFrame({
+        'A': [cenario_a['parametros'].get(chave) for chave in chaves],
+        'B': [cenario_b['parametros'].get(chave) for chave in chaves],
+    }, index=chaves, dtype=object)
+    parametros['Igual'] = [a == b for a, b in zip(parametros['A'], parametros['B'])]
+
+    chaves = list(dict.fromkeys([*cenario_a['indicadores'], *cenario_b['indicadores']]))
+    indicadores = pd.DataFrame({
+        'A': [cenario_a['indicadores'].get(chave, np.nan) for chave in chaves],
+        'B': [cenario_b['indicadores'].get(chave, np.nan) for chave in chaves],
+    }, index=chaves, dtype=np.float64)
+    indicadores['Diferença'] = indicadores['B'] - indicadores['A']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        indicadores['Diferença (%)'] = indicadores['Diferença'] / indicadores['A'].abs() * 100
+
+    series = {}
+    for nome in dict.fromkeys([*cenario_a['series'], *cenario_b['series']]):
+        a = cenario_a['series'].get(nome, np.empty(0))
+        b = cenario_b['series'].get(nome, np.empty(0))
+        tamanho = max(a.size, b.size)
+        tabela = pd.DataFrame({'A': np.pad(a, (0, tamanho - a.size), constant_values=np.nan),
+                               'B': np.pad(b, (0, tamanho - b.size), constant_values=np.nan)})
+        tabela['Diferença'] = tabela['B'] - tabela['A']
+        series[nome] = tabela
+    return {'parametros': parametros, 'indicadores': indicadores, 'series': series}
@@ -0,0 +1,124 @@
+import copy
+import functools
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Limites padrão, ajustáveis por variável de ambiente no servidor
+MAX_ITENS_PADRAO = int(os.environ.get("CONSTRUCTA_CACHE_MAX_ITENS", 256))
+MAX_MB_PADRAO = float(os.environ.get("CONSTRUCTA_CACHE_MAX_MB", 256))
+
+
+def congelar(valor):
+    # Normaliza argumentos em uma chave imutável (dicionários de dropdowns viram tuplas ordenadas)
+    if isinstance(valor, dict):
+        return tuple(sorted((congelar(k), congelar(v)) for k, v in valor.items()))
+    if isinstance(valor, (list, tuple)):
+        return tuple(congelar(v) for v in valor)
+    if isinstance(valor, np.ndarray):
+        return (valor.dtype.str, valor.shape, valor.tobytes())
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+def tamanho_estimado(valor):
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if hasattr(valor, 'memory_usage'):
+        # DataFrame do pandas, sem importar o pandas aqui
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(tamanho_estimado(v) for v in valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanho_estimado(v) for v in valor.values())
+    return sys.getsizeof(valor)
+
+
+class CacheLRU:
+    # Cache em memória do processo, compartilhado entre sessões e páginas do Streamlit
+
+    def __init__(self, max_itens=MAX_ITENS_PADRAO, max_bytes=MAX_MB_PADRAO * 1024 ** 2):
+        self.max_itens = max_itens
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def obter_ou_calcular(self, chave, funcao):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.hits += 1
+                return self._itens[chave][0]
+            self.misses += 1
+
+        # O cálculo roda fora do lock para não serializar as sessões
+        valor = funcao()
+        tamanho = tamanho_estimado(valor)
+        with self._lock:
+            if chave not in self._itens and tamanho <= self.max_bytes:
+                self._itens[chave] = (valor, tamanho)
+                self.bytes += tamanho
+                self._despejar()
+        return valor
+
+    def _despejar(self):
+        while self._itens and (len(self._itens) > self.max_itens or self.bytes > self.max_bytes):
+            _, (_, tamanho) = self._itens.popitem(last=False)
+            self.bytes -= tamanho
+            self.evictions += 1
+
+    def configurar(self, max_itens=None, max_bytes=None):
+        with self._lock:
+            if max_itens is not None:
+                self.max_itens = max_itens
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._despejar()
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.bytes = 0
+
+    def estatisticas(self):
+        total = self.hits + self.misses
+        return {
+            "itens": len(self._itens),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "taxa_acerto": self.hits / total if total else 0.0,
+        }
+
+
+# Instância única por processo: o módulo é importado uma vez pelo servidor Streamlit
+cache_global = CacheLRU()
+
+
+def memoizar(nome, cache=None):
+    # A chave usa um nome estável porque o Streamlit redefine as funções a cada rerun
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            alvo = cache if cache is not None else cache_global
+            chave = (nome, congelar(args), congelar(kwargs))
+            # Devolve uma cópia para que o chamador não altere o valor em cache
+            return copy.deepcopy(alvo.obter_ou_calcular(chave, lambda: funcao(*args, **kwargs)))
+        return envolvida
+    return decorador
+
+
+def estatisticas():
+    return cache_global.estatisticas()
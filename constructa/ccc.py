@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+PERCENTIS_CREDITO = (10, 50, 90)
+
+# Lances dos demais consorciados: {lance em % do crédito: fração do grupo}; 0 = não oferta lance
+LANCES_MERCADO = {0: 0.55, 10: 0.15, 20: 0.12, 30: 0.10, 40: 0.05, 50: 0.03}
+
+
+def _coortes(outros, lances_mercado):
+    # Contagens inteiras por nível de lance que somam exatamente o número de membros (maiores restos)
+    niveis = np.array(sorted(lances_mercado), dtype=np.float64)
+    fracoes = np.array([lances_mercado[nivel] for nivel in sorted(lances_mercado)], dtype=np.float64)
+    fracoes = fracoes / fracoes.sum() * outros
+    contagem = np.floor(fracoes).astype(np.int64)
+    contagem[np.argsort(contagem - fracoes, kind='stable')[:outros - contagem.sum()]] += 1
+    return niveis, contagem
+
+
+def _sortear(rng, restantes, quantidade):
+    # Sorteio sem reposição entre os não contemplados de todas as coortes, em todas as simulações
+    # de uma vez: hipergeométricas condicionais, coorte a coorte
+    sorteados = np.zeros_like(restantes)
+    restante_total = restantes.sum(axis=1)
+    quantidade = np.minimum(quantidade, restante_total)
+    for k in range(restantes.shape[1] - 1):
+        restante_total = restante_total - restantes[:, k]
+        sorteados[:, k] = rng.hypergeometric(restantes[:, k], restante_total, quantidade)
+        quantidade = quantidade - sorteados[:, k]
+    sorteados[:, -1] = quantidade
+    return sorteados
+
+
+def _lances(rng, restantes, grupos_lance, vagas):
+    # As vagas de lance vão para os maiores lances; empates no mesmo nível são sorteados
+    contemplados = np.zeros_like(restantes)
+    for coortes in grupos_lance:
+        disponiveis = restantes[:, coortes].sum(axis=1)
+        tomadas = np.minimum(vagas, disponiveis)
+        contemplados[:, coortes] = _sortear(rng, restantes[:, coortes], tomadas)
+        vagas = vagas - tomadas
+    return contemplados, vagas
+
+
+def simular_grupo(credito, prazo, num_membros, cotas=1, lance=0.0, lance_embutido=0.0, taxa_adm=15.0,
+                  lances_mercado=None, sorteios_por_mes=1, correcao_anual=0.0, num_simulacoes=2000, semente=0):
+    # Grupo de consórcio mês a mês. Os membros são agrupados em coortes pelo lance ofertado
+    # (a coorte 0 são as cotas do investidor), então o estado de cada simulação é só a contagem
+    # de não contemplados por coorte: o custo não depende do tamanho do grupo.
+    # A cada mês o fundo comum arrecada num_membros * crédito / prazo; primeiro há o sorteio,
+    # depois as vagas restantes vão aos maiores lances e a sobra volta para sorteio. O lance
+    # (pago ou embutido) fica no fundo. No último mês todos os restantes são contemplados.
+    if not 0 < cotas < num_membros:
+        raise ValueError("O número de cotas do investidor deve ser positivo e menor que o grupo")
+    lances_mercado = LANCES_MERCADO if lances_mercado is None else lances_mercado
+    niveis_mercado, contagem = _coortes(num_membros - cotas, lances_mercado)
+    niveis = np.r_[float(lance), niveis_mercado]
+    grupos_lance = [np.flatnonzero(niveis == nivel) for nivel in np.unique(niveis[niveis > 0])[::-1]]
+
+    rng = np.random.default_rng(semente)
+    restantes = np.tile(np.r_[cotas, contagem], (num_simulacoes, 1))
+    # Caixa em unidades de crédito: a correção anual atinge crédito e parcelas igualmente
+    caixa = np.zeros(num_simulacoes)
+    arrecadacao = num_membros / prazo
+    liquido_lance = 1 - niveis / 100
+
+    por_sorteio = np.zeros((num_simulacoes, prazo), dtype=np.int32)
+    por_lance = np.zeros((num_simulacoes, prazo), dtype=np.int32)
+    soma_meses = np.zeros(len(niveis))
+    for mes in range(prazo):
+        caixa += arrecadacao
+        if mes == prazo - 1:
+            vagas = restantes.sum(axis=1)
+        else:
+            vagas = np.minimum(np.floor(caixa + 1e-9).astype(np.int64), restantes.sum(axis=1))
+
+        sorteio = _sortear(rng, restantes, np.minimum(vagas, sorteios_por_mes))
+        restantes -= sorteio
+        vencedores_lance, sobra = _lances(rng, restantes, grupos_lance, vagas - sorteio.sum(axis=1))
+        restantes -= vencedores_lance
+        extra = _sortear(rng, restantes, sobra)
+        restantes -= extra
+        sorteio += extra
+        caixa -= sorteio.sum(axis=1) + vencedores_lance @ liquido_lance
+
+        por_sorteio[:, mes] = sorteio[:, 0]
+        por_lance[:, mes] = vencedores_lance[:, 0]
+        soma_meses += (mes + 1) * (sorteio + vencedores_lance).sum(axis=0)
+
+    # Valores nominais do investidor: crédito e parcelas corrigidos a cada 12 meses
+    fator = (1 + correcao_anual / 100) ** (np.arange(prazo) // 12)
+    credito_mes = credito * fator
+    embutido = lance / 100 * lance_embutido / 100
+    liberado = por_sorteio * credito_mes + por_lance * credito_mes * (1 - embutido)
+    lances_pagos = por_lance * credito_mes * (lance / 100 - embutido)
+    parcelas = np.cumsum(cotas * credito_mes * (1 + taxa_adm / 100) / prazo)
+    # O lance pago abate as últimas parcelas: o desembolso acumulado para no total devido
+    desembolso = np.minimum(parcelas + np.cumsum(lances_pagos, axis=1), parcelas[-1])
+
+    membros = np.r_[cotas, contagem]
+    coortes = pd.DataFrame({
+        'lance': niveis,
+        'membros': membros,
+        'investidor': np.arange(len(niveis)) == 0,
+        'mes_medio_contemplacao': soma_meses / (membros * num_simulacoes),
+    })
+    return {
+        'contemplacoes_sorteio': por_sorteio,
+        'contemplacoes_lance': por_lance,
+        'credito_acumulado': np.cumsum(liberado, axis=1),
+        'desembolso_acumulado': desembolso,
+        'coortes': coortes[coortes['membros'] > 0].reset_index(drop=True),
+    }
+
+
+def resumir_acumulo(resultado, dnd, percentis=PERCENTIS_CREDITO):
+    # Faixas de percentis do crédito acumulado por mês e mês em que o dinheiro novo desejado é atingido
+    credito = resultado['credito_acumulado']
+    prazo = credito.shape[1]
+    bandas = pd.DataFrame({'Mês': np.arange(1, prazo + 1)})
+    for p, serie in zip(percentis, np.percentile(credito, percentis, axis=0)):
+        bandas[f'P{p}'] = serie
+    bandas['Média'] = credito.mean(axis=0)
+    bandas['Desembolso'] = np.median(resultado['desembolso_acumulado'], axis=0)
+
+    contemplacoes = resultado['contemplacoes_sorteio'] + resultado['contemplacoes_lance']
+    primeira = np.argmax(contemplacoes > 0, axis=1) + 1
+    atingiu = credito[:, -1] >= dnd
+    mes_dnd = np.where(atingiu, np.argmax(credito >= dnd, axis=1) + 1, 0)
+    return {
+        'bandas': bandas,
+        'coortes': resultado['coortes'],
+        'mes_primeira_contemplacao': {p: float(v) for p, v in zip(percentis, np.percentile(primeira, percentis))},
+        'mes_dnd': {p: float(v) for p, v in zip(percentis, np.percentile(mes_dnd[atingiu], percentis))}
+        if atingiu.any() else {},
+        'prob_dnd': float(atingiu.mean()),
+        'fracao_lance': float(resultado['contemplacoes_lance'].sum() / max(contemplacoes.sum(), 1)),
+    }
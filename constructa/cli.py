@@ -0,0 +1,234 @@
+import argparse
+import json
+import sys
+import time
+
+# Medido antes de importar numpy/pandas para que --tempo mostre o custo da partida a frio
+INICIO = time.perf_counter()
+
+
+def _ler(caminho):
+    import pandas as pd
+
+    if caminho.endswith('.jsonl') or caminho.endswith('.ndjson'):
+        return pd.read_json(caminho, lines=True)
+    if caminho.endswith('.json'):
+        return pd.read_json(caminho)
+    if caminho.endswith('.csv'):
+        return pd.read_csv(caminho)
+    raise SystemExit(f"Formato de entrada não suportado: {caminho} (use .csv ou .jsonl)")
+
+
+def _escrever(tabela, caminho):
+    if caminho.endswith('.parquet'):
+        try:
+            tabela.to_parquet(caminho, index=False)
+        except ImportError as erro:
+            raise SystemExit(f"Saída em Parquet requer pyarrow ou fastparquet: {erro}")
+    elif caminho.endswith('.csv'):
+        tabela.to_csv(caminho, index=False)
+    else:
+        raise SystemExit(f"Formato de saída não suportado: {caminho} (use .csv ou .parquet)")
+
+
+def _dropdowns(valor):
+    # Coluna opcional: objeto JSON {mês: valor} (texto no CSV, dicionário no JSON lines)
+    if isinstance(valor, str):
+        valor = json.loads(valor) if valor.strip() else {}
+    if not isinstance(valor, dict):
+        return {}
+    return {int(mes): float(quantia) for mes, quantia in valor.items()}
+
+
+def _cronogramas_por_variante(tabela):
+    # Um calculate_payments_batch por variante; devolve as posições das linhas e as saídas do lote
+    import numpy as np
+    import pandas as pd
+
+    from constructa.pagamentos import calculate_payments_batch, empacotar_dropdowns
+    from constructa.regras import PLANOS
+
+    dropdowns = [_dropdowns(v) for v in tabela['dropdowns']] if 'dropdowns' in tabela else [{}] * len(tabela)
+    variante = tabela['variante'] if 'variante' in tabela else pd.Series('finance_app', index=tabela.index)
+    for nome_variante in variante.unique():
+        linhas = np.flatnonzero(variante.to_numpy() == nome_variante)
+        if nome_variante not in PLANOS:
+            raise SystemExit(f"Variante desconhecida: {nome_variante}")
+        parte = tabela.iloc[linhas]
+        meses, valores = empacotar_dropdowns([dropdowns[i] for i in linhas])
+        yield linhas, calculate_payments_batch(
+            parte['principal'], parte['months'], parte['admin_fee'], meses, valores, parte['agio'],
+            plano=PLANOS[nome_variante])
+
+
+def _conferir_cronogramas(tabela):
+    faltando = [c for c in ('principal', 'months', 'admin_fee', 'agio') if c not in tabela]
+    if faltando:
+        raise SystemExit(f"Colunas ausentes: {', '.join(faltando)}")
+
+
+def executar_cronogramas(tabela, series=False):
+    import numpy as np
+    import pandas as pd
+
+    _conferir_cronogramas(tabela)
+    resultado = tabela.drop(columns=['dropdowns'], errors='ignore').copy()
+    series_mensais = []
+    for linhas, (payments, balances, total_dropdown_value, total_agio, quitacao) in _cronogramas_por_variante(tabela):
+        parte = tabela.iloc[linhas]
+        soma_parcelas = np.nansum(payments, axis=1)
+        principal = parte['principal'].to_numpy(dtype=np.float64)
+        resultado.loc[parte.index, 'quitacao'] = quitacao
+        resultado.loc[parte.index, 'total_parcelas'] = soma_parcelas
+        resultado.loc[parte.index, 'total_dropdowns'] = total_dropdown_value
+        resultado.loc[parte.index, 'total_agio'] = total_agio
+        resultado.loc[parte.index, 'cet_total'] = (soma_parcelas / principal - 1) * 100
+        resultado.loc[parte.index, 'ganho_arbitragem'] = principal - (soma_parcelas + total_dropdown_value - total_agio)
+
+        if series:
+            linha, mes = np.nonzero(~np.isnan(payments))
+            series_mensais.append(pd.DataFrame({'linha': parte.index[linha], 'mes': mes + 1,
+                                                'parcela': payments[linha, mes], 'saldo': balances[linha, mes + 1]}))
+    if series:
+        return pd.concat(series_mensais, ignore_index=True)
+    resultado['quitacao'] = resultado['quitacao'].astype('int64')
+    return resultado
+
+
+def executar_fluxos(tabela, series=False):
+    import numpy as np
+    import pandas as pd
+
+    from constructa.fluxo import SERIES_FLUXO, fluxos_de_tabela, metricas_fluxos
+
+    try:
+        fluxos = fluxos_de_tabela(tabela)
+    except ValueError as erro:
+        raise SystemExit(str(erro))
+
+    if series:
+        linha, mes = np.nonzero(np.arange(fluxos['prazo_meses'].max())[None, :] < fluxos['prazo_meses'][:, None])
+        serie = pd.DataFrame({'linha': tabela.index[linha], 'Mês': mes + 1})
+        for nome in SERIES_FLUXO:
+            serie[nome] = fluxos[nome][linha, mes]
+        return serie
+
+    resultado = tabela.copy()
+    for chave, valor in metricas_fluxos(fluxos['Saldo Mensal'], tabela['vgv'].to_numpy(dtype=np.float64)).items():
+        resultado[chave] = valor
+    return resultado
+
+
+def executar_portfolio(caminho):
+    from constructa.portfolio import consolidar_portfolio
+
+    try:
+        consolidado, metricas = consolidar_portfolio(caminho)
+    except ValueError as erro:
+        raise SystemExit(str(erro))
+    print(json.dumps(metricas, ensure_ascii=False), file=sys.stderr)
+    return consolidado
+
+
+def executar_estresse(caminho, processos=None):
+    from constructa.estresse import executar_pacote, ler_pacote, piores_casos
+
+    try:
+        base, pacote = ler_pacote(caminho)
+        resultado = executar_pacote(base, pacote, processos=processos)
+    except (OSError, ValueError, KeyError) as erro:
+        raise SystemExit(f"Pacote de estresse inválido: {erro}")
+    # O pior caso de cada indicador vai para stderr; o arquivo de saída tem um cenário por linha
+    print(piores_casos(resultado).to_json(orient='records', force_ascii=False), file=sys.stderr)
+    return resultado
+
+
+def gravar_colunar(comando, tabela, caminho):
+    # Séries mensais de cada linha no formato colunar de constructa.resultados (um diretório
+    # *.colunar), calculadas e gravadas em pedaços: o lote inteiro nunca fica na memória
+    import numpy as np
+
+    from constructa.fluxo import SERIES_FLUXO, fluxos_de_tabela
+    from constructa.resultados import gravar_resultados
+
+    if comando == 'cronogramas':
+        _conferir_cronogramas(tabela)
+        series, horizonte = ('parcela', 'saldo'), int(tabela['months'].max())
+
+        def calcular(parte):
+            saida = {nome: np.full((len(parte), horizonte), np.nan) for nome in series}
+            for linhas, (payments, balances, *_) in _cronogramas_por_variante(parte):
+                saida['parcela'][linhas, :payments.shape[1]] = payments
+                saida['saldo'][linhas, :payments.shape[1]] = balances[:, 1:]
+            return saida
+    else:
+        series = SERIES_FLUXO
+        horizonte = int(tabela['prazo_meses'].max()) if 'prazo_meses' in tabela else 0
+
+        def calcular(parte):
+            # Meses depois do prazo de cada projeto ficam NaN, como os meses após a quitação das cotas
+            fluxos = fluxos_de_tabela(parte)
+            encerrado = np.arange(fluxos['Receitas'].shape[1])[None, :] >= fluxos['prazo_meses'][:, None]
+            return {nome: np.where(encerrado, np.nan, fluxos[nome]) for nome in series}
+
+    try:
+        gravar_resultados(caminho, tabela, series, horizonte, calcular)
+    except ValueError as erro:
+        raise SystemExit(str(erro))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m constructa',
+                                     description='Execução em lote dos simuladores Constructa, sem Streamlit.')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    cronogramas = subparsers.add_parser('cronogramas', help='cronogramas de pagamento das cotas (calculate_payments)')
+    fluxos = subparsers.add_parser('fluxos', help='fluxo de caixa auto financiado de cada projeto')
+    portfolio = subparsers.add_parser('portfolio', help='fluxo consolidado de um portfólio com lançamentos escalonados')
+    estresse = subparsers.add_parser('estresse', help='pacote de choques sobre o projeto, a cota e a saída')
+    for sub in (cronogramas, fluxos, portfolio, estresse):
+        sub.add_argument('entrada', help='arquivo de parâmetros (.csv ou .jsonl; portfolio só .csv; estresse, '
+                                         'pacote .json)')
+        sub.add_argument('saida', help='arquivo de resultados (.csv ou .parquet); em cronogramas e fluxos, um '
+                                       'diretório .colunar grava as séries mensais em formato colunar')
+        sub.add_argument('--tempo', action='store_true', help='mostra o tempo de cada etapa em stderr')
+    for sub in (cronogramas, fluxos):
+        sub.add_argument('--series', action='store_true', help='grava as séries mensais em vez do resumo por linha')
+    estresse.add_argument('--processos', type=int, default=None, help='processos do pool (padrão: um por CPU)')
+    args = parser.parse_args(argv)
+
+    tempos = {'partida': time.perf_counter() - INICIO}
+    marca = time.perf_counter()
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    tempos['importacao'] = time.perf_counter() - marca
+
+    marca = time.perf_counter()
+    if args.comando == 'portfolio':
+        resultado = executar_portfolio(args.entrada)
+    elif args.comando == 'estresse':
+        resultado = executar_estresse(args.entrada, args.processos)
+    else:
+        tabela = _ler(args.entrada)
+        tempos['leitura'] = time.perf_counter() - marca
+        marca = time.perf_counter()
+        if args.saida.rstrip('/').endswith('.colunar'):
+            # Cálculo e escrita intercalados, pedaço a pedaço
+            gravar_colunar(args.comando, tabela, args.saida)
+            resultado = None
+        else:
+            executar = executar_cronogramas if args.comando == 'cronogramas' else executar_fluxos
+            resultado = executar(tabela, series=args.series)
+    tempos['calculo'] = time.perf_counter() - marca
+
+    if resultado is not None:
+        marca = time.perf_counter()
+        _escrever(resultado, args.saida)
+        tempos['escrita'] = time.perf_counter() - marca
+
+    if args.tempo:
+        print(' '.join(f"{etapa}={duracao:.3f}s" for etapa, duracao in tempos.items()), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from constructa.fluxo import calcular_fluxos_lote, metricas_fluxos
+from constructa.metricas import fluxos_cota
+from constructa.pagamentos import calculate_payments_batch, empacotar_dropdowns
+from constructa.projecao import empacotar_estrategias, projetar_saldos, resumir_estrategias
+from constructa.regras import PLANOS, calendario_correcao
+
+# Choques aceitos em um pacote; cenários sem um deles ficam com 0 (sem choque):
+# - atraso_vendas: meses de atraso em todas as receitas do projeto e nos dropdowns da cota e da
+#   saída, que são pagos com o caixa das vendas; dropdowns empurrados para depois do prazo não
+#   são feitos e aparecem contados nos indicadores
+# - sobrecusto: estouro do custo de construção, em % do custo orçado
+# - choque_indice: pontos percentuais somados ao fator de cada correção da cota nos primeiros
+#   meses_indice meses (0 = no prazo todo)
+# - queda_agio: queda do ágio dos dropdowns da cota e da saída, em % (100 = ágio zerado)
+CHOQUES = {
+    'atraso_vendas': 'Atraso nas Vendas (meses)',
+    'sobrecusto': 'Estouro de Custo (%)',
+    'choque_indice': 'Alta do Índice (p.p. por correção)',
+    'meses_indice': 'Duração da Alta do Índice (meses)',
+    'queda_agio': 'Queda do Ágio (%)',
+}
+CHOQUES_INTEIROS = ('atraso_vendas', 'meses_indice')
+
+PACOTE_PADRAO = [
+    {'cenario': 'Base'},
+    {'cenario': 'Atraso de 6 meses nas vendas', 'atraso_vendas': 6},
+    {'cenario': 'Atraso de 12 meses nas vendas', 'atraso_vendas': 12},
+    {'cenario': 'Estouro de 15% no custo', 'sobrecusto': 15},
+    {'cenario': 'Estouro de 30% no custo', 'sobrecusto': 30},
+    {'cenario': 'Índice +5 p.p. por 3 anos', 'choque_indice': 5, 'meses_indice': 36},
+    {'cenario': 'Índice +10 p.p. no prazo todo', 'choque_indice': 10},
+    {'cenario': 'Ágio pela metade', 'queda_agio': 50},
+    {'cenario': 'Colapso do ágio', 'queda_agio': 100},
+    {'cenario': 'Combinado severo', 'atraso_vendas': 12, 'sobrecusto': 30, 'choque_indice': 10, 'queda_agio': 100},
+]
+
+# Ponto de partida dos três simuladores: o projeto de cenarios.py (mesmos nomes do session_state,
+# valores em milhões R$), a cota de finance_app.py e a saída por dropdowns de constructa_mvp.py
+BASE_PADRAO = {
+    'projeto': {
+        'vgv': 35.0, 'custo_construcao_percentual': 70, 'prazo_meses': 48,
+        'percentual_inicio': 30, 'percentual_meio': 40, 'percentual_fim': 30,
+        'percentual_lancamento': 20, 'percentual_baloes': 30, 'percentual_parcelas': 50,
+        'prazo_parcelas': 48, 'num_baloes': 3, 'fim_baloes': 100,
+    },
+    'cota': {
+        'principal': 5_000_000.0, 'months': 240, 'admin_fee': 0.0012, 'agio': 25.0, 'dropdowns': {12: 500_000.0},
+        'correcao': 1.05, 'meses_correcao': 12, 'parcela_minima': 500.0, 'variante': 'finance_app',
+    },
+    'saida': {
+        'dnd': 1_000_000.0, 'prazo': 200, 'estrategia': [(12, 100_000.0, 20.0)],
+    },
+}
+
+# Indicador: (rótulo, sentido do pior caso)
+INDICADORES = {
+    'exposicao_projeto': ('Exposição do Projeto (milhões R$)', 'max'),
+    'payback_projeto': ('Payback do Projeto (mês)', 'max'),
+    'exposicao_conjunta': ('Exposição Conjunta (milhões R$)', 'max'),
+    'quitacao_cota': ('Quitação da Cota (mês)', 'max'),
+    'cet_total': ('CET Total da Cota (%)', 'max'),
+    'ganho_arbitragem': ('Ganho na Arbitragem (R$)', 'min'),
+    'quitacao_saida': ('Quitação na Saída (mês)', 'max'),
+    'impacto_saida': ('Impacto dos Dropdowns na Saída (R$)', 'min'),
+    'dropdowns_fora_cota': ('Dropdowns da Cota Após o Prazo', 'max'),
+    'dropdowns_fora_saida': ('Dropdowns da Saída Após o Prazo', 'max'),
+}
+
+
+def montar_pacote(cenarios):
+    # Lista de dicionários {'cenario': nome, choque: valor} ou DataFrame com as mesmas colunas
+    tabela = pd.DataFrame(cenarios).copy()
+    desconhecidos = [c for c in tabela.columns if c != 'cenario' and c not in CHOQUES]
+    if desconhecidos:
+        raise ValueError(f"Choques desconhecidos: {', '.join(map(str, desconhecidos))}")
+    # Linhas sem nome (novas no editor do painel) recebem o nome padrão pela posição
+    nomes = tabela['cenario'] if 'cenario' in tabela else pd.Series([None] * len(tabela), index=tabela.index)
+    vazios = (nomes.isna() | (nomes.astype(str).str.strip() == '')).to_numpy()
+    tabela['cenario'] = np.where(vazios, [f"Cenário {i + 1}" for i in range(len(tabela))], nomes.astype(object))
+    for choque in CHOQUES:
+        tabela[choque] = pd.to_numeric(tabela[choque], errors='raise').fillna(0.0) if choque in tabela else 0.0
+    if (tabela[list(CHOQUES)] < 0).any().any():
+        raise ValueError("Os choques não podem ser negativos")
+    if (tabela['queda_agio'] > 100).any():
+        raise ValueError("A queda do ágio vai no máximo a 100%")
+    for choque in CHOQUES_INTEIROS:
+        tabela[choque] = np.rint(tabela[choque]).astype(np.int64)
+    tabela['cenario'] = tabela['cenario'].astype(str)
+    return tabela[['cenario', *CHOQUES]].reset_index(drop=True)
+
+
+def grade_choques(**niveis):
+    # Todas as combinações dos níveis de cada choque (produto cartesiano), com nomes legíveis
+    nomes = list(niveis)
+    cenarios = []
+    for combinacao in itertools.product(*(niveis[nome] for nome in nomes)):
+        rotulo = ', '.join(f"{nome}={valor:g}" for nome, valor in zip(nomes, combinacao) if valor)
+        cenarios.append({'cenario': rotulo or 'Base', **dict(zip(nomes, combinacao))})
+    return montar_pacote(cenarios)
+
+
+def ler_pacote(origem):
+    # Pacote em JSON: {"base": {"projeto": {...}, "cota": {...}, "saida": {...}}, "cenarios": [...],
+    # "grade": {choque: [níveis]}}; tudo opcional, o que faltar vem de BASE_PADRAO e PACOTE_PADRAO
+    if isinstance(origem, (str, os.PathLike)):
+        with open(origem, encoding='utf-8') as arquivo:
+            definicao = json.load(arquivo)
+    else:
+        definicao = json.load(origem)
+    base = {parte: dict(BASE_PADRAO[parte], **definicao.get('base', {}).get(parte, {})) for parte in BASE_PADRAO}
+    base['cota']['dropdowns'] = {int(mes): float(valor) for mes, valor in base['cota']['dropdowns'].items()}
+    base['saida']['estrategia'] = [tuple(dropdown) for dropdown in base['saida']['estrategia']]
+    partes = []
+    if 'cenarios' in definicao or 'grade' not in definicao:
+        partes.append(montar_pacote(definicao.get('cenarios', PACOTE_PADRAO)))
+    if 'grade' in definicao:
+        partes.append(grade_choques(**definicao['grade']))
+    return base, pd.concat(partes, ignore_index=True)
+
+
+def _projeto(projeto, choques):
+    # Fluxo auto financiado de cada cenário, em milhões R$, com as receitas deslocadas pelo atraso
+    atraso = choques['atraso_vendas'].to_numpy()
+    vgv = float(projeto['vgv'])
+    custo = vgv * projeto['custo_construcao_percentual'] / 100 * (1 + choques['sobrecusto'].to_numpy() / 100)
+    fluxos = calcular_fluxos_lote(
+        vgv, custo, projeto['prazo_meses'],
+        projeto['percentual_inicio'], projeto['percentual_meio'], projeto['percentual_fim'],
+        projeto['percentual_lancamento'], projeto['percentual_baloes'], projeto['percentual_parcelas'],
+        projeto['prazo_parcelas'], projeto.get('num_baloes', 3), projeto.get('fim_baloes', 100))
+    receitas, custos = fluxos['Receitas'], fluxos['Custos']
+    horizonte = receitas.shape[1]
+    largura = horizonte + int(atraso.max(initial=0))
+    origem = np.arange(largura)[None, :] - atraso[:, None]
+    valido = (origem >= 0) & (origem < horizonte)
+    deslocadas = np.where(valido, receitas[np.arange(len(atraso))[:, None], np.clip(origem, 0, horizonte - 1)], 0.0)
+    saldo = deslocadas - np.pad(custos, ((0, 0), (0, largura - horizonte)))
+    metricas = metricas_fluxos(saldo, np.full(len(atraso), vgv))
+    return saldo, metricas
+
+
+def _adiar(meses, atraso, prazo):
+    # Mesma regra para a cota e a saída: o dropdown anda com o atraso das vendas e, se passar do
+    # prazo, não é feito (mês 0 = vazio); devolve também quantos ficaram de fora por cenário
+    adiados = np.where(meses > 0, meses + atraso[:, None], 0)
+    fora = adiados > prazo
+    return np.where(fora, 0, adiados), fora.sum(axis=1)
+
+
+def _cota(cota, choques):
+    # Cronograma da cota de cada cenário: correção com a alta do índice nos primeiros meses,
+    # dropdowns adiados pelo atraso das vendas e ágio reduzido
+    n = len(choques)
+    plano = dict(PLANOS[cota.get('variante', 'finance_app')], correcao=cota['correcao'],
+                 meses_correcao=cota['meses_correcao'], parcela_minima=cota['parcela_minima'])
+    calendario = calendario_correcao(plano, int(cota['months']))
+    meses_indice = choques['meses_indice'].to_numpy()
+    com_choque = (meses_indice[:, None] == 0) | (calendario[None, :] <= meses_indice[:, None])
+    correcao = np.full((n, max(calendario.size, 1)), float(cota['correcao']))
+    correcao[:, :calendario.size] += np.where(com_choque, choques['choque_indice'].to_numpy()[:, None] / 100, 0.0)
+
+    meses, valores = empacotar_dropdowns([cota['dropdowns']])
+    meses, fora = _adiar(meses, choques['atraso_vendas'].to_numpy(), int(cota['months']))
+    valores = np.broadcast_to(valores, meses.shape)
+    agio = cota['agio'] * (1 - choques['queda_agio'].to_numpy() / 100)
+    payments, _, total_dropdown_value, total_agio, quitacao = calculate_payments_batch(
+        cota['principal'], cota['months'], cota['admin_fee'], meses, valores, agio, plano=dict(plano, correcao=correcao))
+
+    # Mesmas fórmulas da Análise de Arbitragem; sem ágio como receita ele só reduz o saldo
+    soma_parcelas = np.nansum(payments, axis=1)
+    recebido = total_agio if plano['agio_como_receita'] else 0.0
+    fluxos = fluxos_cota(cota['principal'], payments, meses, valores, agio, plano['agio_como_receita'], quitacao)
+    return fluxos, {
+        'quitacao_cota': quitacao,
+        'cet_total': (soma_parcelas / cota['principal'] - 1) * 100,
+        'ganho_arbitragem': cota['principal'] - (soma_parcelas + total_dropdown_value - recebido),
+        'dropdowns_fora_cota': fora,
+    }
+
+
+def _saida(saida, choques):
+    # Saída por dropdowns de constructa_mvp.py: meses adiados pelo atraso e ágio reduzido
+    prazo = int(saida['prazo'])
+    meses, valores, agios = empacotar_estrategias([saida['estrategia']])
+    meses, fora = _adiar(meses, choques['atraso_vendas'].to_numpy(), prazo)
+    valores = np.broadcast_to(valores, meses.shape)
+    agios = agios * (1 - choques['queda_agio'].to_numpy()[:, None] / 100)
+    _, saldo_com = projetar_saldos(saida['dnd'], prazo, meses, valores, agios)
+    resumo = resumir_estrategias(saldo_com, meses, valores, agios)
+
+    # Desembolso dos dropdowns no mês em que são pagos
+    desembolso = np.zeros((len(choques), prazo + 1))
+    linhas, colunas = np.nonzero(meses >= 1)
+    np.add.at(desembolso, (linhas, meses[linhas, colunas]), valores[linhas, colunas])
+    return -desembolso, {'quitacao_saida': resumo['mes_quitacao'], 'impacto_saida': resumo['impacto'],
+                         'dropdowns_fora_saida': fora}
+
+
+def avaliar_choques(base, choques):
+    # Os três simuladores sob cada cenário do pacote, todos vetorizados sobre os cenários.
+    # A exposição conjunta soma, mês a mês e em milhões R$, o caixa do projeto, os fluxos da cota
+    # (crédito no lançamento, parcelas, dropdowns e ágio) e o desembolso dos dropdowns da saída
+    saldo_projeto, metricas_projeto = _projeto(base['projeto'], choques)
+    fluxos, indicadores_cota = _cota(base['cota'], choques)
+    desembolso, indicadores_saida = _saida(base['saida'], choques)
+
+    largura = max(saldo_projeto.shape[1], fluxos.shape[1], desembolso.shape[1])
+    conjunto = np.zeros((len(choques), largura))
+    conjunto[:, :saldo_projeto.shape[1]] += saldo_projeto
+    conjunto[:, :fluxos.shape[1]] += fluxos / 1e6
+    conjunto[:, :desembolso.shape[1]] += desembolso / 1e6
+
+    # Payback 0 (o projeto nunca se paga) vira NaN para não passar por melhor caso
+    payback = metricas_projeto['mes_payback'].astype(np.float64)
+    payback[payback == 0] = np.nan
+    return pd.DataFrame({
+        'exposicao_projeto': metricas_projeto['exposicao_maxima'],
+        'payback_projeto': payback,
+        'exposicao_conjunta': -np.cumsum(conjunto, axis=1).min(axis=1),
+        **indicadores_cota,
+        **indicadores_saida,
+    })
+
+
+def _bloco(argumentos):
+    # Executado nos processos do pool
+    base, choques = argumentos
+    return avaliar_choques(base, choques)
+
+
+def executar_pacote(base, pacote, tamanho_bloco=256, processos=None, progresso=None):
+    # Avalia o pacote em blocos de cenários espalhados por um pool de processos; o resultado não
+    # depende do número de processos. Devolve uma linha por cenário com os choques e os indicadores.
+    # progresso(fração, parcial): chamado a cada bloco com a tabela dos cenários já avaliados
+    pacote = montar_pacote(pacote)
+    tarefas = [(base, pacote.iloc[inicio:inicio + tamanho_bloco])
+               for inicio in range(0, len(pacote), tamanho_bloco)]
+    partes = []
+
+    def acumular(parte):
+        partes.append(parte)
+        if progresso is not None:
+            avaliados = sum(len(p) for p in partes)
+            progresso(avaliados / len(pacote), pd.concat([pacote.iloc[:avaliados], pd.concat(partes, ignore_index=True)],
+                                                         axis=1))
+
+    processos = processos or os.cpu_count() or 1
+    if processos == 1 or len(tarefas) <= 1:
+        for tarefa in tarefas:
+            acumular(_bloco(tarefa))
+    else:
+        # Se o progresso interromper o pacote, os blocos ainda na fila são descartados
+        pool = ProcessPoolExecutor(max_workers=min(processos, len(tarefas)))
+        try:
+            for parte in pool.map(_bloco, tarefas):
+                acumular(parte)
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    indicadores = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=list(INDICADORES))
+    return pd.concat([pacote, indicadores], axis=1)
+
+
+def piores_casos(resultado):
+    # Tabela consolidada: pior valor de cada indicador, o cenário que o produz e a variação sobre a
+    # base (cenário sem nenhum choque; o primeiro do pacote se não houver)
+    sem_choque = (resultado[list(CHOQUES)] == 0).all(axis=1).to_numpy()
+    base = resultado.iloc[int(sem_choque.argmax()) if sem_choque.any() else 0]
+    linhas = []
+    for indicador, (rotulo, sentido) in INDICADORES.items():
+        valores = resultado[indicador].to_numpy(dtype=np.float64)
+        # NaN (payback que nunca acontece) é sempre o pior
+        ordem = np.where(np.isnan(valores), np.inf, valores if sentido == 'max' else -valores)
+        pior = int(ordem.argmax())
+        linhas.append({
+            'indicador': rotulo,
+            'base': base[indicador],
+            'pior': valores[pior],
+            'cenario': resultado['cenario'].iloc[pior],
+            'variacao': valores[pior] - base[indicador],
+        })
+    return pd.DataFrame(linhas)
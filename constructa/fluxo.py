@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+SERIES_FLUXO = ['Receitas', 'Custos', 'Saldo Mensal', 'Saldo Acumulado']
+
+
+def calcular_fluxos_lote(vgv, custo_construcao, prazo_meses,
+                         percentual_inicio, percentual_meio, percentual_fim,
+                         percentual_lancamento, percentual_baloes, percentual_parcelas,
+                         prazo_parcelas, num_baloes=3, fim_baloes=100):
+    # Fluxo auto financiado de vários projetos de uma vez: cada parâmetro é um escalar ou um
+    # vetor com um valor por projeto. Devolve matrizes float64 projeto x mês; meses além do
+    # prazo de cada projeto ficam zerados (e o saldo acumulado constante).
+    # Os balões são igualmente espaçados até fim_baloes % do prazo (100 = ao longo de toda a obra).
+    parametros = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(p, dtype=np.float64)) for p in (
+            vgv, custo_construcao, percentual_inicio, percentual_meio, percentual_fim,
+            percentual_lancamento, percentual_baloes, percentual_parcelas, fim_baloes)),
+        np.atleast_1d(np.asarray(prazo_meses, dtype=np.int64)),
+        np.atleast_1d(np.asarray(prazo_parcelas, dtype=np.int64)),
+        np.atleast_1d(np.asarray(num_baloes, dtype=np.int64)),
+    )
+    (vgv, custo_construcao, percentual_inicio, percentual_meio, percentual_fim,
+     percentual_lancamento, percentual_baloes, percentual_parcelas, fim_baloes,
+     prazo_meses, prazo_parcelas, num_baloes) = (p.ravel() for p in parametros)
+    n = vgv.size
+    horizonte = int(prazo_meses.max()) if n else 0
+    linhas = np.arange(n)
+    mes = np.arange(horizonte)[None, :]
+
+    # Custos em três terços da obra, o último absorvendo o resto da divisão
+    tercio_obra = prazo_meses // 3
+    with np.errstate(divide='ignore', invalid='ignore'):
+        custo_inicio = custo_construcao * percentual_inicio / 100 / tercio_obra
+        custo_meio = custo_construcao * percentual_meio / 100 / tercio_obra
+    custo_fim = custo_construcao * percentual_fim / 100 / (prazo_meses - 2 * tercio_obra)
+    custos = np.where(mes < tercio_obra[:, None], custo_inicio[:, None],
+                      np.where(mes < 2 * tercio_obra[:, None], custo_meio[:, None],
+                               np.where(mes < prazo_meses[:, None], custo_fim[:, None], 0.0)))
+
+    # Receitas somadas na mesma ordem do modelo original: lançamento, balões, parcelas
+    receitas = np.zeros((n, horizonte))
+    receitas[:, 0] += vgv * percentual_lancamento / 100
+
+    valor_baloes = vgv * percentual_baloes / 100
+    limite_baloes = np.clip(np.rint(prazo_meses * fim_baloes / 100).astype(np.int64), 1, prazo_meses)
+    for i in range(1, int(num_baloes.max(initial=0)) + 1):
+        tem_balao = num_baloes >= i
+        mes_balao = i * limite_baloes[tem_balao] // (num_baloes[tem_balao] + 1)
+        np.add.at(receitas, (linhas[tem_balao], mes_balao), valor_baloes[tem_balao] / num_baloes[tem_balao])
+
+    meses_parcelas = np.minimum(prazo_parcelas, prazo_meses)
+    parcela_mensal = vgv * percentual_parcelas / 100 / meses_parcelas
+    receitas += np.where(mes < meses_parcelas[:, None], parcela_mensal[:, None], 0.0)
+
+    saldo_mensal = receitas - custos
+    return {
+        'Receitas': receitas,
+        'Custos': custos,
+        'Saldo Mensal': saldo_mensal,
+        'Saldo Acumulado': np.cumsum(saldo_mensal, axis=1),
+        'prazo_meses': prazo_meses,
+    }
+
+
+# Colunas de parâmetros aceitas em tabelas de projetos (CSV do portfólio, linha de comando);
+# num_baloes e fim_baloes são opcionais
+COLUNAS_PARAMETROS = ['vgv', 'prazo_meses', 'percentual_inicio', 'percentual_meio', 'percentual_fim',
+                      'percentual_lancamento', 'percentual_baloes', 'percentual_parcelas', 'prazo_parcelas']
+
+
+def fluxos_de_tabela(tabela):
+    # Avalia uma tabela com um projeto por linha. O custo pode vir em valor absoluto
+    # (custo_construcao) ou como % do VGV (custo_construcao_percentual); num_baloes e fim_baloes são opcionais.
+    faltando = [c for c in COLUNAS_PARAMETROS if c not in tabela]
+    if 'custo_construcao' not in tabela and 'custo_construcao_percentual' not in tabela:
+        faltando.append('custo_construcao_percentual')
+    if faltando:
+        raise ValueError(f"Colunas ausentes: {', '.join(faltando)}")
+
+    if 'custo_construcao' in tabela:
+        custo_construcao = tabela['custo_construcao']
+    else:
+        custo_construcao = tabela['vgv'] * tabela['custo_construcao_percentual'] / 100
+    return calcular_fluxos_lote(
+        tabela['vgv'], custo_construcao, tabela['prazo_meses'],
+        tabela['percentual_inicio'], tabela['percentual_meio'], tabela['percentual_fim'],
+        tabela['percentual_lancamento'], tabela['percentual_baloes'], tabela['percentual_parcelas'],
+        tabela['prazo_parcelas'], tabela['num_baloes'] if 'num_baloes' in tabela else 3,
+        tabela['fim_baloes'] if 'fim_baloes' in tabela else 100,
+    )
+
+
+def fluxo_para_dataframe(fluxos, projeto=0):
+    # Borda de apresentação: DataFrame de um único projeto no formato das páginas
+    prazo = int(fluxos['prazo_meses'][projeto])
+    fluxo = pd.DataFrame({'Mês': np.arange(1, prazo + 1)})
+    for serie in SERIES_FLUXO:
+        fluxo[serie] = fluxos[serie][projeto, :prazo]
+    return fluxo
+
+
+def calcular_fluxo_auto_financiado(vgv, custo_construcao, prazo_meses,
+                                   percentual_inicio, percentual_meio, percentual_fim,
+                                   percentual_lancamento, percentual_baloes, percentual_parcelas,
+                                   prazo_parcelas, num_baloes=3, fim_baloes=100):
+    # Fluxo de um único projeto no formato usado pelas páginas de cenarios.py
+    fluxos = calcular_fluxos_lote(vgv, custo_construcao, prazo_meses,
+                                  percentual_inicio, percentual_meio, percentual_fim,
+                                  percentual_lancamento, percentual_baloes, percentual_parcelas,
+                                  prazo_parcelas, num_baloes, fim_baloes)
+    return fluxo_para_dataframe(fluxos)
+
+
+def metricas_fluxos(saldo_mensal, vgv):
+    # Métricas da página "Análise" para cada linha de uma matriz de saldos mensais.
+    # mes_payback = 0 quando o saldo acumulado nunca fica positivo.
+    saldo_mensal = np.atleast_2d(saldo_mensal)
+    saldo_acumulado = np.cumsum(saldo_mensal, axis=1)
+    lucro_total = saldo_mensal.sum(axis=1)
+    positivo = saldo_acumulado > 0
+    return {
+        'lucro_total': lucro_total,
+        'margem': lucro_total / vgv * 100,
+        'exposicao_maxima': -saldo_acumulado.min(axis=1),
+        'mes_payback': np.where(positivo.any(axis=1), positivo.argmax(axis=1) + 1, 0),
+    }
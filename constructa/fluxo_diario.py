@@ -0,0 +1,146 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Arquivo local de feriados (CSV com uma data por linha); sem ele só os fins de semana não são úteis
+CAMINHO_FERIADOS = os.environ.get("CONSTRUCTA_FERIADOS", "feriados.csv")
+SERIES_DIARIAS = ['Receitas', 'Custos', 'Saldo Diário', 'Saldo Acumulado']
+
+
+def carregar_feriados(origem=None, coluna=None):
+    # Datas em ISO (2025-12-25) ou no formato brasileiro (25/12/2025); coluna=None usa a primeira.
+    # Sem origem, lê CAMINHO_FERIADOS se existir
+    if origem is None:
+        if not os.path.exists(CAMINHO_FERIADOS):
+            return np.array([], dtype='datetime64[D]')
+        origem = CAMINHO_FERIADOS
+    tabela = pd.read_csv(origem, dtype=str)
+    textos = tabela[coluna or tabela.columns[0]].dropna().str.strip()
+    formato = '%d/%m/%Y' if textos.str.contains('/').any() else 'ISO8601'
+    try:
+        datas = pd.to_datetime(textos, format=formato)
+    except ValueError as erro:
+        raise ValueError(f"Data de feriado inválida: {erro}")
+    return np.unique(datas.to_numpy().astype('datetime64[D]'))
+
+
+def calendario_util(feriados=()):
+    # Segunda a sexta, menos os feriados
+    return np.busdaycalendar(weekmask='1111100', holidays=np.asarray(feriados, dtype='datetime64[D]'))
+
+
+def curva_fases(custos, duracoes=None):
+    # Curva acumulada de custos em fases: custos em % do custo total por fase e durações relativas
+    # (iguais por padrão); o gasto é uniforme dentro de cada fase. Devolve (tempos, acumulado),
+    # com tempo de 0 a 1 ao longo da obra
+    custos = np.asarray(custos, dtype=np.float64)
+    duracoes = np.ones(custos.size) if duracoes is None else np.asarray(duracoes, dtype=np.float64)
+    if custos.size != duracoes.size or not custos.size:
+        raise ValueError("Informe um custo e uma duração para cada fase")
+    if (duracoes <= 0).any() or (custos < 0).any():
+        raise ValueError("Durações precisam ser positivas e custos não negativos")
+    return np.r_[0.0, np.cumsum(duracoes) / duracoes.sum()], np.r_[0.0, np.cumsum(custos) / 100]
+
+
+def curva_logistica(inclinacao=10.0, pontos=101):
+    # Curva S clássica de obra: gasto lento no início e no fim, concentrado no meio
+    tempos = np.linspace(0.0, 1.0, pontos)
+    s = 1 / (1 + np.exp(-inclinacao * (tempos - 0.5)))
+    return tempos, (s - s[0]) / (s[-1] - s[0])
+
+
+def _validar_curva(curva):
+    tempos, acumulado = (np.asarray(eixo, dtype=np.float64) for eixo in curva)
+    if tempos.size != acumulado.size or tempos.size < 2:
+        raise ValueError("A curva precisa de pelo menos dois pontos (tempo, acumulado)")
+    if tempos[0] != 0 or tempos[-1] != 1 or (np.diff(tempos) < 0).any() or (np.diff(acumulado) < 0).any():
+        raise ValueError("A curva precisa ir do tempo 0 ao 1 com custo acumulado não decrescente")
+    return tempos, acumulado
+
+
+def _vencimentos(inicio, meses, dia):
+    # Data do mês `inicio + m` no dia `dia` (limitado ao fim do mês e nunca antes do início)
+    mes = inicio.astype('datetime64[M]') + np.asarray(meses, dtype=np.int64)
+    primeiro = mes.astype('datetime64[D]')
+    dias_no_mes = ((mes + 1).astype('datetime64[D]') - primeiro).astype(np.int64)
+    return np.maximum(primeiro + np.minimum(dia, dias_no_mes) - 1, inicio)
+
+
+def calcular_fluxo_diario(vgv, custo_construcao, prazo_meses,
+                          percentual_lancamento, percentual_baloes, percentual_parcelas,
+                          prazo_parcelas, num_baloes=3, fim_baloes=100, data_inicio='2025-01-01',
+                          curva=None, dia_vencimento=None, feriados=()):
+    # Fluxo auto financiado dia a dia a partir de data_inicio. As receitas seguem o calendário mensal
+    # de calcular_fluxos_lote (lançamento no início, balões e parcelas nos mesmos meses), vencendo no
+    # dia_vencimento de cada mês (o dia de data_inicio por padrão) e pagas no dia útil seguinte quando
+    # caem em fim de semana ou feriado. Os custos correm nos dias úteis da obra seguindo a curva
+    # (tempos, acumulado) de curva_fases/curva_logistica; None = 30/40/30 em terços.
+    # Devolve um DataFrame com uma linha por dia corrido.
+    inicio = np.datetime64(data_inicio, 'D')
+    dia = int(dia_vencimento or (inicio - inicio.astype('datetime64[M]').astype('datetime64[D]')).astype(int) + 1)
+    calendario = calendario_util(feriados)
+    tempos, acumulado = _validar_curva(curva_fases((30, 40, 30)) if curva is None else curva)
+    fim_obra = _vencimentos(inicio, prazo_meses, inicio.astype(object).day)
+
+    # Receitas: (mês do fluxo mensal, valor); o lançamento vence no próprio início
+    meses_parcelas = min(int(prazo_parcelas), int(prazo_meses))
+    limite_baloes = int(np.clip(np.rint(prazo_meses * fim_baloes / 100), 1, prazo_meses))
+    meses_baloes = np.arange(1, num_baloes + 1) * limite_baloes // (num_baloes + 1)
+    valor_baloes = vgv * percentual_baloes / 100 / num_baloes if num_baloes else 0.0
+    meses_receita = np.r_[np.arange(meses_parcelas), meses_baloes]
+    valores_receita = np.r_[np.full(meses_parcelas, vgv * percentual_parcelas / 100 / max(meses_parcelas, 1)),
+                            np.full(meses_baloes.size, valor_baloes)]
+    datas_receita = np.r_[inicio, _vencimentos(inicio, meses_receita, dia)]
+    datas_receita = np.busday_offset(datas_receita, 0, roll='following', busdaycal=calendario)
+    valores_receita = np.r_[vgv * percentual_lancamento / 100, valores_receita]
+
+    # Custos: a curva é lida na posição de cada dia útil da obra
+    dias_obra = np.arange(inicio, fim_obra, dtype='datetime64[D]')
+    dias_obra = dias_obra[np.is_busday(dias_obra, busdaycal=calendario)]
+    posicoes = np.arange(dias_obra.size + 1) / max(dias_obra.size, 1)
+    custos_dia = custo_construcao * np.diff(np.interp(posicoes, tempos, acumulado))
+
+    horizonte = int((max(datas_receita.max(), fim_obra - 1) - inicio).astype(np.int64)) + 1
+    receitas = np.zeros(horizonte)
+    custos = np.zeros(horizonte)
+    # add.at soma receitas que caem no mesmo dia útil
+    np.add.at(receitas, (datas_receita - inicio).astype(np.int64), valores_receita)
+    custos[(dias_obra - inicio).astype(np.int64)] = custos_dia
+    saldo = receitas - custos
+    return pd.DataFrame({
+        'Data': np.arange(inicio, inicio + horizonte, dtype='datetime64[D]'),
+        'Receitas': receitas,
+        'Custos': custos,
+        'Saldo Diário': saldo,
+        'Saldo Acumulado': np.cumsum(saldo),
+    })
+
+
+def agregar_mensal(diario):
+    # Volta ao formato mensal de fluxo_para_dataframe: o mês m vai de início + (m - 1) meses até o
+    # dia anterior a início + m meses
+    datas = diario['Data'].to_numpy().astype('datetime64[D]')
+    inicio = datas[0]
+    meses_totais = int((datas[-1].astype('datetime64[M]') - inicio.astype('datetime64[M]')).astype(np.int64)) + 2
+    limites = _vencimentos(inicio, np.arange(meses_totais), inicio.astype(object).day)
+    mes = np.searchsorted(limites, datas, side='right') - 1
+    num_meses = int(mes.max()) + 1
+    fluxo = pd.DataFrame({'Mês': np.arange(1, num_meses + 1)})
+    fluxo['Receitas'] = np.bincount(mes, weights=diario['Receitas'].to_numpy(), minlength=num_meses)
+    fluxo['Custos'] = np.bincount(mes, weights=diario['Custos'].to_numpy(), minlength=num_meses)
+    fluxo['Saldo Mensal'] = fluxo['Receitas'] - fluxo['Custos']
+    fluxo['Saldo Acumulado'] = fluxo['Saldo Mensal'].cumsum()
+    return fluxo
+
+
+def metricas_diarias(diario):
+    # Pico de exposição de caixa no dia a dia e a data em que ocorre
+    acumulado = diario['Saldo Acumulado'].to_numpy()
+    pior = int(acumulado.argmin())
+    positivo = acumulado > 0
+    return {
+        'exposicao_maxima': float(max(0.0, -acumulado[pior])),
+        'data_exposicao_maxima': diario['Data'].iloc[pior],
+        'data_payback': diario['Data'].iloc[int(positivo.argmax())] if positivo.any() else None,
+    }
@@ -0,0 +1,100 @@
+import contextlib
+import contextvars
+import datetime
+import functools
+import json
+import os
+import time
+
+from constructa.cache import estatisticas
+
+# Instrumentação opcional por rerun: desligada, etapa() e medir() não fazem nada além de
+# consultar o ContextVar, então podem ficar permanentemente nos apps
+VARIAVEL_ATIVACAO = "CONSTRUCTA_INSTRUMENTAR"
+VARIAVEL_LOG = "CONSTRUCTA_INSTRUMENTAR_LOG"
+
+# Cada sessão do Streamlit roda o script na sua própria thread, com o seu medidor
+_atual = contextvars.ContextVar("constructa_medidor", default=None)
+
+
+def ativo_por_ambiente():
+    return os.environ.get(VARIAVEL_ATIVACAO, "").strip().lower() not in ("", "0", "false", "nao", "não")
+
+
+class Medidor:
+    # Tempos por etapa, tamanho das cargas enviadas ao navegador e acertos de cache de um rerun
+
+    def __init__(self, pagina):
+        self.pagina = pagina
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self.cargas = []
+        self._cache_inicial = estatisticas()
+
+    def registrar_etapa(self, nome, duracao):
+        chamadas, total = self.etapas.get(nome, (0, 0.0))
+        self.etapas[nome] = (chamadas + 1, total + duracao)
+
+    def registrar_carga(self, nome, tamanho):
+        self.cargas.append({"grafico": nome, "bytes": int(tamanho)})
+
+    def resumo(self):
+        cache = estatisticas()
+        # O cache é do processo: com várias sessões simultâneas a diferença inclui as outras
+        variacao = {chave: cache[chave] - self._cache_inicial[chave] for chave in ("hits", "misses", "evictions")}
+        return {
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "pagina": self.pagina,
+            "duracao_total_s": time.perf_counter() - self.inicio,
+            "etapas": [{"etapa": nome, "chamadas": chamadas, "total_s": total}
+                       for nome, (chamadas, total) in self.etapas.items()],
+            "cargas": list(self.cargas),
+            "cache": {**variacao, "itens": cache["itens"], "bytes": cache["bytes"]},
+        }
+
+
+def iniciar(pagina, ativo=None):
+    # Chamado no início de cada rerun; devolve o medidor ou None quando desligado
+    if ativo is None:
+        ativo = ativo_por_ambiente()
+    medidor = Medidor(pagina) if ativo else None
+    _atual.set(medidor)
+    return medidor
+
+
+def medidor_atual():
+    return _atual.get()
+
+
+@contextlib.contextmanager
+def etapa(nome):
+    medidor = _atual.get()
+    if medidor is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medidor.registrar_etapa(nome, time.perf_counter() - inicio)
+
+
+def medir(nome):
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with etapa(nome):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def registrar_carga(nome, tamanho):
+    medidor = _atual.get()
+    if medidor is not None:
+        medidor.registrar_carga(nome, tamanho)
+
+
+def gravar_jsonl(resumo, caminho):
+    with open(caminho, "a", encoding="utf-8") as arquivo:
+        arquivo.write(json.dumps(resumo, ensure_ascii=False) + "\n")
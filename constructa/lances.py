@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from constructa.metricas import taxa_anual, tir
+from constructa.otimizador import fronteira_pareto
+from constructa.pagamentos import calculate_payments_batch
+
+CUSTOS_FRONTEIRA = ('cet_anual', 'custo_total')
+
+
+def grade_lances(dnd, prazo, maximo_pago=50.0, maximo_embutido=30.0, passo_embutido=1.0):
+    # Lances pagos em múltiplos da amortização mensal (dnd / prazo) até maximo_pago % do DND e
+    # lances embutidos em degraus de passo_embutido % até maximo_embutido %, cruzados; combinações
+    # que não deixam crédito liberado ficam de fora
+    amortizacao = dnd / prazo
+    antecipadas = np.arange(int(prazo * maximo_pago / 100 + 1e-9) + 1)
+    embutidos = np.arange(0, maximo_embutido + passo_embutido / 2, passo_embutido) / 100 * dnd
+    pago, embutido = (eixo.ravel() for eixo in np.meshgrid(antecipadas * amortizacao, embutidos, indexing='ij'))
+    parcelas_antecipadas = np.repeat(antecipadas, embutidos.size)
+    liberado = (dnd - pago - embutido > 0) & (parcelas_antecipadas < prazo)
+    return pago[liberado], embutido[liberado], parcelas_antecipadas[liberado]
+
+
+def varrer_lances(dnd, prazo, admin_fee, plano=None, **grade):
+    # Cronograma de cada combinação de lance pago e embutido em uma única chamada vetorizada.
+    # O lance pago sai do bolso na contemplação e quita as últimas parcelas (a amortização fica a do
+    # DND e o prazo encurta); o embutido sai do próprio crédito e abate o saldo ao longo do prazo todo
+    # (a parcela cai). Fluxos do tomador: crédito liberado no mês 0 e parcelas depois.
+    # grade: opções de grade_lances
+    pago, embutido, antecipadas = grade_lances(dnd, prazo, **grade)
+    credito_liberado = dnd - pago - embutido
+    payments, _, _, _, quitacao = calculate_payments_batch(
+        credito_liberado, prazo - antecipadas, admin_fee, None, None, 0.0, plano=plano)
+    payments = np.nan_to_num(payments)
+    soma_parcelas = payments.sum(axis=1)
+
+    fluxos = np.zeros((payments.shape[0], payments.shape[1] + 1))
+    fluxos[:, 0] = credito_liberado
+    fluxos[:, 1:] = -payments
+    return pd.DataFrame({
+        'lance_pago': pago,
+        'lance_embutido': embutido,
+        'credito_liberado': credito_liberado,
+        'parcela_inicial': payments[:, 0],
+        'quitacao': quitacao,
+        'custo_total': soma_parcelas - credito_liberado,
+        'cet_anual': taxa_anual(tir(fluxos)) * 100,
+    })
+
+
+def fronteira_lances(varredura, custo='cet_anual'):
+    # Combinações não dominadas: maior crédito liberado para cada nível de custo (CET ou custo total)
+    if custo not in CUSTOS_FRONTEIRA:
+        raise ValueError(f"Custo desconhecido: {custo}")
+    valido = np.isfinite(varredura[custo].to_numpy())
+    tabela = varredura[valido]
+    pareto = fronteira_pareto(tabela['credito_liberado'].to_numpy(), tabela[custo].to_numpy())
+    return tabela.iloc[pareto].reset_index(drop=True)
@@ -0,0 +1,236 @@
+import heapq
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from constructa.pagamentos import calculate_payments_batch, empacotar_dropdowns
+from constructa.regras import PLANOS
+
+COMPRA, VENDA = 'compra', 'venda'
+PERCENTIS_AGIO = (10, 50, 90)
+COLUNAS_ORDENS = ['tipo', 'agio', 'credito']
+
+
+class LivroOfertas:
+    # Livro de ofertas de crédito de cotas contempladas cotado em ágio (%): quem compra aceita pagar
+    # até o ágio da oferta e quem vende aceita a partir dele. Prioridade preço-tempo com um heap por
+    # lado indexado por (ágio, ordem de chegada); o crédito da oferta é a quantidade, com execução parcial.
+    # O negócio sai pelo ágio da oferta que já estava no livro.
+
+    def __init__(self):
+        self._compras = []  # (-ágio, sequência, id): maior ágio primeiro
+        self._vendas = []   # (ágio, sequência, id): menor ágio primeiro
+        # id -> [lado, ágio, crédito restante, sequência]; ofertas canceladas ou executadas saem
+        # daqui e ficam nos heaps até chegarem ao topo (remoção preguiçosa)
+        self._ofertas = {}
+        self._sequencia = itertools.count()
+        # Próximo id automático: fica sempre acima dos ids inteiros explícitos já vistos
+        self._proximo_id = 0
+        self._negocios = ([], [], [], [])  # id da compra, id da venda, ágio, crédito
+        # Ordens recusadas por reproduzir_ordens (id de uma oferta ainda no livro)
+        self.rejeitadas = 0
+
+    def __len__(self):
+        return len(self._ofertas)
+
+    def __contains__(self, id):
+        return id in self._ofertas
+
+    def enviar(self, lado, agio, credito, id=None):
+        # Casa a oferta com o lado oposto e deixa o saldo no livro; devolve o id e o crédito executado
+        if id is None:
+            id = self._proximo_id
+        elif id in self._ofertas:
+            raise ValueError(f"Oferta já está no livro: {id}")
+        if isinstance(id, (int, np.integer)) and id >= self._proximo_id:
+            self._proximo_id = int(id) + 1
+        sequencia = next(self._sequencia)
+        agio, restante = float(agio), float(credito)
+        compra = lado == COMPRA
+        if not compra and lado != VENDA:
+            raise ValueError(f"Lado desconhecido: {lado}")
+        contraparte = self._vendas if compra else self._compras
+        ofertas = self._ofertas
+        compras, vendas, agios, creditos = self._negocios
+        executado = 0.0
+
+        while restante > 0 and contraparte:
+            chave, sequencia_topo, id_topo = contraparte[0]
+            topo = ofertas.get(id_topo)
+            if topo is None or topo[3] != sequencia_topo:
+                heapq.heappop(contraparte)
+                continue
+            if (chave > agio) if compra else (-chave < agio):
+                break
+            quantidade = min(restante, topo[2])
+            compras.append(id if compra else id_topo)
+            vendas.append(id_topo if compra else id)
+            agios.append(topo[1])
+            creditos.append(quantidade)
+            restante -= quantidade
+            executado += quantidade
+            topo[2] -= quantidade
+            if topo[2] <= 0:
+                heapq.heappop(contraparte)
+                del ofertas[id_topo]
+
+        if restante > 0:
+            ofertas[id] = [lado, agio, restante, sequencia]
+            if compra:
+                heapq.heappush(self._compras, (-agio, sequencia, id))
+            else:
+                heapq.heappush(self._vendas, (agio, sequencia, id))
+        return id, executado
+
+    def cancelar(self, id):
+        # O heap é limpo quando a oferta chega ao topo
+        return self._ofertas.pop(id, None) is not None
+
+    def _topo(self, heap):
+        while heap:
+            _, sequencia, id = heap[0]
+            oferta = self._ofertas.get(id)
+            if oferta is not None and oferta[3] == sequencia:
+                return oferta[1], oferta[2]
+            heapq.heappop(heap)
+        return None
+
+    def melhor_compra(self):
+        # (ágio, crédito restante) da melhor oferta de compra, ou None
+        return self._topo(self._compras)
+
+    def melhor_venda(self):
+        return self._topo(self._vendas)
+
+    def profundidade(self, niveis=10):
+        # Crédito em aberto por nível de ágio, os `niveis` melhores de cada lado
+        tabela = pd.DataFrame(list(self._ofertas.values()), columns=['lado', 'agio', 'credito', 'sequencia'])
+        tabela = tabela.groupby(['lado', 'agio'], as_index=False).agg(credito=('credito', 'sum'),
+                                                                      ofertas=('sequencia', 'size'))
+        compra = tabela[tabela['lado'] == COMPRA].nlargest(niveis, 'agio')
+        venda = tabela[tabela['lado'] == VENDA].nsmallest(niveis, 'agio')
+        return pd.concat([compra, venda], ignore_index=True)
+
+    def negocios(self):
+        compras, vendas, agios, creditos = self._negocios
+        return pd.DataFrame({'compra': compras, 'venda': vendas,
+                             'agio': np.array(agios, dtype=np.float64), 'credito': np.array(creditos, dtype=np.float64)})
+
+
+def gerar_ordens(num_ordens, agio_medio=20.0, dispersao=5.0, credito_medio=500_000.0, fracao_cancelamento=0.1,
+                 semente=0):
+    # Fluxo sintético: compras e vendas com ágio normal em torno de agio_medio (vendedores pedindo um
+    # pouco acima, compradores oferecendo um pouco abaixo), crédito em múltiplos de R$ 10 mil e uma
+    # fração de cancelamentos de ofertas anteriores. Colunas: tipo ('compra', 'venda' ou 'cancelar'),
+    # id, agio e credito (cancelamentos só usam o id).
+    rng = np.random.default_rng(semente)
+    tipo = np.where(rng.random(num_ordens) < 0.5, COMPRA, VENDA).astype(object)
+    agio = rng.normal(agio_medio, dispersao, num_ordens) + np.where(tipo == VENDA, dispersao / 4, -dispersao / 4)
+    agio = np.maximum(np.round(agio, 1), 0.0)
+    credito = np.maximum(np.round(rng.lognormal(np.log(credito_medio), 0.5, num_ordens) / 10_000), 1) * 10_000
+    ids = np.arange(num_ordens)
+
+    cancela = rng.random(num_ordens) < fracao_cancelamento
+    cancela[0] = False
+    # Cada cancelamento aponta para uma oferta anterior qualquer (que pode já ter sido executada)
+    ids[cancela] = (rng.random(cancela.sum()) * np.flatnonzero(cancela)).astype(np.int64)
+    tipo[cancela] = 'cancelar'
+    return pd.DataFrame({'tipo': tipo, 'id': ids, 'agio': agio, 'credito': credito})
+
+
+def reproduzir_ordens(ordens, livro=None, tamanho_bloco=100_000, progresso=None):
+    # Envia o fluxo de ordens ao livro na ordem das linhas; ordens com o id de uma oferta ainda no
+    # livro são rejeitadas e contadas em livro.rejeitadas. progresso(fração, parcial): chamado a cada
+    # bloco com o número de ordens processadas
+    if livro is None:
+        livro = LivroOfertas()
+    tipos, ids = list(ordens['tipo']), ordens['id'].tolist()
+    agios, creditos = ordens['agio'].tolist(), ordens['credito'].tolist()
+    enviar, cancelar = livro.enviar, livro.cancelar
+    total = len(tipos)
+    for inicio in range(0, total, tamanho_bloco):
+        for i in range(inicio, min(inicio + tamanho_bloco, total)):
+            if tipos[i] == 'cancelar':
+                cancelar(ids[i])
+            elif ids[i] in livro:
+                livro.rejeitadas += 1
+            else:
+                enviar(tipos[i], agios[i], creditos[i], ids[i])
+        if progresso is not None:
+            processadas = min(inicio + tamanho_bloco, total)
+            progresso(processadas / total, {'processadas': processadas, 'total': total})
+    return livro
+
+
+def ler_ordens(origem):
+    # CSV com uma ordem por linha: tipo ('compra', 'venda' ou 'cancelar'), agio (%) e credito (R$);
+    # id é opcional (a posição da linha) e cancelamentos só precisam do id
+    ordens = pd.read_csv(origem)
+    faltando = [c for c in COLUNAS_ORDENS if c not in ordens]
+    if faltando:
+        raise ValueError(f"Colunas ausentes: {', '.join(faltando)}")
+    desconhecidos = set(ordens['tipo']) - {COMPRA, VENDA, 'cancelar'}
+    if desconhecidos:
+        raise ValueError(f"Tipos de ordem desconhecidos: {', '.join(map(str, sorted(desconhecidos, key=str)))}")
+    if 'id' not in ordens:
+        ordens['id'] = np.arange(len(ordens))
+    ofertas = ordens['tipo'] != 'cancelar'
+    if ordens.loc[ofertas, ['agio', 'credito']].isna().any(axis=None):
+        raise ValueError("Ordens de compra e venda precisam de ágio e crédito")
+    return ordens
+
+
+def simular_mercado(ordens, progresso=None):
+    # Casa um fluxo de ordens num livro vazio e resume o que foi negociado e o que ficou em aberto
+    inicio = time.perf_counter()
+    livro = reproduzir_ordens(ordens, progresso=progresso)
+    duracao = time.perf_counter() - inicio
+    negocios = livro.negocios()
+    return {
+        'resumo': resumir_negocios(negocios),
+        'histograma': np.histogram(negocios['agio'], bins=30, weights=negocios['credito']),
+        'profundidade': livro.profundidade(),
+        'ordens': len(ordens),
+        'em_aberto': len(livro),
+        'rejeitadas': livro.rejeitadas,
+        'ordens_por_segundo': len(ordens) / duracao if duracao else float('inf'),
+    }
+
+
+def resumir_negocios(negocios, percentis=PERCENTIS_AGIO):
+    # Ágio médio ponderado pelo crédito negociado e percentis do ágio por real de crédito
+    if negocios.empty:
+        return {'negocios': 0, 'credito': 0.0, 'agio_medio': np.nan,
+                'percentis': {p: np.nan for p in percentis}}
+    ordem = np.argsort(negocios['agio'].to_numpy(), kind='stable')
+    agio = negocios['agio'].to_numpy()[ordem]
+    acumulado = np.cumsum(negocios['credito'].to_numpy()[ordem])
+    return {
+        'negocios': len(negocios),
+        'credito': float(acumulado[-1]),
+        'agio_medio': float(np.average(agio, weights=negocios['credito'].to_numpy()[ordem])),
+        'percentis': {p: float(agio[np.searchsorted(acumulado, acumulado[-1] * p / 100)]) for p in percentis},
+    }
+
+
+def cenarios_agio(resumo, principal, months, admin_fee, dropdowns, plano=None):
+    # Cronograma da cota com os dropdowns sob o ágio médio negociado e os percentis, em uma chamada
+    # vetorizada; mesmas fórmulas da Análise de Arbitragem dos apps (o ágio só entra no ganho quando
+    # o plano o trata como receita)
+    plano = PLANOS['finance_app'] if plano is None else plano
+    rotulos = ['Médio'] + [f"P{p}" for p in resumo['percentis']]
+    agio = np.array([resumo['agio_medio'], *resumo['percentis'].values()])
+    meses, valores = empacotar_dropdowns([dropdowns])
+    payments, _, total_dropdown_value, total_agio, quitacao = calculate_payments_batch(
+        principal, months, admin_fee, meses, valores, agio, plano=plano)
+    soma_parcelas = np.nansum(payments, axis=1)
+    return pd.DataFrame({
+        'cenario': rotulos,
+        'agio': agio,
+        'quitacao': quitacao,
+        'cet_total': (soma_parcelas / principal - 1) * 100,
+        'ganho_arbitragem': principal - (soma_parcelas + total_dropdown_value
+                                         - (total_agio if plano['agio_como_receita'] else 0.0)),
+    })
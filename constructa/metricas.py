@@ -0,0 +1,118 @@
+import numpy as np
+
+from constructa.pagamentos import matriz_dropdowns
+
+
+def taxa_mensal(taxa_anual):
+    return (1 + np.asarray(taxa_anual, dtype=np.float64)) ** (1 / 12) - 1
+
+
+def taxa_anual(taxa_mensal):
+    return (1 + np.asarray(taxa_mensal, dtype=np.float64)) ** 12 - 1
+
+
+def _descontos(taxa, periodos):
+    return np.exp(-periodos * np.log1p(taxa)[:, None])
+
+
+def vpl(fluxos, taxa):
+    # Valor presente de cada linha; a coluna t é descontada por (1 + taxa)^t (taxa por período)
+    fluxos = np.nan_to_num(np.atleast_2d(np.asarray(fluxos, dtype=np.float64)))
+    taxa = np.broadcast_to(np.asarray(taxa, dtype=np.float64), (fluxos.shape[0],))
+    return (fluxos * _descontos(taxa, np.arange(fluxos.shape[1]))).sum(axis=1)
+
+
+def trocas_de_sinal(fluxos):
+    # Regra de Descartes: com mais de uma troca de sinal a TIR pode não ser única
+    fluxos = np.atleast_2d(np.asarray(fluxos, dtype=np.float64))
+    sinais = np.sign(np.nan_to_num(fluxos))
+    trocas = np.zeros(fluxos.shape[0], dtype=np.int64)
+    anterior = np.zeros(fluxos.shape[0])
+    for coluna in sinais.T:
+        trocas += (coluna != 0) & (anterior != 0) & (coluna != anterior)
+        anterior = np.where(coluna != 0, coluna, anterior)
+    return trocas
+
+
+def tir(fluxos, minimo=-0.99, maximo=1.0, tolerancia=1e-10, max_iteracoes=100):
+    # TIR por período de cada linha: Newton protegido por bisseção. O intervalo [minimo, maximo]
+    # precisa conter uma troca de sinal do VPL; linhas sem troca de sinal devolvem NaN.
+    fluxos = np.nan_to_num(np.atleast_2d(np.asarray(fluxos, dtype=np.float64)))
+    n, periodos = fluxos.shape
+    t = np.arange(periodos, dtype=np.float64)
+    # (1 + taxa)^-t estoura o float64 perto de -100% em horizontes longos
+    minimo = max(minimo, np.expm1(-600 / max(periodos - 1, 1)))
+    escala = np.abs(fluxos).sum(axis=1)
+    escala[escala == 0] = 1.0
+
+    baixo = np.full(n, minimo)
+    alto = np.full(n, maximo)
+    vpl_baixo = vpl(fluxos, baixo)
+    vpl_alto = vpl(fluxos, alto)
+    resultado = np.full(n, np.nan)
+    ativo = np.sign(vpl_baixo) * np.sign(vpl_alto) < 0
+    resultado[vpl_baixo == 0] = minimo
+    resultado[vpl_alto == 0] = maximo
+
+    linhas = np.flatnonzero(ativo)
+    fluxos, baixo, alto, vpl_baixo = fluxos[linhas], baixo[linhas], alto[linhas], vpl_baixo[linhas]
+    escala = escala[linhas]
+    taxa = np.clip(0.01, baixo, alto)
+    for _ in range(max_iteracoes):
+        if not linhas.size:
+            break
+        descontos = _descontos(taxa, t)
+        valor = (fluxos * descontos).sum(axis=1)
+        derivada = -(fluxos * t * descontos).sum(axis=1) / (1 + taxa)
+
+        # Mantém o intervalo com troca de sinal em volta da raiz
+        mesmo_sinal_baixo = np.sign(valor) == np.sign(vpl_baixo)
+        baixo = np.where(mesmo_sinal_baixo, taxa, baixo)
+        vpl_baixo = np.where(mesmo_sinal_baixo, valor, vpl_baixo)
+        alto = np.where(mesmo_sinal_baixo, alto, taxa)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = taxa - valor / derivada
+        fora = ~np.isfinite(newton) | (newton <= baixo) | (newton >= alto)
+        proxima = np.where(fora, (baixo + alto) / 2, newton)
+
+        convergiu = (np.abs(valor) <= tolerancia * escala) | (np.abs(proxima - taxa) <= tolerancia)
+        resultado[linhas[convergiu]] = taxa[convergiu]
+        seguir = ~convergiu
+        linhas, fluxos, escala = linhas[seguir], fluxos[seguir], escala[seguir]
+        baixo, alto, vpl_baixo, taxa = baixo[seguir], alto[seguir], vpl_baixo[seguir], proxima[seguir]
+    return resultado
+
+
+def fluxos_cota(principal, payments, dropdown_months=None, dropdown_values=None, agio=0.0, agio_como_receita=True,
+                quitacao=None):
+    # Fluxos datados da cota do ponto de vista do tomador: crédito recebido no mês 0,
+    # parcelas e dropdowns pagos nos seus meses e, em finance_app.py, o ágio recebido
+    # no mês do dropdown (agio_como_receita=True, como na Análise de Arbitragem).
+    # Dropdowns depois da quitação não são aplicados pelo cronograma e ficam de fora.
+    payments = np.nan_to_num(np.atleast_2d(np.asarray(payments, dtype=np.float64)))
+    n, horizonte = payments.shape
+    principal = np.broadcast_to(np.asarray(principal, dtype=np.float64), (n,))
+    fluxos = np.zeros((n, horizonte + 1))
+    fluxos[:, 0] = principal
+    fluxos[:, 1:] = -payments
+    if dropdown_months is not None:
+        months = np.full(n, horizonte, dtype=np.int64) if quitacao is None else np.broadcast_to(quitacao, (n,))
+        tem_dropdown, valor_dropdown = matriz_dropdowns(n, horizonte, dropdown_months, dropdown_values, months)
+        agio = np.broadcast_to(np.asarray(agio, dtype=np.float64), (n,))
+        liquido = valor_dropdown.T * (1 - agio[:, None] / 100 if agio_como_receita else 1)
+        fluxos[:, 1:] -= np.where(tem_dropdown.T, liquido, 0.0)
+    return fluxos
+
+
+def indicadores_cota(principal, payments, dropdowns, agio, tlr, agio_como_receita=True):
+    # CET anual (TIR dos fluxos do tomador) e VPL descontado pela taxa livre de risco anual
+    meses = np.array([list(dropdowns)], dtype=np.int64).reshape(1, -1)
+    valores = np.array([list(dropdowns.values())], dtype=np.float64).reshape(1, -1)
+    fluxos = fluxos_cota(principal, [payments], meses, valores, agio, agio_como_receita, quitacao=len(payments))
+    tir_mensal = tir(fluxos)[0]
+    return {
+        'cet_mensal': float(tir_mensal),
+        'cet_anual': float(taxa_anual(tir_mensal)),
+        'vpl': float(vpl(fluxos, taxa_mensal(tlr))[0]),
+    }
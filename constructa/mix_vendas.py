@@ -0,0 +1,106 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from constructa.fluxo import calcular_fluxos_lote, metricas_fluxos
+from constructa.metricas import vpl
+from constructa.otimizador import fronteira_pareto
+
+# Eixos padrão da busca, além do simplex lançamento/balões/parcelas
+PRAZOS_PARCELAS = tuple(range(6, 121, 6))
+NUM_BALOES = (1, 2, 3, 4, 6)
+FIM_BALOES = (50, 75, 100)
+
+
+def gerar_mixes(passo=5, prazos_parcelas=PRAZOS_PARCELAS, num_baloes=NUM_BALOES, fim_baloes=FIM_BALOES,
+                faixa_lancamento=(0, 100)):
+    # Candidatos (lançamento, balões, parcelas) somando 100% em degraus de `passo`, cruzados com o prazo
+    # das parcelas e a quantidade/posição dos balões; combinações que não mudam o fluxo (sem balões ou
+    # sem parcelas) aparecem uma única vez. faixa_lancamento limita o que o mercado absorve no lançamento:
+    # sem ela, vender tudo no lançamento é sempre a melhor resposta
+    niveis = np.arange(0, 100 + passo / 2, passo, dtype=np.float64)
+    lancamento, baloes = (eixo.ravel() for eixo in np.meshgrid(niveis, niveis, indexing='ij'))
+    simplex = ((lancamento + baloes <= 100 + 1e-9)
+               & (lancamento >= faixa_lancamento[0]) & (lancamento <= faixa_lancamento[1]))
+    lancamento, baloes = lancamento[simplex], baloes[simplex]
+    parcelas = np.maximum(100 - lancamento - baloes, 0.0)
+
+    prazos_parcelas = np.asarray(prazos_parcelas, dtype=np.int64)
+    num_baloes = np.asarray(num_baloes, dtype=np.int64)
+    fim_baloes = np.asarray(fim_baloes, dtype=np.float64)
+    i_mix, i_prazo, i_num, i_fim = (eixo.ravel() for eixo in np.meshgrid(
+        np.arange(len(lancamento)), np.arange(len(prazos_parcelas)), np.arange(len(num_baloes)),
+        np.arange(len(fim_baloes)), indexing='ij'))
+    redundante = (((baloes[i_mix] == 0) & ((i_num > 0) | (i_fim > 0)))
+                  | ((parcelas[i_mix] == 0) & (i_prazo > 0)))
+    i_mix, i_prazo, i_num, i_fim = (i[~redundante] for i in (i_mix, i_prazo, i_num, i_fim))
+    return pd.DataFrame({
+        'percentual_lancamento': lancamento[i_mix],
+        'percentual_baloes': baloes[i_mix],
+        'percentual_parcelas': parcelas[i_mix],
+        'prazo_parcelas': prazos_parcelas[i_prazo],
+        'num_baloes': num_baloes[i_num],
+        'fim_baloes': fim_baloes[i_fim],
+    })
+
+
+def avaliar_mixes(base, mixes, taxa_mensal_desconto=0.0, tamanho_lote=20_000, progresso=None):
+    # Métricas da página "Análise" e receita ponderada pelo lançamento de cada mix sobre os demais
+    # parâmetros de `base` (nomes do session_state de cenarios.py); a receita é descontada mês a mês,
+    # de modo que o que entra no lançamento vale integralmente e o que entra depois vale menos
+    # progresso(fração, parcial): chamado a cada lote com o número de mixes já avaliados
+    total = len(mixes)
+    vgv = float(base['vgv'])
+    custo_construcao = vgv * base['custo_construcao_percentual'] / 100
+    colunas = {nome: mixes[nome].to_numpy() for nome in mixes}
+    indicadores = {nome: np.empty(total) for nome in ('receita_ponderada', 'exposicao_maxima', 'lucro_total', 'margem')}
+    indicadores['mes_payback'] = np.empty(total, dtype=np.int64)
+    for inicio in range(0, total, tamanho_lote):
+        fatia = slice(inicio, inicio + tamanho_lote)
+        fluxos = calcular_fluxos_lote(
+            vgv, custo_construcao, int(base['prazo_meses']),
+            base['percentual_inicio'], base['percentual_meio'], base['percentual_fim'],
+            colunas['percentual_lancamento'][fatia], colunas['percentual_baloes'][fatia],
+            colunas['percentual_parcelas'][fatia], colunas['prazo_parcelas'][fatia],
+            colunas['num_baloes'][fatia], colunas['fim_baloes'][fatia])
+        indicadores['receita_ponderada'][fatia] = vpl(fluxos['Receitas'], taxa_mensal_desconto)
+        for nome, valor in metricas_fluxos(fluxos['Saldo Mensal'], vgv).items():
+            indicadores[nome][fatia] = valor
+        if progresso is not None:
+            avaliados = min(inicio + tamanho_lote, total)
+            progresso(avaliados / total, {'avaliados': avaliados, 'total': total})
+    return indicadores
+
+
+def otimizar_mix_vendas(base, exposicao_maxima=None, mes_payback=None, taxa_mensal_desconto=0.0,
+                        max_resultados=50, progresso=None, **opcoes):
+    # Mixes viáveis (exposição até o teto e/ou payback até o mês alvo) ordenados pela receita
+    # ponderada pelo lançamento; opcoes vão para gerar_mixes
+    if exposicao_maxima is None and mes_payback is None:
+        raise ValueError("Informe um teto de exposição ou um mês alvo de payback")
+    inicio = time.perf_counter()
+    mixes = gerar_mixes(**opcoes)
+    if not len(mixes):
+        raise ValueError("Nenhum mix candidato atende às restrições informadas")
+    indicadores = avaliar_mixes(base, mixes, taxa_mensal_desconto, progresso=progresso)
+    duracao = time.perf_counter() - inicio
+
+    viavel = np.ones(len(mixes), dtype=bool)
+    if exposicao_maxima is not None:
+        viavel &= indicadores['exposicao_maxima'] <= exposicao_maxima
+    if mes_payback is not None:
+        viavel &= (indicadores['mes_payback'] >= 1) & (indicadores['mes_payback'] <= mes_payback)
+
+    tabela = mixes.assign(**indicadores)
+    # Empates na receita ficam com a menor exposição
+    ordem = np.lexsort((indicadores['exposicao_maxima'], -indicadores['receita_ponderada']))
+    ordem = ordem[viavel[ordem]]
+    pareto = fronteira_pareto(indicadores['receita_ponderada'], indicadores['exposicao_maxima'])
+    return {
+        'mixes': tabela.iloc[ordem[:max_resultados]].reset_index(drop=True),
+        'fronteira': tabela.iloc[pareto].reset_index(drop=True),
+        'avaliados': len(mixes),
+        'viaveis': int(viavel.sum()),
+        'mixes_por_segundo': len(mixes) / duracao if duracao else float('inf'),
+    }
@@ -0,0 +1,234 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from constructa.pagamentos import calculate_payments_batch, empacotar_dropdowns
+from constructa.regras import PLANOS, calendario_correcao
+
+NUM_FAIXAS = 2000
+PERCENTIS = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+INDICADORES = ('quitacao', 'cet_total', 'ganho_arbitragem')
+
+
+def carregar_indice(origem, coluna=None, periodicidade='anual'):
+    # Série histórica de um índice de correção (INCC, IPCA...) em % por período.
+    # Séries mensais viram variações acumuladas em janelas móveis de 12 meses.
+    tabela = pd.read_csv(origem)
+    if coluna is None:
+        numericas = tabela.select_dtypes('number').columns
+        if not len(numericas):
+            raise ValueError("O arquivo do índice não tem coluna numérica")
+        coluna = numericas[-1]
+    variacoes = tabela[coluna].dropna().to_numpy(dtype=np.float64) / 100
+
+    if periodicidade == 'mensal':
+        if variacoes.size < 12:
+            raise ValueError("A série mensal precisa de pelo menos 12 observações")
+        fatores = np.lib.stride_tricks.sliding_window_view(1 + variacoes, 12).prod(axis=1)
+    elif periodicidade == 'anual':
+        fatores = 1 + variacoes
+    else:
+        raise ValueError(f"Periodicidade desconhecida: {periodicidade}")
+    return fatores
+
+
+def sortear_agio(rng, distribuicao, n):
+    # distribuicao: {'tipo': 'triangular', 'minimo', 'moda', 'maximo'}, {'tipo': 'normal', 'media', 'desvio'}
+    # ou {'tipo': 'uniforme', 'minimo', 'maximo'}; valores em %, nunca negativos
+    tipo = distribuicao['tipo']
+    if tipo == 'triangular' and distribuicao['minimo'] == distribuicao['maximo']:
+        # Faixa sem largura (mínimo = moda = máximo): ágio constante, que o rng.triangular recusa
+        agio = np.full(n, float(distribuicao['moda']))
+    elif tipo == 'triangular':
+        agio = rng.triangular(distribuicao['minimo'], distribuicao['moda'], distribuicao['maximo'], n)
+    elif tipo == 'normal':
+        agio = rng.normal(distribuicao['media'], distribuicao['desvio'], n)
+    elif tipo == 'uniforme':
+        agio = rng.uniform(distribuicao['minimo'], distribuicao['maximo'], n)
+    else:
+        raise ValueError(f"Distribuição de ágio desconhecida: {tipo}")
+    return np.maximum(agio, 0.0)
+
+
+def _simular_caminhos(semente, n, principal, months, admin_fee, dropdowns, fatores_indice, distribuicao_agio,
+                      plano):
+    # Um fator anual sorteado por correção do calendário do plano, proporcional ao intervalo
+    # desde a correção anterior
+    rng = np.random.default_rng(semente)
+    calendario = calendario_correcao(plano, months)
+    correcao = rng.choice(fatores_indice, size=(n, max(calendario.size, 1)))
+    correcao[:, :calendario.size] **= np.diff(calendario, prepend=0) / 12
+    agio = sortear_agio(rng, distribuicao_agio, n)
+    meses, valores = empacotar_dropdowns([dropdowns])
+    payments, _, total_dropdown_value, total_agio, quitacao = calculate_payments_batch(
+        principal, months, admin_fee, meses, valores, agio, plano=dict(plano, correcao=correcao))
+
+    # Mesmas fórmulas dos KPIs e da análise de arbitragem de finance_app.py
+    soma_parcelas = np.nansum(payments, axis=1)
+    return {
+        'quitacao': quitacao.astype(np.float64),
+        'cet_total': (soma_parcelas / principal - 1) * 100,
+        'ganho_arbitragem': principal - (soma_parcelas + total_dropdown_value - total_agio),
+    }
+
+
+def _limites_caudas(percentis, num_caminhos):
+    # Quantos valores de cada cauda (abaixo, acima) algum percentil pode ler como estatística de ordem:
+    # o percentil mais baixo pede no máximo o ceil(p% de N)-ésimo menor valor, o mais alto o equivalente
+    # entre os maiores
+    return (math.ceil(min(percentis) / 100 * num_caminhos) + 1,
+            math.ceil((100 - max(percentis)) / 100 * num_caminhos) + 1)
+
+
+def _extremos(valores, limite, menores):
+    # Os limite menores (ou maiores) valores, ordenados
+    if valores.size > limite:
+        valores = (np.partition(valores, limite - 1)[:limite] if menores
+                   else np.partition(valores, valores.size - limite)[valores.size - limite:])
+    return np.sort(valores)
+
+
+def _juntar_cauda(cauda, nova, limite, menores):
+    # cauda: (quantos valores caíram fora das faixas, os mais extremos deles). O buffer tem tamanho
+    # fixo, então a memória das caudas não cresce com o número de caminhos
+    return cauda[0] + nova[0], _extremos(np.concatenate([cauda[1], nova[1]]), limite, menores)
+
+
+def _resumir(resultado, faixas, limites):
+    # Valores fora das faixas do piloto não vão para as faixas das pontas: cada cauda guarda quantos
+    # são e os mais extremos deles, exatos, para que os percentis das caudas não fiquem presos aos
+    # extremos do piloto
+    resumo = {}
+    for indicador, valores in resultado.items():
+        bordas = faixas[indicador]
+        abaixo, acima = valores < bordas[0], valores > bordas[-1]
+        contagem, _ = np.histogram(valores[~(abaixo | acima)], bins=bordas)
+        resumo[indicador] = (contagem, valores.sum(), valores.min(), valores.max(),
+                             (int(abaixo.sum()), _extremos(valores[abaixo], limites[0], True)),
+                             (int(acima.sum()), _extremos(valores[acima], limites[1], False)))
+    return resumo
+
+
+def _bloco(argumentos):
+    # Executado nos processos do pool: devolve só histogramas, somas e caudas limitadas, nunca os caminhos
+    semente, n, parametros, faixas, limites = argumentos
+    return _resumir(_simular_caminhos(semente, n, *parametros), faixas, limites)
+
+
+def _bordas(valores, indicador, months):
+    if indicador == 'quitacao':
+        return np.arange(0.5, months + 1.5)
+    minimo, maximo = valores.min(), valores.max()
+    folga = max(maximo - minimo, abs(maximo), 1.0) * 0.5
+    return np.linspace(minimo - folga, maximo + folga, NUM_FAIXAS + 1)
+
+
+def _percentis(contagem, bordas, cauda_abaixo, cauda_acima, percentis, inteiro=False):
+    # abaixo/acima: caudas de _juntar_cauda, lidas como estatísticas de ordem exatas. Uma posição entre
+    # o buffer e as faixas (só se o piloto errou as faixas para percentis internos) é interpolada
+    # entre o último valor guardado e a borda
+    if inteiro:
+        # Mês de quitação: uma faixa por mês (nunca há valores fora), sem interpolar dentro dela
+        acumulado = np.cumsum(contagem) / contagem.sum()
+        return {p: float(np.ceil(bordas[np.searchsorted(acumulado, p / 100)])) for p in percentis}
+    (num_abaixo, abaixo), (num_acima, acima) = cauda_abaixo, cauda_acima
+    total = num_abaixo + contagem.sum() + num_acima
+    inicio_acima = total - num_acima
+    descartados = num_acima - acima.size
+    resultado = {}
+    for p in percentis:
+        posicao = p / 100 * total
+        if num_abaixo and posicao <= num_abaixo:
+            ordem = max(math.ceil(posicao) - 1, 0)
+            resultado[p] = float(abaixo[ordem] if ordem < abaixo.size
+                                 else np.interp(posicao, [abaixo.size, num_abaixo], [abaixo[-1], bordas[0]]))
+        elif num_acima and posicao >= inicio_acima:
+            ordem = max(math.ceil(posicao - inicio_acima) - 1, 0)
+            resultado[p] = float(acima[ordem - descartados] if ordem >= descartados
+                                 else np.interp(posicao - inicio_acima, [0, descartados], [bordas[-1], acima[0]]))
+        else:
+            resultado[p] = float(np.interp(posicao - num_abaixo, np.r_[0, np.cumsum(contagem)], bordas))
+    return resultado
+
+
+def _histograma(contagem, bordas, cauda_abaixo, cauda_acima):
+    # Valores fora das faixas entram como uma faixa extra em cada ponta, até o extremo observado
+    (num_abaixo, abaixo), (num_acima, acima) = cauda_abaixo, cauda_acima
+    if num_abaixo:
+        contagem, bordas = np.r_[num_abaixo, contagem], np.r_[abaixo[0], bordas]
+    if num_acima:
+        contagem, bordas = np.r_[contagem, num_acima], np.r_[bordas, acima[-1]]
+    return contagem.copy(), bordas
+
+
+def _consolidar(contagens, somas, extremos, caudas, faixas, percentis, num_caminhos):
+    resultado = {}
+    for indicador in INDICADORES:
+        abaixo, acima = caudas[indicador]
+        resultado[indicador] = {
+            'media': math.fsum(somas[indicador]) / num_caminhos,
+            'minimo': extremos[indicador][0],
+            'maximo': extremos[indicador][1],
+            'percentis': _percentis(contagens[indicador], faixas[indicador], abaixo, acima, percentis,
+                                    inteiro=indicador == 'quitacao'),
+            'histograma': _histograma(contagens[indicador], faixas[indicador], abaixo, acima),
+        }
+    resultado['num_caminhos'] = num_caminhos
+    return resultado
+
+
+def simular_monte_carlo(principal, months, admin_fee, dropdowns, fatores_indice, distribuicao_agio,
+                        num_caminhos=100_000, tamanho_bloco=10_000, semente=0, processos=None, percentis=PERCENTIS,
+                        progresso=None, plano=None):
+    # Cada bloco recebe uma semente filha do SeedSequence, então o resultado não depende
+    # do número de processos nem da ordem em que os blocos terminam.
+    # progresso(fração, parcial): chamado a cada bloco com o resultado dos caminhos já simulados
+    # plano: regras do cronograma (constructa.regras); a correção dele é substituída pelo índice sorteado
+    parametros = (principal, months, admin_fee, dict(dropdowns), np.asarray(fatores_indice, dtype=np.float64),
+                  distribuicao_agio, plano or PLANOS['finance_app'])
+    tamanhos = [min(tamanho_bloco, num_caminhos - i) for i in range(0, num_caminhos, tamanho_bloco)]
+    sementes = np.random.SeedSequence(semente).spawn(len(tamanhos))
+
+    # O primeiro bloco roda localmente e fixa as faixas dos histogramas dos demais
+    piloto = _simular_caminhos(sementes[0], tamanhos[0], *parametros)
+    faixas = {indicador: _bordas(piloto[indicador], indicador, months) for indicador in INDICADORES}
+    limites = _limites_caudas(percentis, num_caminhos)
+    tarefas = [(sementes[i], tamanhos[i], parametros, faixas, limites) for i in range(1, len(tamanhos))]
+
+    contagens = {indicador: np.zeros(len(faixas[indicador]) - 1, dtype=np.int64) for indicador in INDICADORES}
+    somas = {indicador: [] for indicador in INDICADORES}
+    extremos = {indicador: (math.inf, -math.inf) for indicador in INDICADORES}
+    caudas = {indicador: ((0, np.empty(0)), (0, np.empty(0))) for indicador in INDICADORES}
+    simulados = 0
+
+    def acumular(resumo, n):
+        nonlocal simulados
+        for indicador, (contagem, soma, minimo, maximo, abaixo, acima) in resumo.items():
+            contagens[indicador] += contagem
+            somas[indicador].append(soma)
+            caudas[indicador] = (_juntar_cauda(caudas[indicador][0], abaixo, limites[0], True),
+                                 _juntar_cauda(caudas[indicador][1], acima, limites[1], False))
+            extremos[indicador] = (min(extremos[indicador][0], minimo), max(extremos[indicador][1], maximo))
+        simulados += n
+        if progresso is not None:
+            progresso(simulados / num_caminhos,
+                      _consolidar(contagens, somas, extremos, caudas, faixas, percentis, simulados))
+
+    acumular(_resumir(piloto, faixas, limites), tamanhos[0])
+    processos = processos or os.cpu_count() or 1
+    if processos == 1 or len(tarefas) <= 1:
+        for tarefa in tarefas:
+            acumular(_bloco(tarefa), tarefa[1])
+    else:
+        # Se o progresso interromper a simulação, os blocos ainda na fila são descartados
+        pool = ProcessPoolExecutor(max_workers=processos)
+        try:
+            for tarefa, resumo in zip(tarefas, pool.map(_bloco, tarefas)):
+                acumular(resumo, tarefa[1])
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    return _consolidar(contagens, somas, extremos, caudas, faixas, percentis, num_caminhos)
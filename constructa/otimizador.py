@@ -0,0 +1,142 @@
+import itertools
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from constructa.pagamentos import calculate_payments_batch
+from constructa.regras import PLANOS, compilar_plano
+
+
+def _amostrar_indices(total, quantidade, rng):
+    # Índices distintos e ordenados em range(total) sem criar range(total) quando o total é grande:
+    # sorteios com reposição repetidos até completar a amostra (colisões são raras quando total >= 4x)
+    if total <= 4 * quantidade:
+        return np.sort(rng.choice(total, quantidade, replace=False))
+    escolhidos = np.empty(0, dtype=np.int64)
+    while len(escolhidos) < quantidade:
+        novos = rng.integers(0, total, quantidade - len(escolhidos))
+        escolhidos = np.union1d(escolhidos, novos)
+    return escolhidos
+
+
+def _combinacoes(posicoes, tamanho, k):
+    # Decodifica a posição de cada combinação de k índices de range(tamanho) pelo sistema
+    # combinatório (soma de comb(c_i, i + 1)); devolve os índices em ordem crescente
+    posicoes = posicoes.copy()
+    indices = np.empty((len(posicoes), k), dtype=np.int64)
+    for i in range(k - 1, -1, -1):
+        tabela = np.array([math.comb(m, i + 1) for m in range(tamanho)], dtype=np.int64)
+        indices[:, i] = np.searchsorted(tabela, posicoes, side='right') - 1
+        posicoes -= tabela[indices[:, i]]
+    return indices
+
+
+def gerar_cronogramas(orcamento, months, max_dropdowns=2, passo_mes=6, divisoes=10,
+                      janela=None, ticket_minimo=0.0, max_candidatos=200_000, semente=0):
+    # Candidatos (mês, valor): meses em uma grade dentro da janela e valores em frações
+    # de orcamento/divisoes, sempre respeitando o orçamento total e o ticket mínimo.
+    # Os candidatos são numerados (blocos por número de dropdowns, combinação de meses x frações) e
+    # só os índices sorteados são decodificados, então a memória fica limitada por max_candidatos
+    inicio, fim = janela or (1, months)
+    grade_meses = np.arange(max(inicio, 1), min(fim, months) + 1, passo_mes)
+    unidade = orcamento / divisoes
+
+    blocos = []
+    for k in range(1, max_dropdowns + 1):
+        fracoes = np.array([f for f in itertools.product(range(1, divisoes + 1), repeat=k) if sum(f) <= divisoes],
+                           dtype=np.float64).reshape(-1, k)
+        valores = fracoes * unidade
+        valores = valores[(valores >= ticket_minimo).all(axis=1)]
+        quantidade = math.comb(len(grade_meses), k) * len(valores)
+        if quantidade:
+            blocos.append((k, valores, quantidade))
+
+    total = sum(quantidade for _, _, quantidade in blocos)
+    if not total:
+        return np.zeros((0, max_dropdowns), dtype=np.int64), np.zeros((0, max_dropdowns))
+    if total > max_candidatos:
+        escolhidos = _amostrar_indices(total, max_candidatos, np.random.default_rng(semente))
+    else:
+        escolhidos = np.arange(total)
+
+    meses = np.zeros((len(escolhidos), max_dropdowns), dtype=np.int64)
+    valores_escolhidos = np.zeros((len(escolhidos), max_dropdowns))
+    deslocamento = 0
+    for k, valores, quantidade in blocos:
+        linhas = np.flatnonzero((escolhidos >= deslocamento) & (escolhidos < deslocamento + quantidade))
+        combinacao, fracao = np.divmod(escolhidos[linhas] - deslocamento, len(valores))
+        meses[linhas, :k] = grade_meses[_combinacoes(combinacao, len(grade_meses), k)]
+        valores_escolhidos[linhas, :k] = valores[fracao]
+        deslocamento += quantidade
+    return meses, valores_escolhidos
+
+
+def avaliar_cronogramas(principal, months, admin_fee, agio, meses, valores, tamanho_lote=20_000, progresso=None,
+                        plano=None):
+    # Indicadores da "Análise de Arbitragem" de finance_app.py para cada cronograma; o plano é
+    # compilado uma vez e reaproveitado por todos os lotes
+    # progresso(fração, parcial): chamado a cada lote com o número de cronogramas já avaliados
+    ganho = np.empty(len(meses))
+    cet_total = np.empty(len(meses))
+    desembolso = np.empty(len(meses))
+    quitacao = np.empty(len(meses), dtype=np.int64)
+    regras = compilar_plano(plano or PLANOS['finance_app'], months)
+    for inicio in range(0, len(meses), tamanho_lote):
+        fatia = slice(inicio, inicio + tamanho_lote)
+        payments, _, total_dropdown_value, total_agio, quitacao[fatia] = calculate_payments_batch(
+            principal, months, admin_fee, meses[fatia], valores[fatia], agio, plano=regras)
+        soma_parcelas = np.nansum(payments, axis=1)
+        valor_efetivamente_pago = soma_parcelas + total_dropdown_value - total_agio
+        ganho[fatia] = principal - valor_efetivamente_pago
+        cet_total[fatia] = (soma_parcelas / principal - 1) * 100
+        desembolso[fatia] = total_dropdown_value
+        if progresso is not None:
+            avaliados = min(inicio + tamanho_lote, len(meses))
+            progresso(avaliados / len(meses), {'avaliados': avaliados, 'total': len(meses)})
+    return {'ganho_arbitragem': ganho, 'cet_total': cet_total,
+            'desembolso': desembolso, 'quitacao': quitacao}
+
+
+def fronteira_pareto(ganho, cet):
+    # Índices não dominados: maior ganho para cada nível de CET
+    ordem = np.lexsort((-ganho, cet))
+    melhor_ganho = np.maximum.accumulate(ganho[ordem])
+    novo_maximo = np.r_[True, melhor_ganho[1:] > melhor_ganho[:-1]]
+    return ordem[novo_maximo]
+
+
+def _cronograma(meses, valores):
+    return {int(m): float(v) for m, v in zip(meses, valores) if m > 0}
+
+
+def otimizar_dropdowns(principal, months, admin_fee, agio, orcamento, objetivo='ganho_arbitragem', progresso=None,
+                       plano=None, **opcoes):
+    # Busca o cronograma que maximiza o ganho na arbitragem (ou minimiza o CET) dentro do orçamento
+    inicio = time.perf_counter()
+    meses, valores = gerar_cronogramas(orcamento, months, **opcoes)
+    if not len(meses):
+        raise ValueError("Nenhum cronograma candidato atende às restrições informadas")
+    indicadores = avaliar_cronogramas(principal, months, admin_fee, agio, meses, valores, progresso=progresso,
+                                      plano=plano)
+    duracao = time.perf_counter() - inicio
+
+    if objetivo == 'ganho_arbitragem':
+        melhor = int(np.argmax(indicadores['ganho_arbitragem']))
+    elif objetivo == 'cet_total':
+        melhor = int(np.argmin(indicadores['cet_total']))
+    else:
+        raise ValueError(f"Objetivo desconhecido: {objetivo}")
+
+    pareto = fronteira_pareto(indicadores['ganho_arbitragem'], indicadores['cet_total'])
+    fronteira = pd.DataFrame({chave: valor[pareto] for chave, valor in indicadores.items()})
+    fronteira.insert(0, 'cronograma', [_cronograma(meses[i], valores[i]) for i in pareto])
+
+    return {
+        'cronograma': _cronograma(meses[melhor], valores[melhor]),
+        'indicadores': {chave: valor[melhor].item() for chave, valor in indicadores.items()},
+        'fronteira': fronteira,
+        'avaliados': len(meses),
+        'cronogramas_por_segundo': len(meses) / duracao if duracao else float('inf'),
+    }
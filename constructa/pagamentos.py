@@ -0,0 +1,407 @@
+import itertools
+import operator
+
+import numpy as np
+
+from constructa.cache import congelar
+from constructa.regras import PLANOS, compilar_plano
+
+# Abaixo deste prazo o laço mensal em Python é mais barato que montar o cronograma com numpy
+MESES_MINIMOS_ANALITICO = 120
+# Acima de um evento (correção ou dropdown) a cada tantos meses, calculate_payments volta ao laço mensal
+MESES_POR_EVENTO = 10
+
+
+def empacotar_dropdowns(lista_dropdowns):
+    # Converte uma lista de dicionários {mês: valor} em matrizes preenchidas (mês 0 = vazio)
+    largura = max((len(d) for d in lista_dropdowns), default=0)
+    meses = np.zeros((len(lista_dropdowns), largura), dtype=np.int64)
+    valores = np.zeros((len(lista_dropdowns), largura), dtype=np.float64)
+    for i, dropdowns in enumerate(lista_dropdowns):
+        for j, (mes, valor) in enumerate(sorted(dropdowns.items())):
+            meses[i, j] = mes
+            valores[i, j] = valor
+    return meses, valores
+
+
+def matriz_dropdowns(n, horizonte, dropdown_months, dropdown_values, months):
+    # Layout mês x cota, igual ao das séries de saída
+    tem_dropdown = np.zeros((horizonte, n), dtype=bool)
+    valor_dropdown = np.zeros((horizonte, n), dtype=np.float64)
+    if dropdown_months is None:
+        return tem_dropdown, valor_dropdown
+
+    meses = np.atleast_2d(np.asarray(dropdown_months, dtype=np.int64))
+    meses = np.broadcast_to(meses, (n, meses.shape[1]))
+    valores = np.broadcast_to(np.atleast_2d(np.asarray(dropdown_values, dtype=np.float64)), meses.shape)
+    # Meses fora do prazo da linha nunca são visitados pelo laço escalar
+    validos = (meses >= 1) & (meses <= months[:, None])
+    linhas, colunas = np.nonzero(validos)
+    tem_dropdown[meses[linhas, colunas] - 1, linhas] = True
+    valor_dropdown[meses[linhas, colunas] - 1, linhas] = valores[linhas, colunas]
+    return tem_dropdown, valor_dropdown
+
+
+def _trecho_linear(inicio, fim, months, admin_fee, balance, amortization, ativo, onde, payments, balances, quitacao,
+                   parcela_minima):
+    # Meses inicio..fim-1 sem dropdown nem correção (a do mês inicio já foi aplicada): com amortização A
+    # constante, o saldo cai A por mês e a parcela é A + taxa*(saldo do mês anterior). O saldo é
+    # subtraído mês a mês como no laço (B - k*A arredonda diferente e muda a quitação quando o saldo
+    # zera num dropdown); as parcelas saem de uma vez. Escreve direto nas saídas e atualiza o estado.
+    tamanho = fim - inicio
+    parcela = payments[inicio - 1:fim - 1]
+    saldo = balances[inicio:fim]
+    anterior = balance
+    for linha in saldo:
+        np.subtract(anterior, amortization, out=linha, where=onde)
+        anterior = linha
+    np.multiply(balance, admin_fee, out=parcela[0], where=onde)
+    np.multiply(saldo[:-1], admin_fee, out=parcela[1:], where=onde)
+    np.add(parcela, amortization, out=parcela, where=onde)
+
+    # Saldo e parcela são monótonos dentro do trecho (taxa >= 0), então só as pontas dizem
+    # se a cota para aqui; o mês exato é procurado apenas nessas colunas
+    candidatas = (saldo[0] <= 0) | (saldo[-1] <= 0) | (parcela[0] < parcela_minima) | (parcela[-1] < parcela_minima)
+    candidatas |= (months >= inicio) & (months < fim)
+    para = np.flatnonzero(candidatas & ativo)
+
+    np.add(quitacao, tamanho, out=quitacao, where=onde)
+    np.copyto(balance, saldo[-1], where=onde)
+    if para.size:
+        parada = ((saldo[:, para] <= 0) | (parcela[:, para] < parcela_minima)
+                  | (np.arange(inicio, fim)[:, None] >= months[para]))
+        ultimo = parada.argmax(axis=0)
+        para, ultimo = para[parada.any(axis=0)], ultimo[parada.any(axis=0)]
+        # O resto do trecho volta a NaN nas cotas que quitam aqui
+        depois = np.arange(tamanho)[:, None] > ultimo
+        for serie in (parcela, saldo):
+            bloco = serie[:, para]
+            bloco[depois] = np.nan
+            serie[:, para] = bloco
+        quitacao[para] -= tamanho - 1 - ultimo
+        ativo[para] = False
+
+
+def calculate_payments_batch(principal, months, admin_fee, dropdown_months, dropdown_values, agio, plano=None):
+    # Versão vetorizada de calculate_payments: cada linha é uma cota, com as mesmas operações na mesma
+    # ordem de _calculate_payments_laco (resultado bit a bit igual, inclusive o mês de quitação).
+    # plano (constructa.regras, cru ou já compilado para o horizonte) define correção, base da taxa
+    # e regra de parada; o padrão é o de finance_app.py. Uma correção em matriz tem uma linha por cota.
+    principal = np.ravel(np.asarray(principal, dtype=np.float64))
+    months = np.ravel(np.asarray(months, dtype=np.int64))
+    admin_fee = np.ravel(np.asarray(admin_fee, dtype=np.float64))
+    agio = np.ravel(np.asarray(agio, dtype=np.float64))
+    linhas_dropdown = np.atleast_2d(dropdown_months).shape[0] if dropdown_months is not None else 1
+    n = np.broadcast_shapes(principal.shape, months.shape, admin_fee.shape, agio.shape, (linhas_dropdown,))[0]
+    principal, months, admin_fee, agio = (np.broadcast_to(x, (n,)) for x in (principal, months, admin_fee, agio))
+
+    horizonte = int(months.max()) if n else 0
+    tem_dropdown, valor_dropdown = matriz_dropdowns(n, horizonte, dropdown_months, dropdown_values, months)
+    meses_com_dropdown = tem_dropdown.any(axis=1)
+    meses_de_termino = set(np.unique(months).tolist())
+    regras = compilar_plano(plano or PLANOS['finance_app'], horizonte, n)
+    corrige, indice, fatores = regras['corrige'], regras['indice'], regras['fatores']
+    proxima_correcao, parcela_minima = regras['proxima_correcao'], regras['parcela_minima']
+    taxa_antes_dropdown = regras['taxa_antes_dropdown']
+
+    # Layout mês x cota: cada mês escreve uma linha contígua
+    payments = np.full((horizonte, n), np.nan)
+    balances = np.full((horizonte + 1, n), np.nan)
+    balances[0] = principal
+
+    balance = principal.copy()
+    amortization = principal / months
+    total_dropdown_value = np.zeros(n)
+    total_agio = np.zeros(n)
+    quitacao = np.zeros(n, dtype=np.int64)
+    ativo = months >= 1
+    fator_agio = agio / 100
+    fator_impacto = 1 + agio / 100
+    admin_fee_value = np.empty(n)
+    impacto = np.empty(n)
+    restante = np.empty(n)
+
+    # Só os meses com dropdown passam pelo passo mensal completo; entre eles a amortização é
+    # constante (a correção só reinicia o trecho) e cada trecho, até o próximo dropdown ou a
+    # próxima correção do calendário, é preenchido de uma vez
+    meses_dropdown = np.flatnonzero(meses_com_dropdown) + 1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        month = 1
+        while month <= horizonte:
+            if not ativo.any():
+                break
+            if not meses_com_dropdown[month - 1]:
+                onde = True if ativo.all() else ativo
+                if corrige[month]:
+                    np.subtract(months + 1, month, out=restante)
+                    np.multiply(balance, fatores[indice[month]], out=balance, where=onde)
+                    np.divide(balance, restante, out=amortization, where=onde)
+                proximo = meses_dropdown[np.searchsorted(meses_dropdown, month):]
+                fim = min(int(proxima_correcao[month]), int(proximo[0]) if proximo.size else horizonte + 1,
+                          horizonte + 1)
+                _trecho_linear(month, fim, months, admin_fee, balance, amortization, ativo, onde,
+                               payments, balances, quitacao, parcela_minima)
+                month = fim
+                continue
+            # Enquanto todas as cotas estão ativas, dispensa a máscara nas ufuncs
+            onde = True if ativo.all() else ativo
+            monthly_payment = payments[month - 1]
+            corrige_mes = corrige[month]
+            dropdown = meses_com_dropdown[month - 1]
+            if corrige_mes or dropdown:
+                np.subtract(months + 1, month, out=restante)
+
+            if corrige_mes:
+                np.multiply(balance, fatores[indice[month]], out=balance, where=onde)
+                np.divide(balance, restante, out=amortization, where=onde)
+
+            if dropdown:
+                aplica = tem_dropdown[month - 1] & ativo
+                dropdown_value = valor_dropdown[month - 1]
+
+            if dropdown and not taxa_antes_dropdown:
+                agio_value = dropdown_value * fator_agio
+                np.add(total_dropdown_value, dropdown_value, out=total_dropdown_value, where=aplica)
+                np.add(total_agio, agio_value, out=total_agio, where=aplica)
+                np.add(dropdown_value, agio_value, out=impacto)
+                np.subtract(balance, impacto, out=balance, where=aplica)
+                np.divide(balance, restante, out=amortization, where=aplica)
+
+            np.multiply(balance, admin_fee, out=admin_fee_value)
+            np.add(amortization, admin_fee_value, out=monthly_payment, where=onde)
+
+            if dropdown and taxa_antes_dropdown:
+                np.add(total_dropdown_value, dropdown_value, out=total_dropdown_value, where=aplica)
+                np.add(total_agio, dropdown_value * fator_agio, out=total_agio, where=aplica)
+                np.multiply(dropdown_value, fator_impacto, out=impacto)
+                np.subtract(balance, impacto, out=balance, where=aplica)
+                np.divide(balance, restante, out=amortization, where=aplica)
+
+            np.subtract(balance, amortization, out=balance, where=onde)
+            np.copyto(balances[month], balance, where=onde)
+            np.add(quitacao, 1, out=quitacao, where=onde)
+
+            ativo &= balance > 0
+            ativo &= monthly_payment >= parcela_minima
+            if month in meses_de_termino:
+                ativo &= months > month
+            month += 1
+
+    # Linhas = cotas, colunas = meses; meses após a quitação ficam como NaN
+    return payments.T, balances.T, total_dropdown_value, total_agio, quitacao
+
+
+def _primeiro_mes_divergente(itens_a, itens_b):
+    # Ambos ordenados por mês: o primeiro par diferente marca o mês afetado
+    for (mes_a, valor_a), (mes_b, valor_b) in zip(itens_a, itens_b):
+        if mes_a != mes_b or valor_a != valor_b:
+            return min(mes_a, mes_b)
+    if len(itens_a) > len(itens_b):
+        return itens_a[len(itens_b)][0]
+    if len(itens_b) > len(itens_a):
+        return itens_b[len(itens_a)][0]
+    return None
+
+
+# Planos já compilados para o laço escalar, por (plano, prazo): os apps recalculam a mesma cota a cada rerun
+_REGRAS_ESCALARES = {}
+MAX_REGRAS_ESCALARES = 256
+
+
+def _regras_escalares(plano, months):
+    # Plano compilado para uma única cota, com as tabelas em listas para o laço em Python
+    plano = plano or PLANOS['finance_app']
+    try:
+        # Planos só com escalares dispensam a normalização completa da chave
+        chave = (tuple(plano.items()), months)
+        hash(chave)
+    except TypeError:
+        chave = (congelar(plano), months)
+    regras = _REGRAS_ESCALARES.get(chave)
+    if regras is None:
+        regras = compilar_plano(plano, months)
+        fatores = regras['fatores'].tolist()
+        regras = dict(regras, corrige=regras['corrige'].tolist(),
+                      fator_mes=[fatores[i] if i >= 0 else 1.0 for i in regras['indice'].tolist()],
+                      correcoes=np.flatnonzero(regras['corrige']).tolist())
+        if len(_REGRAS_ESCALARES) >= MAX_REGRAS_ESCALARES:
+            _REGRAS_ESCALARES.clear()
+        _REGRAS_ESCALARES[chave] = regras
+    return regras
+
+
+def _percorrer(months, admin_fee, dropdowns, agio, regras, mes_inicial,
+               balance, amortization, total_dropdown_value, total_agio):
+    # Laço mensal de calculate_payments a partir de um estado qualquer; produz o estado após cada mês
+    corrige, fator_mes = regras['corrige'], regras['fator_mes']
+    taxa_antes_dropdown, parcela_minima = regras['taxa_antes_dropdown'], regras['parcela_minima']
+    for month in range(mes_inicial, months + 1):
+        if corrige[month]:
+            balance *= fator_mes[month]
+            amortization = balance / (months - month + 1)
+
+        if month in dropdowns and not taxa_antes_dropdown:
+            dropdown_value = dropdowns[month]
+            agio_value = dropdown_value * (agio/100)
+            total_dropdown_value += dropdown_value
+            total_agio += agio_value
+            balance -= (dropdown_value + agio_value)
+            amortization = balance / (months - month + 1)
+
+        admin_fee_value = balance * admin_fee
+        monthly_payment = amortization + admin_fee_value
+
+        if month in dropdowns and taxa_antes_dropdown:
+            dropdown_value = dropdowns[month]
+            total_dropdown_value += dropdown_value
+            total_agio += dropdown_value * (agio/100)
+            balance -= dropdown_value * (1 + agio/100)
+            amortization = balance / (months - month + 1)
+
+        balance -= amortization
+        yield monthly_payment, balance, amortization, total_dropdown_value, total_agio
+
+        if balance <= 0 or monthly_payment < parcela_minima:
+            return
+
+
+def _calculate_payments_laco(principal, months, admin_fee, dropdowns, agio, plano=None):
+    # Laço mensal das fórmulas originais: referência dos motores por trechos
+    regras = _regras_escalares(plano, months)
+    payments = []
+    balances = [principal]
+    total_dropdown_value = 0
+    total_agio = 0
+    for monthly_payment, balance, _, total_dropdown_value, total_agio in _percorrer(
+            months, admin_fee, dropdowns, agio, regras, 1, principal, principal / months, 0, 0):
+        payments.append(monthly_payment)
+        balances.append(balance)
+    return payments, balances, total_dropdown_value, total_agio
+
+
+def calculate_payments(principal, months, admin_fee, dropdowns, agio, plano=None):
+    # Cronograma de uma cota sob o plano de regras (constructa.regras; padrão: finance_app.py).
+    # A partir de MESES_MINIMOS_ANALITICO meses percorre só os eventos, com o mesmo resultado do laço
+    if months < MESES_MINIMOS_ANALITICO:
+        return _calculate_payments_laco(principal, months, admin_fee, dropdowns, agio, plano)
+    # Entre dropdowns a amortização A é constante e a correção só reinicia o trecho, então o laço
+    # em Python percorre só os eventos (O(correções + dropdowns)). Cada trecho sai de um accumulate,
+    # com as subtrações na mesma ordem do laço, e como saldo e parcela caem dentro do trecho só o
+    # último mês diz se a cota para nele
+    regras = _regras_escalares(plano, months)
+    parcela_minima = regras['parcela_minima']
+    eventos = sorted(set(mes for mes in regras['correcoes'] if mes <= months)
+                     | {mes for mes in dropdowns if 1 <= mes <= months})
+    # Cada evento custa alguns meses do laço: com eventos densos o laço mensal sai mais barato
+    if len(eventos) * MESES_POR_EVENTO > months:
+        return _calculate_payments_laco(principal, months, admin_fee, dropdowns, agio, plano)
+    eventos.append(months + 1)
+    payments, balances = [], [principal]
+    inicio, balance, amortization = 1, principal, principal / months
+    total_dropdown_value = 0
+    total_agio = 0
+    for evento in eventos:
+        # Meses inicio..evento-1 a partir do saldo no início do mês inicio
+        saldos = list(itertools.accumulate(itertools.repeat(amortization, evento - inicio), operator.sub,
+                                           initial=balance))
+        parcelas = [amortization + saldo * admin_fee for saldo in saldos[:-1]]
+        if parcelas and (saldos[-1] <= 0 or parcelas[-1] < parcela_minima):
+            para = next(i for i, parcela in enumerate(parcelas) if saldos[i + 1] <= 0 or parcela < parcela_minima)
+            payments.extend(parcelas[:para + 1])
+            balances.extend(saldos[1:para + 2])
+            break
+        payments.extend(parcelas)
+        balances.extend(saldos[1:])
+        balance = saldos[-1]
+        if evento > months:
+            break
+        if evento in dropdowns:
+            # Mês de dropdown: mesmo passo do laço mensal
+            monthly_payment, balance, amortization, total_dropdown_value, total_agio = next(_percorrer(
+                months, admin_fee, dropdowns, agio, regras, evento,
+                balance, amortization, total_dropdown_value, total_agio))
+            payments.append(monthly_payment)
+            balances.append(balance)
+            if balance <= 0 or monthly_payment < parcela_minima:
+                break
+            inicio = evento + 1
+        else:
+            balance *= regras['fator_mes'][evento]
+            amortization = balance / (months - evento + 1)
+            inicio = evento
+    return payments, balances, total_dropdown_value, total_agio
+
+
+class CalculadoraIncremental:
+    # Guarda checkpoints mensais (saldo, amortização e totais) das últimas execuções.
+    # Um dropdown no mês m não altera nada antes de m, então a nova execução retoma
+    # do checkpoint do mês m - 1 da execução em cache com o maior prefixo em comum.
+    # O plano de regras padrão pode ser trocado a cada chamada; execuções de planos diferentes
+    # nunca são reaproveitadas entre si.
+
+    def __init__(self, plano=None, max_execucoes=8):
+        self.plano = plano or PLANOS['finance_app']
+        self.max_execucoes = max_execucoes
+        self.meses_calculados = 0
+        self._execucoes = {}
+
+    def _melhor_execucao(self, parametros, itens):
+        melhor, mes_retomada = None, 1
+        for (parametros_exec, itens_exec), execucao in self._execucoes.items():
+            if parametros_exec != parametros:
+                continue
+            mes = _primeiro_mes_divergente(itens_exec, itens)
+            if mes is None:
+                return execucao, float('inf')
+            if mes > mes_retomada:
+                melhor, mes_retomada = execucao, mes
+        return melhor, mes_retomada
+
+    def calcular(self, principal, months, admin_fee, dropdowns, agio, plano=None):
+        plano = plano or self.plano
+        parametros = (principal, months, admin_fee, agio, congelar(plano))
+        itens = tuple(sorted(dropdowns.items()))
+        execucao, mes_retomada = self._melhor_execucao(parametros, itens)
+
+        if execucao is not None and len(execucao['payments']) < mes_retomada:
+            # A execução em cache quitou antes do primeiro mês afetado
+            payments, balances = list(execucao['payments']), list(execucao['balances'])
+            total_dropdown_value, total_agio = execucao['totais'][-1]
+            self._guardar(parametros, itens, execucao)
+            return payments, balances, total_dropdown_value, total_agio
+
+        if execucao is None:
+            mes_retomada = 1
+            payments, balances = [], [principal]
+            estados = [(principal, principal / months)]
+            totais = [(0, 0)]
+        else:
+            corte = mes_retomada - 1
+            payments = execucao['payments'][:corte]
+            balances = execucao['balances'][:corte + 1]
+            estados = execucao['estados'][:corte + 1]
+            totais = execucao['totais'][:corte + 1]
+
+        balance, amortization = estados[-1]
+        total_dropdown_value, total_agio = totais[-1]
+
+        for monthly_payment, balance, amortization, total_dropdown_value, total_agio in _percorrer(
+                months, admin_fee, dropdowns, agio, _regras_escalares(plano, months), mes_retomada,
+                balance, amortization, total_dropdown_value, total_agio):
+            self.meses_calculados += 1
+            payments.append(monthly_payment)
+            balances.append(balance)
+            estados.append((balance, amortization))
+            totais.append((total_dropdown_value, total_agio))
+
+        self._guardar(parametros, itens, {'payments': payments, 'balances': balances,
+                                          'estados': estados, 'totais': totais})
+        return list(payments), list(balances), total_dropdown_value, total_agio
+
+    def _guardar(self, parametros, itens, execucao):
+        chave = (parametros, itens)
+        self._execucoes.pop(chave, None)
+        self._execucoes[chave] = execucao
+        while len(self._execucoes) > self.max_execucoes:
+            del self._execucoes[next(iter(self._execucoes))]
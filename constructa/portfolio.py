@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from constructa.fluxo import COLUNAS_PARAMETROS, SERIES_FLUXO, fluxos_de_tabela, metricas_fluxos
+
+COLUNAS_PROJETO = COLUNAS_PARAMETROS + ['mes_lancamento']
+
+
+def consolidar_portfolio(origem, tamanho_lote=5000):
+    # Lê o CSV em blocos e soma o fluxo de cada empreendimento no calendário comum
+    # (mês 1 = primeiro mês do calendário; mes_lancamento é o mês em que a obra começa).
+    # Só os totais mensais consolidados ficam em memória.
+    receitas = np.zeros(0)
+    custos = np.zeros(0)
+    vgv_total = 0.0
+    num_projetos = 0
+
+    for lote in pd.read_csv(origem, chunksize=tamanho_lote):
+        if 'mes_lancamento' not in lote:
+            raise ValueError("Colunas ausentes: mes_lancamento")
+        fluxos = fluxos_de_tabela(lote)
+        inicio = lote['mes_lancamento'].to_numpy(dtype=np.int64) - 1
+        if (inicio < 0).any():
+            raise ValueError("mes_lancamento deve ser maior ou igual a 1")
+
+        prazo = fluxos['prazo_meses']
+        projeto, mes = np.nonzero(np.arange(prazo.max())[None, :] < prazo[:, None])
+        mes_calendario = inicio[projeto] + mes
+        tamanho = max(receitas.size, int(mes_calendario.max()) + 1)
+        receitas = np.pad(receitas, (0, tamanho - receitas.size))
+        custos = np.pad(custos, (0, tamanho - custos.size))
+        receitas += np.bincount(mes_calendario, fluxos['Receitas'][projeto, mes], minlength=tamanho)
+        custos += np.bincount(mes_calendario, fluxos['Custos'][projeto, mes], minlength=tamanho)
+
+        vgv_total += float(lote['vgv'].sum())
+        num_projetos += len(lote)
+
+    if num_projetos == 0:
+        raise ValueError("O portfólio não contém empreendimentos")
+
+    consolidado = pd.DataFrame({'Mês': np.arange(1, receitas.size + 1)})
+    consolidado['Receitas'] = receitas
+    consolidado['Custos'] = custos
+    consolidado['Saldo Mensal'] = receitas - custos
+    consolidado['Saldo Acumulado'] = np.cumsum(consolidado['Saldo Mensal'].to_numpy())
+
+    metricas = {chave: valor[0].item() for chave, valor in
+                metricas_fluxos(consolidado['Saldo Mensal'].to_numpy(), vgv_total).items()}
+    metricas['vgv_total'] = vgv_total
+    metricas['num_projetos'] = num_projetos
+    return consolidado[['Mês'] + SERIES_FLUXO], metricas
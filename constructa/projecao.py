@@ -0,0 +1,43 @@
+import numpy as np
+
+
+def empacotar_estrategias(estrategias):
+    # Lista de cronogramas [(mês, valor, ágio %), ...] em matrizes preenchidas (mês 0 = vazio)
+    largura = max((len(cronograma) for cronograma in estrategias), default=0)
+    meses = np.zeros((len(estrategias), largura), dtype=np.int64)
+    valores = np.zeros((len(estrategias), largura), dtype=np.float64)
+    agios = np.zeros((len(estrategias), largura), dtype=np.float64)
+    for i, cronograma in enumerate(estrategias):
+        for j, (mes, valor, agio) in enumerate(cronograma):
+            meses[i, j], valores[i, j], agios[i, j] = mes, valor, agio
+    return meses, valores, agios
+
+
+def projetar_saldos(dnd, prazo, meses, valores, agios):
+    # Saldo do DND amortizado linearmente no prazo, sem dropdowns e com os de cada estratégia
+    # (linhas de meses/valores/agios); cada dropdown abate valor * (1 + ágio) a partir do seu mês
+    meses = np.atleast_2d(np.asarray(meses, dtype=np.int64))
+    impactos = np.atleast_2d(np.asarray(valores, dtype=np.float64)) * (1 + np.atleast_2d(agios) / 100)
+    eixo = np.arange(prazo + 1)
+    saldo_sem = dnd - dnd / prazo * eixo
+
+    abatimentos = np.zeros((meses.shape[0], prazo + 1))
+    linhas, colunas = np.nonzero((meses >= 1) & (meses <= prazo))
+    # add.at soma dropdowns repetidos no mesmo mês em vez de sobrescrever
+    np.add.at(abatimentos, (linhas, meses[linhas, colunas]), impactos[linhas, colunas])
+    # O saldo devedor não fica negativo: abatimentos além dele só antecipam a quitação
+    saldo_com = np.maximum(saldo_sem - np.cumsum(abatimentos, axis=1), 0.0)
+    return saldo_sem, saldo_com
+
+
+def resumir_estrategias(saldo_com, meses, valores, agios):
+    # Desembolso, impacto e mês de quitação (prazo original quando o saldo só zera no fim) por estratégia;
+    # dropdowns fora do prazo não entram, como em projetar_saldos
+    meses = np.atleast_2d(meses)
+    valores = np.where((meses >= 1) & (meses <= saldo_com.shape[1] - 1), np.atleast_2d(valores), 0.0)
+    quitado = saldo_com <= 0
+    return {
+        'desembolso': valores.sum(axis=1),
+        'impacto': (valores * (1 + np.atleast_2d(agios) / 100)).sum(axis=1),
+        'mes_quitacao': np.where(quitado.any(axis=1), quitado.argmax(axis=1), saldo_com.shape[1] - 1),
+    }
@@ -0,0 +1,34 @@
+import numpy as np
+
+
+def indices_lttb(x, y, limite):
+    # Largest-Triangle-Three-Buckets: escolhe `limite` pontos da série (x crescente, y finito)
+    # mantendo o primeiro, o último e, em cada faixa, o ponto que forma o maior triângulo com o
+    # ponto escolhido antes e a média da faixa seguinte; picos e vales sobrevivem à redução
+    n = len(y)
+    if limite is None or n <= limite or limite < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    bordas = np.linspace(1, n - 1, limite - 1).astype(np.int64)
+    # Médias de cada faixa por somas acumuladas; a "faixa seguinte" da última é o último ponto
+    soma_x, soma_y = np.r_[0.0, np.cumsum(x)], np.r_[0.0, np.cumsum(y)]
+    inicios, fins = bordas[1:], np.r_[bordas[2:], n]
+    media_x = (soma_x[fins] - soma_x[inicios]) / (fins - inicios)
+    media_y = (soma_y[fins] - soma_y[inicios]) / (fins - inicios)
+
+    indices = np.empty(limite, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for i in range(limite - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        area = np.abs((x[anterior] - media_x[i]) * (y[inicio:fim] - y[anterior])
+                      - (x[anterior] - x[inicio:fim]) * (media_y[i] - y[anterior]))
+        anterior = inicio + int(area.argmax())
+        indices[i + 1] = anterior
+    return indices
+
+
+def indices_lttb_uniao(x, series, limite):
+    # Séries que compartilham o eixo x (gráficos em formato largo): união dos pontos de cada uma
+    return np.unique(np.concatenate([indices_lttb(x, y, limite) for y in series]))
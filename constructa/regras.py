@@ -0,0 +1,79 @@
+import numpy as np
+
+BASES_TAXA = ('saldo_apos_dropdown', 'saldo_antes_dropdown')
+
+
+def plano_regras(correcao=1.05, meses_correcao=12, base_taxa='saldo_apos_dropdown', agio_como_receita=True,
+                 parcela_minima=500.0):
+    # Regras do cronograma de uma cota:
+    # - correcao: fator aplicado ao saldo em cada mês de correção; escalar, série com um fator por
+    #   correção (índice histórico ou projetado) ou matriz cota x correção
+    # - meses_correcao: periodicidade em meses ou a lista dos meses do calendário de correção
+    # - base_taxa: no mês do dropdown, a taxa incide sobre o saldo já abatido (finance_app.py) ou
+    #   sobre o saldo anterior ao dropdown (analise_dados.py)
+    # - agio_como_receita: o ágio volta ao tomador como receita nos indicadores (finance_app.py)
+    #   ou só reduz o saldo (analise_dados.py)
+    # - parcela_minima: a cota é encerrada no mês em que a parcela fica abaixo deste valor
+    if base_taxa not in BASES_TAXA:
+        raise ValueError(f"Base da taxa desconhecida: {base_taxa}")
+    return {
+        'correcao': correcao,
+        'meses_correcao': meses_correcao,
+        'base_taxa': base_taxa,
+        'agio_como_receita': agio_como_receita,
+        'parcela_minima': float(parcela_minima),
+    }
+
+
+# As duas variantes dos apps são configurações do mesmo motor
+PLANOS = {
+    'finance_app': plano_regras(),
+    'analise_dados': plano_regras(base_taxa='saldo_antes_dropdown', agio_como_receita=False),
+}
+
+
+def calendario_correcao(plano, horizonte):
+    # Meses de correção dentro do prazo, em ordem
+    meses = plano['meses_correcao']
+    if np.ndim(meses) == 0:
+        return np.arange(int(meses), horizonte + 1, int(meses), dtype=np.int64)
+    meses = np.unique(np.asarray(meses, dtype=np.int64))
+    return meses[(meses >= 1) & (meses <= horizonte)]
+
+
+def compilar_plano(plano, horizonte, n=1):
+    # Traduz o plano em vetores indexados pelo mês (posição 0 sem uso), para que o cronograma só
+    # consulte tabelas em vez de decidir mês a mês:
+    # - corrige[m]: há correção no mês m, com o fator fatores[indice[m]] (por cota quando 2-D)
+    # - proxima_correcao[m]: primeiro mês de correção depois de m (horizonte + 1 se não houver)
+    if 'corrige' in plano:
+        if plano['corrige'].size < horizonte + 2:
+            raise ValueError("O plano foi compilado para um horizonte menor que o prazo das cotas")
+        return plano
+    meses = calendario_correcao(plano, horizonte)
+    correcao = np.asarray(plano['correcao'], dtype=np.float64)
+    if correcao.ndim == 0:
+        fatores = np.full(meses.size, float(correcao))
+    else:
+        if correcao.shape[-1] < meses.size:
+            raise ValueError("A correção precisa de um fator para cada mês do calendário de correção")
+        fatores = correcao[..., :meses.size]
+        if fatores.ndim == 2:
+            # Correção x cota: cada mês de correção lê uma linha contígua
+            fatores = np.ascontiguousarray(np.broadcast_to(fatores, (n, meses.size)).T)
+
+    corrige = np.zeros(horizonte + 2, dtype=bool)
+    corrige[meses] = True
+    indice = np.full(horizonte + 2, -1, dtype=np.int64)
+    indice[meses] = np.arange(meses.size)
+    posicao = np.searchsorted(meses, np.arange(horizonte + 2), side='right')
+    proxima_correcao = np.append(meses, horizonte + 1)[posicao]
+    return {
+        'corrige': corrige,
+        'indice': indice,
+        'fatores': fatores,
+        'proxima_correcao': proxima_correcao,
+        'taxa_antes_dropdown': plano['base_taxa'] == 'saldo_antes_dropdown',
+        'agio_como_receita': plano['agio_como_receita'],
+        'parcela_minima': plano['parcela_minima'],
+    }
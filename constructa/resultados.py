@@ -0,0 +1,162 @@
+import datetime
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+ARQUIVO_METADADOS = 'resultados.json'
+PERCENTIS_FAIXAS = (5, 25, 50, 75, 95)
+# Memória de trabalho por bloco de meses nas faixas de percentis
+BYTES_BLOCO = 64 * 1024 ** 2
+
+
+def _arquivo(caminho, grupo, nome):
+    return os.path.join(caminho, grupo, f"{nome}.npy")
+
+
+def _coluna_fixa(coluna):
+    # Colunas de texto ou de objetos (dropdowns em dicionário) viram texto de largura fixa
+    if coluna.dtype != object and not isinstance(coluna.dtype, pd.StringDtype):
+        return coluna.to_numpy()
+    return np.array([v if isinstance(v, str) else json.dumps(v, ensure_ascii=False, default=float)
+                     for v in coluna], dtype=str)
+
+
+def gravar_resultados(caminho, parametros, series, horizonte, calcular, tamanho_lote=10_000, progresso=None):
+    # Roda um lote de cenários em pedaços e grava cada série como float64 mês x cenário (um .npy
+    # por série, mapeado em memória), junto com a tabela de parâmetros (um .npy por coluna).
+    # calcular(parte): recebe as linhas de `parametros` do pedaço e devolve {série: matriz
+    # cenário x mês} com até `horizonte` meses (o que faltar fica NaN).
+    # progresso(fração, parcial): chamado a cada pedaço com o número de cenários gravados
+    n = len(parametros)
+    os.makedirs(os.path.join(caminho, 'series'), exist_ok=True)
+    os.makedirs(os.path.join(caminho, 'parametros'), exist_ok=True)
+    colunas = [str(c) for c in parametros.columns]
+    for coluna, nome in zip(parametros.columns, colunas):
+        np.save(_arquivo(caminho, 'parametros', nome), _coluna_fixa(parametros[coluna]))
+
+    metadados = {'cenarios': n, 'horizonte': int(horizonte), 'series': list(series), 'parametros': colunas,
+                 'criado_em': datetime.datetime.now().isoformat(timespec='seconds'), 'gravados': 0}
+    _gravar_metadados(caminho, metadados)
+
+    destinos = {nome: np.lib.format.open_memmap(_arquivo(caminho, 'series', nome), mode='w+', dtype=np.float64,
+                                                shape=(horizonte, n))
+                for nome in series}
+    for inicio in range(0, n, tamanho_lote):
+        fim = min(inicio + tamanho_lote, n)
+        valores = calcular(parametros.iloc[inicio:fim])
+        for nome, destino in destinos.items():
+            bloco = np.asarray(valores[nome], dtype=np.float64)
+            destino[:bloco.shape[1], inicio:fim] = bloco.T
+            destino[bloco.shape[1]:, inicio:fim] = np.nan
+        if progresso is not None:
+            progresso(fim / n, {'gravados': fim, 'total': n})
+    for destino in destinos.values():
+        destino.flush()
+    del destinos
+
+    # Só um lote gravado até o fim é marcado como completo
+    metadados['gravados'] = n
+    _gravar_metadados(caminho, metadados)
+    return ResultadosColunares(caminho)
+
+
+def _gravar_metadados(caminho, metadados):
+    temporario = os.path.join(caminho, ARQUIVO_METADADOS + '.tmp')
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(metadados, arquivo, ensure_ascii=False, indent=1)
+    os.replace(temporario, os.path.join(caminho, ARQUIVO_METADADOS))
+
+
+def _percentis_linhas(bloco, percentis):
+    # Percentis de cada linha ignorando NaN (meses depois da quitação), com a interpolação linear
+    # de np.percentile; ordena o bloco uma vez em vez de chamar nanpercentile linha a linha
+    ordenado = np.sort(bloco, axis=1)
+    validos = np.count_nonzero(~np.isnan(bloco), axis=1)
+    posicao = (np.maximum(validos, 1) - 1)[:, None] * (np.asarray(percentis, dtype=np.float64) / 100)[None, :]
+    baixo = np.floor(posicao).astype(np.int64)
+    alto = np.minimum(baixo + 1, np.maximum(validos, 1)[:, None] - 1)
+    fracao = posicao - baixo
+    linhas = np.arange(bloco.shape[0])[:, None]
+    resultado = ordenado[linhas, baixo] * (1 - fracao) + ordenado[linhas, alto] * fracao
+    resultado[validos == 0] = np.nan
+    return resultado
+
+
+class ResultadosColunares:
+    # Leitura de um lote gravado por gravar_resultados: nada é carregado na abertura; cada série é
+    # um memmap mês x cenário, então um mês de todos os cenários é uma linha contígua e um cenário
+    # lê uma página por mês
+
+    def __init__(self, caminho):
+        caminho_metadados = os.path.join(caminho, ARQUIVO_METADADOS)
+        if not os.path.exists(caminho_metadados):
+            raise ValueError(f"Não há resultados gravados em {caminho}")
+        with open(caminho_metadados, encoding='utf-8') as arquivo:
+            self.metadados = json.load(arquivo)
+        if self.metadados['gravados'] < self.metadados['cenarios']:
+            raise ValueError(f"Lote incompleto em {caminho}: {self.metadados['gravados']} de "
+                             f"{self.metadados['cenarios']} cenários gravados")
+        self.caminho = caminho
+        self.series = {nome: np.load(_arquivo(caminho, 'series', nome), mmap_mode='r')
+                       for nome in self.metadados['series']}
+        self._parametros = None
+
+    def __len__(self):
+        return self.metadados['cenarios']
+
+    @property
+    def horizonte(self):
+        return self.metadados['horizonte']
+
+    def parametro(self, nome):
+        return np.load(_arquivo(self.caminho, 'parametros', nome), mmap_mode='r')
+
+    @property
+    def parametros(self):
+        # Tabela de parâmetros montada no primeiro acesso
+        if self._parametros is None:
+            self._parametros = pd.DataFrame({nome: self.parametro(nome) for nome in self.metadados['parametros']})
+        return self._parametros
+
+    def selecionar(self, **faixas):
+        # Índices dos cenários com cada parâmetro em [mínimo, máximo]; None deixa o lado aberto
+        selecionados = np.ones(len(self), dtype=bool)
+        for nome, (minimo, maximo) in faixas.items():
+            valores = self.parametro(nome)
+            if minimo is not None:
+                selecionados &= valores >= minimo
+            if maximo is not None:
+                selecionados &= valores <= maximo
+        return np.flatnonzero(selecionados)
+
+    def cenario(self, indice):
+        # Todas as séries de um cenário, um mês por linha
+        tabela = pd.DataFrame({'Mês': np.arange(1, self.horizonte + 1)})
+        for nome, serie in self.series.items():
+            tabela[nome] = np.array(serie[:, indice])
+        return tabela
+
+    def mes(self, mes, cenarios=None):
+        # Valor de cada série no mês (1 = primeiro mês) para todos os cenários ou os indicados
+        if not 1 <= mes <= self.horizonte:
+            raise ValueError(f"Mês fora do horizonte de 1 a {self.horizonte}: {mes}")
+        colunas = slice(None) if cenarios is None else cenarios
+        return pd.DataFrame({nome: np.array(serie[mes - 1, colunas]) for nome, serie in self.series.items()})
+
+    def faixas(self, nome, percentis=PERCENTIS_FAIXAS, cenarios=None, meses=None):
+        # Percentis da série em cada mês entre os cenários (todos ou os indicados), lendo blocos de
+        # meses de até BYTES_BLOCO; meses é uma faixa (início, fim) em meses, inclusive
+        serie = self.series[nome]
+        inicio, fim = meses or (1, self.horizonte)
+        largura = len(self) if cenarios is None else len(cenarios)
+        passo = max(1, BYTES_BLOCO // max(largura * 8, 1))
+        resultado = np.empty((fim - inicio + 1, len(percentis)))
+        for mes in range(inicio, fim + 1, passo):
+            ate = min(mes + passo, fim + 1)
+            bloco = serie[mes - 1:ate - 1] if cenarios is None else serie[mes - 1:ate - 1, cenarios]
+            resultado[mes - inicio:ate - inicio] = _percentis_linhas(np.asarray(bloco), percentis)
+        tabela = pd.DataFrame(resultado, columns=[f"P{p}" for p in percentis])
+        tabela.insert(0, 'Mês', np.arange(inicio, fim + 1))
+        return tabela
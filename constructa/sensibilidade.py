@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+from constructa.fluxo import calcular_fluxos_lote, metricas_fluxos
+
+# Parâmetros do modelo auto financiado, com os mesmos nomes do session_state de cenarios.py
+PARAMETROS = {
+    'vgv': 'VGV (milhões R$)',
+    'custo_construcao_percentual': 'Custo de Construção (% do VGV)',
+    'prazo_meses': 'Prazo de Construção (meses)',
+    'percentual_inicio': '% Custos no Início da Obra',
+    'percentual_meio': '% Custos no Meio da Obra',
+    'percentual_fim': '% Custos no Fim da Obra',
+    'percentual_lancamento': '% Vendas no Lançamento',
+    'percentual_baloes': '% Vendas em Balões',
+    'percentual_parcelas': '% Vendas em Parcelas',
+    'prazo_parcelas': 'Prazo das Parcelas (meses)',
+}
+PARAMETROS_INTEIROS = ('prazo_meses', 'prazo_parcelas')
+METRICAS = {
+    'exposicao_maxima': 'Exposição Máxima de Caixa (milhões R$)',
+    'mes_payback': 'Mês de Payback',
+    'lucro_total': 'Lucro Total (milhões R$)',
+    'margem': 'Margem (%)',
+}
+
+
+def avaliar_parametros(parametros):
+    # Cada parâmetro pode ser escalar ou vetor; todos os pontos são avaliados em uma chamada.
+    # num_baloes e fim_baloes são opcionais e ficam fora das grades (padrão: 3 balões ao longo da obra)
+    parametros = {nome: np.asarray(valor) for nome, valor in parametros.items()}
+    for nome in PARAMETROS_INTEIROS:
+        parametros[nome] = np.maximum(np.rint(parametros[nome]), 1).astype(np.int64)
+    vgv = np.asarray(parametros['vgv'], dtype=np.float64)
+    fluxos = calcular_fluxos_lote(
+        vgv, vgv * parametros['custo_construcao_percentual'] / 100, parametros['prazo_meses'],
+        parametros['percentual_inicio'], parametros['percentual_meio'], parametros['percentual_fim'],
+        parametros['percentual_lancamento'], parametros['percentual_baloes'], parametros['percentual_parcelas'],
+        parametros['prazo_parcelas'], parametros.get('num_baloes', 3), parametros.get('fim_baloes', 100))
+    return metricas_fluxos(fluxos['Saldo Mensal'], np.broadcast_to(vgv, fluxos['prazo_meses'].shape))
+
+
+def grade_sensibilidade(base, eixos, tamanho_bloco=20_000, progresso=None):
+    # eixos: {nome: valores}; devolve cada métrica como matriz com o formato da grade
+    # (na ordem dos eixos: com dois eixos, linhas = primeiro parâmetro, colunas = segundo)
+    # progresso(fração, parcial): chamado a cada bloco de pontos com a grade parcial (NaN nos pontos pendentes)
+    valores = [np.asarray(v, dtype=np.float64) for v in eixos.values()]
+    malha = [coordenadas.ravel() for coordenadas in np.meshgrid(*valores, indexing='ij')]
+    formato = tuple(len(v) for v in valores)
+    total = malha[0].size
+    parametros = dict(base)
+    metricas = {}
+    for inicio in range(0, total, tamanho_bloco):
+        fatia = slice(inicio, inicio + tamanho_bloco)
+        for nome, coordenadas in zip(eixos, malha):
+            parametros[nome] = coordenadas[fatia]
+        for nome, valor in avaliar_parametros(parametros).items():
+            if nome not in metricas:
+                metricas[nome] = np.empty(total, dtype=valor.dtype)
+            metricas[nome][fatia] = valor
+        if progresso is not None:
+            fim = min(inicio + tamanho_bloco, total)
+            parcial = {}
+            for nome, valor in metricas.items():
+                parcial[nome] = np.full(total, np.nan)
+                parcial[nome][:fim] = valor[:fim]
+                parcial[nome] = parcial[nome].reshape(formato)
+            progresso(fim / total, parcial)
+    return {nome: valor.reshape(formato) for nome, valor in metricas.items()}
+
+
+def tornado(base, metrica='exposicao_maxima', variacao=0.1, parametros=None):
+    # Sensibilidade um de cada vez: cada parâmetro sobe e desce `variacao` mantendo os demais na base
+    nomes = list(parametros or PARAMETROS)
+    pontos = {nome: np.full(2 * len(nomes), float(base[nome])) for nome in base}
+    for i, nome in enumerate(nomes):
+        pontos[nome][2 * i] = base[nome] * (1 - variacao)
+        pontos[nome][2 * i + 1] = base[nome] * (1 + variacao)
+    resultado = avaliar_parametros(pontos)[metrica]
+    referencia = avaliar_parametros(dict(base))[metrica][0]
+
+    tabela = pd.DataFrame({
+        'parametro': nomes,
+        'rotulo': [PARAMETROS[nome] for nome in nomes],
+        'baixo': resultado[0::2],
+        'alto': resultado[1::2],
+    })
+    tabela['referencia'] = referencia
+    tabela['amplitude'] = (tabela['alto'] - tabela['baixo']).abs()
+    return tabela.sort_values('amplitude', ascending=True, ignore_index=True)
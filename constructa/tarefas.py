@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError as PrazoEsgotado
+
+from constructa.cache import congelar
+
+# Limites padrão, ajustáveis por variável de ambiente no servidor
+MAX_TRABALHADORES_PADRAO = int(os.environ.get("CONSTRUCTA_TAREFAS_TRABALHADORES", min(4, os.cpu_count() or 1)))
+MAX_TERMINADAS_PADRAO = int(os.environ.get("CONSTRUCTA_TAREFAS_MAX_TERMINADAS", 64))
+
+PENDENTE, EXECUTANDO, CONCLUIDA, CANCELADA, ERRO = 'pendente', 'executando', 'concluida', 'cancelada', 'erro'
+FINAIS = (CONCLUIDA, CANCELADA, ERRO)
+
+
+class TarefaCancelada(Exception):
+    pass
+
+
+def chave_tarefa(nome, args, kwargs):
+    return (nome, congelar(args), congelar(kwargs))
+
+
+class Tarefa:
+    # Estado compartilhado entre a thread do pool e os reruns do Streamlit que a acompanham
+
+    def __init__(self, chave, nome):
+        self.chave = chave
+        self.nome = nome
+        self.estado = PENDENTE
+        self.progresso = 0.0
+        self.parcial = None
+        self.resultado = None
+        self.erro = None
+        self.criada_em = time.time()
+        self.duracao = None
+        self.futuro = None
+        self._cancelar = threading.Event()
+        self._assinantes = set()
+        self._lock = threading.Lock()
+
+    @property
+    def terminada(self):
+        return self.estado in FINAIS
+
+    @property
+    def cancelada(self):
+        return self._cancelar.is_set()
+
+    def informar(self, progresso, parcial=None):
+        # Passado às funções como `progresso`: é também o ponto em que o cancelamento interrompe o cálculo
+        if self._cancelar.is_set():
+            raise TarefaCancelada(self.nome)
+        self.progresso = min(max(float(progresso), 0.0), 1.0)
+        if parcial is not None:
+            self.parcial = parcial
+
+    @property
+    def reaproveitavel(self):
+        # Concluída, ou ainda viva e sem pedido de cancelamento
+        return self.estado == CONCLUIDA or not (self.terminada or self.cancelada)
+
+    def assinar(self, assinante):
+        # Registra quem pediu a tarefa (uma sessão do navegador); False se ela já não pode ser
+        # reaproveitada, e então quem chamou deve submetê-la de novo
+        with self._lock:
+            if not self.reaproveitavel:
+                return False
+            self._assinantes.add(assinante)
+            return True
+
+    def cancelar(self, assinante=None):
+        # Cooperativo: a função para na próxima chamada de informar(); se ainda não começou, nem roda.
+        # Com assinante, só aquele desiste: a tarefa continua enquanto outro assinante a quiser.
+        # Devolve True se o cancelamento foi pedido de fato
+        with self._lock:
+            self._assinantes.discard(assinante)
+            if assinante is not None and self._assinantes:
+                return False
+            self._cancelar.set()
+        if self.futuro is not None and self.futuro.cancel():
+            self.estado = CANCELADA
+        return True
+
+    def aguardar(self, timeout=None):
+        # True se a tarefa terminou dentro do prazo
+        if self.futuro is not None:
+            try:
+                self.futuro.exception(timeout)
+            # Até o Python 3.10 o futuro levanta concurrent.futures.TimeoutError, não o TimeoutError embutido
+            except (PrazoEsgotado, CancelledError):
+                pass
+        return self.terminada
+
+
+class GerenciadorTarefas:
+    # Pool de threads do processo: o cálculo pesado fica em numpy, que libera o GIL, e as tarefas
+    # sobrevivem aos reruns porque não pertencem ao script que as submeteu
+
+    def __init__(self, max_trabalhadores=MAX_TRABALHADORES_PADRAO, max_terminadas=MAX_TERMINADAS_PADRAO):
+        self.max_terminadas = max_terminadas
+        self._pool = ThreadPoolExecutor(max_workers=max_trabalhadores, thread_name_prefix="constructa-tarefa")
+        self._tarefas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tarefas)
+
+    def obter(self, nome, *args, **kwargs):
+        # Tarefa já submetida com os mesmos argumentos (em andamento ou concluída), ou None
+        chave = chave_tarefa(nome, args, kwargs)
+        with self._lock:
+            tarefa = self._tarefas.get(chave)
+            if tarefa is not None:
+                self._tarefas.move_to_end(chave)
+            return tarefa
+
+    def submeter(self, nome, funcao, *args, **kwargs):
+        # funcao(*args, progresso=..., **kwargs); resubmeter os mesmos argumentos reaproveita a tarefa,
+        # a menos que ela tenha falhado ou sido cancelada (mesmo que ainda não tenha parado)
+        chave = chave_tarefa(nome, args, kwargs)
+        with self._lock:
+            tarefa = self._tarefas.get(chave)
+            if tarefa is not None and tarefa.reaproveitavel:
+                self._tarefas.move_to_end(chave)
+                return tarefa
+            tarefa = Tarefa(chave, nome)
+            self._tarefas[chave] = tarefa
+            self._tarefas.move_to_end(chave)
+            self._despejar()
+            tarefa.futuro = self._pool.submit(self._executar, tarefa, funcao, args, kwargs)
+        return tarefa
+
+    def _executar(self, tarefa, funcao, args, kwargs):
+        if tarefa.cancelada:
+            tarefa.estado = CANCELADA
+            return
+        tarefa.estado = EXECUTANDO
+        inicio = time.perf_counter()
+        try:
+            resultado = funcao(*args, progresso=tarefa.informar, **kwargs)
+        except TarefaCancelada:
+            estado = CANCELADA
+        except Exception as erro:
+            tarefa.erro = erro
+            estado = ERRO
+        else:
+            tarefa.resultado = resultado
+            tarefa.progresso = 1.0
+            estado = CONCLUIDA
+        tarefa.duracao = time.perf_counter() - inicio
+        # O estado muda por último: quem lê terminada=True já encontra resultado ou erro preenchidos
+        tarefa.estado = estado
+
+    def _despejar(self):
+        # Só tarefas terminadas saem, das menos usadas para as mais usadas
+        terminadas = [chave for chave, tarefa in self._tarefas.items() if tarefa.terminada]
+        for chave in terminadas[:max(len(terminadas) - self.max_terminadas, 0)]:
+            del self._tarefas[chave]
+
+    def encerrar(self):
+        with self._lock:
+            for tarefa in self._tarefas.values():
+                tarefa.cancelar()
+        self._pool.shutdown(wait=True)
@@ -1,8 +1,30 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
+from constructa import ccc, lances, projecao
+from constructa.cache import memoizar
+from constructa.instrumentacao import medir
+import painel_desempenho
+import painel_mercado
+from graficos import adicionar_linhas
+
+
+@medir("varrer_lances")
+@memoizar("constructa_mvp.varrer_lances")
+def varrer_lances(dnd, prazo, admin_fee, **grade):
+    return lances.varrer_lances(dnd, prazo, admin_fee, **grade)
+
+
+@medir("simular_ccc")
+@memoizar("constructa_mvp.simular_ccc")
+def simular_ccc(dnd, **parametros):
+    # Guarda só o resumo: as matrizes por simulação não precisam ficar em cache
+    return ccc.resumir_acumulo(ccc.simular_grupo(**parametros), dnd)
+
 
 def main():
+    painel_desempenho.iniciar("constructa_mvp")
     st.title("Constructa Simulator")
 
     # Sidebar para inputs principais
@@ -23,28 +45,152 @@ def main():
     elif etapa_atual == "Saída":
         mostrar_etapa_saida(modelo, dnd, prazo)
 
+    painel_desempenho.finalizar()
+
 def mostrar_etapa_captacao(modelo, dnd, prazo):
     st.subheader("Etapa de Captação")
     if modelo == "PLE":
-        lance_pago = st.slider("Lance Pago (R$)", min_value=0, max_value=int(dnd/2), value=int(dnd/4))
-        lance_embutido = lance_pago  # Assumindo lance embutido igual ao pago
+        dimensionamento = st.radio("Dimensionamento do Lance", ["Lance único", "Fronteira de lances"], horizontal=True)
+        if dimensionamento == "Lance único":
+            lance_pago = st.slider("Lance Pago (R$)", min_value=0, max_value=int(dnd/2), value=int(dnd/4))
+            lance_embutido = lance_pago  # Assumindo lance embutido igual ao pago
+        else:
+            lance_pago, lance_embutido = mostrar_fronteira_lances(dnd, prazo)
         credito_liberado = dnd - lance_pago - lance_embutido
-        st.write(f"Crédito Liberado: R$ {credito_liberado:,}")
+        st.write(f"Crédito Liberado: R$ {credito_liberado:,.0f}")
+        mes_inicial_dropdown = 12
     else:  # CCC
         st.write("Simulação de acúmulo de crédito ao longo do tempo")
-        # Aqui viria a lógica de simulação do CCC
+        resumo = mostrar_simulacao_ccc(dnd, prazo)
+        # O dropdown parte, por padrão, do mês mediano em que o crédito acumulado atinge o DND
+        mes_inicial_dropdown = int(resumo['mes_dnd'][50]) if resumo['mes_dnd'] else 12
 
-    # Simulação de Dropdown
+    # O ágio médio negociado no mercado secundário passa a ser o ágio inicial dos dropdowns
+    agio_inicial = st.session_state.get('agio_negociado', 20)
+    with st.expander("Mercado Secundário"):
+        painel_mercado.mostrar_mercado('constructa_mvp', agio_inicial, usar_agio_negociado)
+
+    # Simulação de Dropdown: uma linha por dropdown; linhas com o mesmo nome formam uma estratégia
     st.subheader("Simulação de Dropdown")
-    meses_para_dropdown = st.slider("Meses até o Dropdown", min_value=1, max_value=prazo, value=12)
-    valor_dropdown = st.number_input("Valor do Dropdown (R$)", min_value=0, max_value=int(dnd/2), value=int(dnd/10))
-    agio = st.slider("Ágio (%)", min_value=0, max_value=50, value=20)
+    cronograma = st.data_editor(pd.DataFrame({
+        'Estratégia': ['Principal'], 'Mês': [mes_inicial_dropdown], 'Valor (R$)': [int(dnd/10)], 'Ágio (%)': [agio_inicial],
+    }), num_rows="dynamic", use_container_width=True, column_config={
+        'Mês': st.column_config.NumberColumn(min_value=1, max_value=prazo, step=1),
+        'Valor (R$)': st.column_config.NumberColumn(min_value=0, max_value=int(dnd/2), step=1000),
+        'Ágio (%)': st.column_config.NumberColumn(min_value=0, max_value=50),
+    })
+    col1, col2 = st.columns(2)
+    with col1:
+        num_alternativas = st.slider("Estratégias Alternativas", min_value=0, max_value=50, value=0)
+    with col2:
+        deslocamento = st.slider("Deslocamento entre Alternativas (meses)", min_value=1, max_value=24, value=3)
+    estrategias = montar_estrategias(cronograma, num_alternativas, deslocamento, prazo)
 
-    impacto_dropdown = valor_dropdown * (1 + agio/100)
-    st.write(f"Impacto do Dropdown: R$ {impacto_dropdown:,}")
+    # Todas as estratégias em uma única projeção vetorizada
+    meses, valores, agios = projecao.empacotar_estrategias(list(estrategias.values()))
+    saldo_sem_dropdown, saldos_com_dropdown = projecao.projetar_saldos(dnd, prazo, meses, valores, agios)
+    resumo = projecao.resumir_estrategias(saldos_com_dropdown, meses, valores, agios)
+    st.dataframe(pd.DataFrame({
+        'Estratégia': list(estrategias), 'Dropdowns': [len(c) for c in estrategias.values()],
+        'Desembolso (R$)': resumo['desembolso'], 'Impacto (R$)': resumo['impacto'],
+        'Quitação (mês)': resumo['mes_quitacao'],
+    }).style.format({'Desembolso (R$)': '{:,.0f}', 'Impacto (R$)': '{:,.0f}'}), hide_index=True)
 
     # Gráfico com Dropdown
-    st.plotly_chart(criar_grafico_com_dropdown(dnd, prazo, meses_para_dropdown, impacto_dropdown))
+    painel_desempenho.exibir_plotly(criar_grafico_com_dropdown(saldo_sem_dropdown, saldos_com_dropdown, list(estrategias)),
+                                    "dropdown")
+
+def mostrar_fronteira_lances(dnd, prazo):
+    # Todas as combinações de lance pago e embutido avaliadas de uma vez; o lance é escolhido
+    # clicando num ponto da fronteira (sem seleção, fica o de maior crédito liberado)
+    col1, col2, col3, col4 = st.columns(4)
+    admin_fee = col1.number_input("Taxa de Administração Mensal (%)", min_value=0.0, value=0.12, step=0.01) / 100
+    maximo_pago = col2.slider("Lance Pago Máximo (% do DND)", min_value=0, max_value=50, value=50)
+    maximo_embutido = col3.slider("Lance Embutido Máximo (% do DND)", min_value=0, max_value=50, value=30)
+    custo = col4.radio("Custo", ["CET Anual", "Custo Total"])
+    coluna_custo = 'cet_anual' if custo == "CET Anual" else 'custo_total'
+
+    varredura = varrer_lances(dnd, prazo, admin_fee, maximo_pago=maximo_pago, maximo_embutido=maximo_embutido)
+    fronteira = lances.fronteira_lances(varredura, coluna_custo)
+    rotulo_custo = 'CET Anual (%)' if coluna_custo == 'cet_anual' else 'Custo Total (R$)'
+
+    def dicas(tabela):
+        return [f"Pago R$ {p:,.0f} + Embutido R$ {e:,.0f}"
+                for p, e in zip(tabela['lance_pago'], tabela['lance_embutido'])]
+
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(x=varredura[coluna_custo], y=varredura['credito_liberado'], mode='markers',
+                               marker=dict(size=4, color='lightgray'), text=dicas(varredura), name='Combinações'))
+    fig.add_trace(go.Scatter(x=fronteira[coluna_custo], y=fronteira['credito_liberado'], mode='lines+markers',
+                             text=dicas(fronteira), name='Fronteira'))
+    fig.update_layout(xaxis_title=rotulo_custo, yaxis_title='Crédito Liberado (R$)')
+    evento = painel_desempenho.exibir_plotly(fig, "fronteira_lances", use_container_width=True, on_select="rerun",
+                                             selection_mode="points", key="grafico_fronteira_lances")
+
+    # Uma seleção antiga pode apontar para além de uma fronteira que encolheu
+    pontos = [p for p in evento.selection.points
+              if p['curve_number'] == 1 and p['point_index'] < len(fronteira)] if evento else []
+    escolhido = fronteira.iloc[pontos[0]['point_index'] if pontos else fronteira['credito_liberado'].idxmax()]
+    st.caption(f"{len(varredura):,} combinações avaliadas; clique num ponto da fronteira para escolher o lance")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Lance Pago", f"R$ {escolhido['lance_pago']:,.0f}")
+    col2.metric("Lance Embutido", f"R$ {escolhido['lance_embutido']:,.0f}")
+    col3.metric("CET Anual", f"{escolhido['cet_anual']:.2f}%")
+    col4.metric("Quitação", f"{int(escolhido['quitacao'])} meses")
+    return float(escolhido['lance_pago']), float(escolhido['lance_embutido'])
+
+def usar_agio_negociado(agio):
+    st.session_state.agio_negociado = agio
+
+def montar_estrategias(cronograma, num_alternativas, deslocamento, prazo):
+    # {nome: [(mês, valor, ágio), ...]} a partir das linhas completas do editor; as alternativas
+    # repetem a primeira estratégia com os meses adiados de `deslocamento` em `deslocamento`
+    linhas = cronograma.dropna(subset=['Mês', 'Valor (R$)', 'Ágio (%)'])
+    estrategias = {}
+    for linha in linhas.itertuples(index=False):
+        nome = linha[0] if isinstance(linha[0], str) and linha[0] else 'Principal'
+        estrategias.setdefault(nome, []).append((int(linha[1]), float(linha[2]), float(linha[3])))
+    if estrategias and num_alternativas:
+        nome, base = next(iter(estrategias.items()))
+        for i in range(1, num_alternativas + 1):
+            estrategias[f"{nome} +{i * deslocamento}m"] = [(min(mes + i * deslocamento, prazo), valor, agio)
+                                                           for mes, valor, agio in base]
+    return estrategias
+
+def mostrar_simulacao_ccc(dnd, prazo):
+    col1, col2 = st.columns(2)
+    with col1:
+        credito = st.number_input("Crédito por Cota (R$)", min_value=10000, value=250000, step=10000)
+        num_membros = st.number_input("Participantes do Grupo", min_value=10, max_value=100000, value=1000, step=10)
+        taxa_adm = st.number_input("Taxa de Administração (%)", min_value=0.0, value=15.0, step=0.5)
+        correcao_anual = st.number_input("Correção Anual do Crédito (%)", min_value=0.0, value=5.0, step=0.5)
+    with col2:
+        lance = st.slider("Lance Ofertado (% do crédito)", min_value=0, max_value=50, value=20)
+        lance_embutido = st.slider("Parte Embutida do Lance (%)", min_value=0, max_value=100, value=50)
+        liquido = credito * (1 - lance / 100 * lance_embutido / 100)
+        cotas = st.number_input("Cotas do Investidor", min_value=1, max_value=int(num_membros) - 1,
+                                value=min(max(int(-(-dnd // liquido)), 1), int(num_membros) - 1))
+        num_simulacoes = st.select_slider("Simulações de Sorteio", options=[500, 1000, 2000, 5000, 10000], value=2000)
+
+    resumo = simular_ccc(dnd, credito=credito, prazo=prazo, num_membros=int(num_membros), cotas=int(cotas),
+                         lance=lance, lance_embutido=lance_embutido, taxa_adm=taxa_adm,
+                         correcao_anual=correcao_anual, num_simulacoes=num_simulacoes)
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("1ª Contemplação (mediana)", f"mês {resumo['mes_primeira_contemplacao'][50]:.0f}")
+    if resumo['mes_dnd']:
+        col2.metric("DND Atingido (P50 / P90)", f"mês {resumo['mes_dnd'][50]:.0f} / {resumo['mes_dnd'][90]:.0f}")
+    else:
+        col2.metric("DND Atingido (P50 / P90)", "Não atingido")
+    col3.metric("Contemplações por Lance", f"{resumo['fracao_lance']*100:.0f}%")
+    painel_desempenho.exibir_plotly(criar_grafico_acumulo_credito(resumo['bandas'], dnd), "acumulo_credito")
+
+    with st.expander("Contemplação por Nível de Lance"):
+        coortes = resumo['coortes'].rename(columns={'lance': 'Lance (%)', 'membros': 'Participantes',
+                                                    'investidor': 'Investidor',
+                                                    'mes_medio_contemplacao': 'Mês Médio de Contemplação'})
+        st.dataframe(coortes.style.format({'Lance (%)': '{:.0f}', 'Mês Médio de Contemplação': '{:.1f}'}))
+    return resumo
 
 def mostrar_etapa_empreendimento(modelo, dnd, prazo):
     st.subheader("Etapa do Empreendimento")
@@ -56,21 +202,32 @@ def mostrar_etapa_saida(modelo, dnd, prazo):
     # Lógica específica para a etapa de saída
     st.write("Simulação de estratégias de saída e dropdowns")
 
-def criar_grafico_com_dropdown(dnd, prazo, mes_dropdown, impacto_dropdown):
-    # Cria um gráfico com o efeito do dropdown
-    meses = list(range(prazo + 1))
-    saldo_sem_dropdown = [dnd - (dnd/prazo)*m for m in meses]
-    saldo_com_dropdown = [
-        dnd - (dnd/prazo)*m if m < mes_dropdown 
-        else dnd - (dnd/prazo)*m - impacto_dropdown 
-        for m in meses
-    ]
-
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=meses, y=saldo_sem_dropdown, mode='lines', name='Sem Dropdown'))
-    fig.add_trace(go.Scatter(x=meses, y=saldo_com_dropdown, mode='lines', name='Com Dropdown'))
+@medir("criar_grafico_com_dropdown")
+def criar_grafico_com_dropdown(saldo_sem_dropdown, saldos_com_dropdown, nomes):
+    # Cria um gráfico com o efeito dos dropdowns de cada estratégia (uma linha de saldos_com_dropdown por nome)
+    meses = np.arange(len(saldo_sem_dropdown))
+    # Com muitas estratégias sobrepostas as linhas ficam finas para continuarem distinguíveis
+    linha = dict(width=1) if len(nomes) > 5 else {}
+    fig = adicionar_linhas(go.Figure(), [
+        (meses, saldo_sem_dropdown, dict(mode='lines', name='Sem Dropdown')),
+        *[(meses, saldo, dict(mode='lines', name=nome, line=linha)) for nome, saldo in zip(nomes, saldos_com_dropdown)],
+    ])
     fig.update_layout(title='Impacto do Dropdown no Saldo Devedor', xaxis_title='Meses', yaxis_title='Saldo Devedor (R$)')
     return fig
 
+def criar_grafico_acumulo_credito(bandas, dnd):
+    # Faixa P10–P90 do crédito acumulado, mediana e desembolso ao longo do prazo
+    # Sem WebGL: o preenchimento entre traços da faixa é do Scatter SVG
+    fig = adicionar_linhas(go.Figure(), [
+        (bandas['Mês'], bandas['P90'], dict(mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip')),
+        (bandas['Mês'], bandas['P10'], dict(mode='lines', line=dict(width=0), fill='tonexty',
+                                            fillcolor='rgba(31, 119, 180, 0.2)', name='Crédito P10–P90')),
+        (bandas['Mês'], bandas['P50'], dict(mode='lines', name='Crédito Acumulado (mediana)')),
+        (bandas['Mês'], bandas['Desembolso'], dict(mode='lines', name='Desembolso Acumulado', line=dict(dash='dot'))),
+    ], webgl=False)
+    fig.add_hline(y=dnd, line_dash='dash', annotation_text='DND')
+    fig.update_layout(title='Acúmulo de Crédito no Grupo', xaxis_title='Meses', yaxis_title='Valor (R$)')
+    return fig
+
 if __name__ == "__main__":
     main()
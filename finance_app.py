@@ -1,61 +1,62 @@
 import streamlit as st
 import plotly.graph_objects as go
 import numpy as np
+import pandas as pd
+from constructa.cache import memoizar
+from constructa.instrumentacao import etapa, medir
+from constructa.metricas import indicadores_cota
+from constructa.monte_carlo import carregar_indice, simular_monte_carlo
+from constructa.otimizador import otimizar_dropdowns
+from constructa import pagamentos
+from constructa.regras import PLANOS
+import painel_cenarios
+import painel_desempenho
+import painel_mercado
+import painel_resultados
+import painel_tarefas
+from graficos import adicionar_linhas
 
-# Configuração da página
-st.set_page_config(page_title="Simulador Constructa", layout="wide")
-
-def calculate_payments(principal, months, admin_fee, dropdowns, agio):
-    balance = principal
-    amortization = principal / months
-    payments = []
-    balances = [principal]
-    total_dropdown_value = 0
-    total_agio = 0
-    
-    for month in range(1, months + 1):
-        if month % 12 == 0 and month > 1:
-            balance *= 1.05
-            amortization = balance / (months - month + 1)
-        
-        if month in dropdowns:
-            dropdown_value = dropdowns[month]
-            agio_value = dropdown_value * (agio/100)
-            total_dropdown_value += dropdown_value
-            total_agio += agio_value
-            balance -= (dropdown_value + agio_value)
-            amortization = balance / (months - month + 1)
-        
-        admin_fee_value = balance * admin_fee
-        monthly_payment = amortization + admin_fee_value
-        
-        payments.append(monthly_payment)
-        balance -= amortization
-        balances.append(balance)
-        
-        if balance <= 0 or monthly_payment < 500:
-            break
-    
-    return payments, balances, total_dropdown_value, total_agio
+calculate_payments = medir("calculate_payments")(
+    memoizar("finance_app.calculate_payments")(pagamentos.calculate_payments))
 
 def main():
+    # Configuração da página
+    st.set_page_config(page_title="Simulador Constructa", layout="wide")
+    painel_desempenho.iniciar("finance_app")
     st.title("Simulador Constructa")
 
+    # Um cenário salvo carregado substitui os valores iniciais; a versão troca as chaves dos widgets
+    carregados = st.session_state.get('parametros_carregados', {})
+    versao = st.session_state.get('versao_parametros', 0)
+
     # Sidebar
     with st.sidebar:
-        principal = st.number_input("Valor do Crédito (R$)", min_value=10000, value=5000000, step=10000)
-        months = st.number_input("Prazo (meses)", min_value=12, value=240, step=12)
-        admin_fee = st.number_input("Taxa de Administração Mensal (%)", min_value=0.1, value=0.12, step=0.01) / 100
-        agio = st.number_input("Ágio dos Dropdowns (%)", min_value=0.0, value=25.0, step=1.0)
-        tlr = st.number_input("Taxa Livre de Risco (% a.a.)", min_value=0.0, value=11.00, step=0.1) / 100
+        principal = st.number_input("Valor do Crédito (R$)", min_value=10000, value=carregados.get('principal', 5000000), step=10000, key=f"principal_{versao}")
+        months = st.number_input("Prazo (meses)", min_value=12, value=carregados.get('months', 240), step=12, key=f"months_{versao}")
+        admin_fee = st.number_input("Taxa de Administração Mensal (%)", min_value=0.1, value=carregados.get('admin_fee', 0.12), step=0.01, key=f"admin_fee_{versao}") / 100
+        agio = st.number_input("Ágio dos Dropdowns (%)", min_value=0.0, value=carregados.get('agio', 25.0), step=1.0, key=f"agio_{versao}")
+        tlr = st.number_input("Taxa Livre de Risco (% a.a.)", min_value=0.0, value=carregados.get('tlr', 11.00), step=0.1, key=f"tlr_{versao}") / 100
+
+        # Regras do cronograma: a base da taxa e o tratamento do ágio são os desta variante
+        with st.expander("Regras do Cronograma"):
+            correcao = st.number_input("Correção do Crédito (% por período)", value=carregados.get('correcao', 5.0), step=0.5, key=f"correcao_{versao}")
+            meses_correcao = st.number_input("Periodicidade da Correção (meses)", min_value=1, value=carregados.get('meses_correcao', 12), step=1, key=f"meses_correcao_{versao}")
+            parcela_minima = st.number_input("Parcela Mínima para Encerrar (R$)", min_value=0.0, value=carregados.get('parcela_minima', 500.0), step=100.0, key=f"parcela_minima_{versao}")
+        plano = dict(PLANOS['finance_app'], correcao=1 + correcao / 100, meses_correcao=int(meses_correcao),
+                     parcela_minima=parcela_minima)
 
     # Inicialização dos dropdowns
     if 'dropdowns' not in st.session_state:
         st.session_state.dropdowns = {}
+    # Retoma o cronograma com dropdowns a partir do primeiro mês afetado pela edição
+    if 'calculadora' not in st.session_state:
+        st.session_state.calculadora = pagamentos.CalculadoraIncremental(PLANOS['finance_app'])
+    calculadora = st.session_state.calculadora
 
     # Cálculos
-    payments_with_drops, balances_with_drops, total_dropdown_value, total_agio = calculate_payments(principal, months, admin_fee, st.session_state.dropdowns, agio)
-    payments_no_drops, balances_no_drops, _, _ = calculate_payments(principal, months, admin_fee, {}, agio)
+    with etapa("calculadora.calcular"):
+        payments_with_drops, balances_with_drops, total_dropdown_value, total_agio = calculadora.calcular(principal, months, admin_fee, st.session_state.dropdowns, agio, plano)
+    payments_no_drops, balances_no_drops, _, _ = calculate_payments(principal, months, admin_fee, {}, agio, plano)
 
     # Determinar o mês do último dropdown
     last_dropdown_month = max(st.session_state.dropdowns.keys()) if st.session_state.dropdowns else 0
@@ -88,10 +89,14 @@ def main():
         st.write("KPIs")
         p_cl = payments_with_drops[0] / principal * 100
         cet_total = (sum(payments_with_drops) / principal - 1) * 100
-        cet_anual = ((1 + cet_total/100) ** (12/months) - 1) * 100
+        # CET anual pela TIR dos fluxos datados (crédito, parcelas, dropdowns e ágio)
+        with etapa("indicadores_cota"):
+            indicadores = indicadores_cota(principal, payments_with_drops, st.session_state.dropdowns, agio, tlr,
+                                           agio_como_receita=plano['agio_como_receita'])
         st.metric("P/CL", f"{p_cl:.2f}%")
         st.metric("CET Total", f"{cet_total:.2f}%")
-        st.metric("CET Anual", f"{cet_anual:.2f}%")
+        st.metric("CET Anual", f"{indicadores['cet_anual']*100:.2f}%")
+        st.metric("VPL à Taxa Livre de Risco", f"R$ {indicadores['vpl']:,.0f}")
 
     if last_dropdown_month > 0:
         economia = sum(payments_no_drops[:last_dropdown_month]) - sum(payments_with_drops[:last_dropdown_month])
@@ -114,7 +119,7 @@ def main():
     with col3:
         if st.button("Adicionar Dropdown"):
             st.session_state.dropdowns[dropdown_month] = dropdown_amount
-            st.experimental_rerun()
+            st.rerun()
 
     # Exibir Dropdowns adicionados
     if st.session_state.dropdowns:
@@ -124,22 +129,120 @@ def main():
             col1.write(f"Mês {month}: R$ {amount:,.2f}")
             if col2.button("Remover", key=f"remove_{month}"):
                 del st.session_state.dropdowns[month]
-                st.experimental_rerun()
+                st.rerun()
+
+    # Otimização do cronograma de dropdowns
+    with st.expander("Otimizar Dropdowns"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            orcamento = st.number_input("Orçamento Total (R$)", min_value=0.0, value=float(principal) * 0.2, step=10000.0)
+            ticket_minimo = st.number_input("Ticket Mínimo (R$)", min_value=0.0, value=0.0, step=1000.0)
+        with col2:
+            max_dropdowns = st.slider("Máximo de Dropdowns", min_value=1, max_value=4, value=2)
+            janela = st.slider("Janela de Meses", min_value=1, max_value=months, value=(1, months))
+        with col3:
+            passo_mes = st.number_input("Intervalo entre Meses Candidatos", min_value=1, max_value=months, value=12)
+            objetivo = st.radio("Objetivo", ["Maximizar Ganho na Arbitragem", "Minimizar CET"])
+
+        # A busca roda em segundo plano; o mesmo pedido reaproveita a tarefa em andamento ou concluída
+        argumentos = (principal, months, admin_fee, agio, orcamento)
+        opcoes = dict(objetivo='ganho_arbitragem' if objetivo.startswith("Maximizar") else 'cet_total',
+                      max_dropdowns=max_dropdowns, passo_mes=passo_mes, janela=janela, ticket_minimo=ticket_minimo,
+                      plano=plano)
+        if st.button("Otimizar"):
+            tarefa = painel_tarefas.submeter(None, "otimizar_dropdowns", otimizar_dropdowns, *argumentos, **opcoes)
+        else:
+            tarefa = painel_tarefas.obter("otimizar_dropdowns", *argumentos, **opcoes)
+
+        def mostrar_otimizacao(resultado, final):
+            if not final:
+                st.write(f"{resultado['avaliados']:,} de {resultado['total']:,} cronogramas avaliados")
+                return
+            st.write(f"{resultado['avaliados']:,} cronogramas avaliados "
+                     f"({resultado['cronogramas_por_segundo']:,.0f} por segundo)")
+            for month, amount in sorted(resultado['cronograma'].items()):
+                st.write(f"Mês {month}: R$ {amount:,.2f}")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Ganho na Arbitragem", f"R$ {resultado['indicadores']['ganho_arbitragem']/1e6:.2f}M")
+            col2.metric("CET Total", f"{resultado['indicadores']['cet_total']:.2f}%")
+            col3.metric("Quitação", f"{resultado['indicadores']['quitacao']} meses")
+            if st.button("Aplicar Cronograma"):
+                st.session_state.dropdowns = dict(resultado['cronograma'])
+                st.rerun()
+
+            fronteira = resultado['fronteira']
+            fig_fronteira = go.Figure()
+            fig_fronteira.add_trace(go.Scatter(x=fronteira['cet_total'], y=fronteira['ganho_arbitragem'], mode='lines+markers',
+                                               text=[str(c) for c in fronteira['cronograma']], name='Fronteira de Pareto'))
+            fig_fronteira.update_layout(xaxis_title='CET Total (%)', yaxis_title='Ganho na Arbitragem (R$)')
+            painel_desempenho.exibir_plotly(fig_fronteira, "fronteira", use_container_width=True)
+
+        painel_tarefas.acompanhar(tarefa, mostrar_otimizacao, "Otimização")
+
+    # Risco de correção e de ágio
+    with st.expander("Análise de Risco (Monte Carlo)"):
+        arquivo_indice = st.file_uploader("Série histórica do índice de correção (CSV, % por período)", type="csv")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            periodicidade = st.radio("Periodicidade do Índice", ["anual", "mensal"])
+            num_caminhos = st.number_input("Número de Caminhos", min_value=1000, value=100000, step=10000)
+        with col2:
+            agio_minimo = st.number_input("Ágio Mínimo (%)", min_value=0.0, value=max(agio - 15.0, 0.0), step=1.0)
+            agio_maximo = st.number_input("Ágio Máximo (%)", min_value=0.0, value=agio + 10.0, step=1.0)
+        with col3:
+            semente = st.number_input("Semente", min_value=0, value=0, step=1)
+
+        def mostrar_risco(risco, final):
+            tabela = pd.DataFrame({
+                'Quitação (meses)': risco['quitacao']['percentis'],
+                'CET Total (%)': risco['cet_total']['percentis'],
+                'Ganho na Arbitragem (R$)': risco['ganho_arbitragem']['percentis'],
+            })
+            tabela.index = [f"P{p}" for p in tabela.index]
+            st.write(f"{risco['num_caminhos']:,} caminhos simulados")
+            st.dataframe(tabela.style.format("{:,.2f}"))
+
+            contagem, bordas = risco['cet_total']['histograma']
+            fig_risco = go.Figure(go.Bar(x=(bordas[:-1] + bordas[1:]) / 2, y=contagem, name='CET Total'))
+            fig_risco.update_layout(xaxis_title='CET Total (%)', yaxis_title='Caminhos', bargap=0)
+            painel_desempenho.exibir_plotly(fig_risco, "risco", use_container_width=True)
+
+        if arquivo_indice is None:
+            st.info("Carregue um arquivo com a série do índice (INCC, IPCA...) para simular a correção anual.")
+        else:
+            try:
+                fatores = carregar_indice(arquivo_indice, periodicidade=periodicidade)
+            except ValueError as erro:
+                st.error(str(erro))
+            else:
+                distribuicao = {'tipo': 'triangular', 'minimo': min(agio_minimo, agio),
+                                'moda': agio, 'maximo': max(agio_maximo, agio)}
+                # Cópia dos dropdowns: a simulação roda em outra thread enquanto a página muda
+                argumentos = (principal, months, admin_fee, dict(st.session_state.dropdowns), fatores, distribuicao)
+                opcoes = dict(num_caminhos=int(num_caminhos), semente=int(semente), plano=plano)
+                if st.button("Simular"):
+                    tarefa = painel_tarefas.submeter(None, "simular_monte_carlo", simular_monte_carlo,
+                                                     *argumentos, **opcoes)
+                else:
+                    tarefa = painel_tarefas.obter("simular_monte_carlo", *argumentos, **opcoes)
+                painel_tarefas.acompanhar(tarefa, mostrar_risco, "Monte Carlo")
 
     # Gráficos
     st.subheader("Evolução do Saldo Devedor")
-    fig_saldo = go.Figure()
-    fig_saldo.add_trace(go.Scatter(x=list(range(len(balances_no_drops))), y=balances_no_drops, mode='lines', name='Sem Dropdowns'))
-    fig_saldo.add_trace(go.Scatter(x=list(range(len(balances_with_drops))), y=balances_with_drops, mode='lines', name='Com Dropdowns'))
-    st.plotly_chart(fig_saldo, use_container_width=True)
+    fig_saldo = adicionar_linhas(go.Figure(), [
+        (np.arange(len(balances_no_drops)), balances_no_drops, dict(mode='lines', name='Sem Dropdowns')),
+        (np.arange(len(balances_with_drops)), balances_with_drops, dict(mode='lines', name='Com Dropdowns')),
+    ])
+    painel_desempenho.exibir_plotly(fig_saldo, "saldo", use_container_width=True)
 
     # Gráfico opcional de evolução das parcelas
     if st.checkbox("Mostrar Evolução das Parcelas"):
         st.subheader("Evolução das Parcelas")
-        fig_parcelas = go.Figure()
-        fig_parcelas.add_trace(go.Scatter(x=list(range(len(payments_no_drops))), y=payments_no_drops, mode='lines', name='Sem Dropdowns'))
-        fig_parcelas.add_trace(go.Scatter(x=list(range(len(payments_with_drops))), y=payments_with_drops, mode='lines', name='Com Dropdowns'))
-        st.plotly_chart(fig_parcelas, use_container_width=True)
+        fig_parcelas = adicionar_linhas(go.Figure(), [
+            (np.arange(len(payments_no_drops)), payments_no_drops, dict(mode='lines', name='Sem Dropdowns')),
+            (np.arange(len(payments_with_drops)), payments_with_drops, dict(mode='lines', name='Com Dropdowns')),
+        ])
+        painel_desempenho.exibir_plotly(fig_parcelas, "parcelas", use_container_width=True)
 
     # Análise de Arbitragem
     st.subheader("Análise de Arbitragem")
@@ -154,5 +257,32 @@ def main():
     col3.metric("Ganho na Arbitragem", f"R$ {ganho_arbitragem/1e6:.2f}M")
     col4.metric("Desconto Efetivo", f"{desconto_efetivo_percentual:.2f}%")
 
+    # Ágio negociado no mercado secundário de cotas contempladas
+    with st.expander("Mercado Secundário"):
+        painel_mercado.mostrar_mercado(
+            'finance_app', agio, lambda agio_negociado: painel_cenarios.aplicar_campos_cota(agio=agio_negociado),
+            (principal, months, admin_fee, dict(st.session_state.dropdowns), plano))
+
+    # Cronogramas de lotes grandes gravados pela linha de comando em formato colunar
+    with st.expander("Resultados em Lote"):
+        painel_resultados.mostrar_resultados_lote('finance_app')
+
+    # Cenários gravados com os cronogramas já calculados, para reabrir e comparar sem recalcular
+    with st.expander("Cenários Salvos"):
+        painel_cenarios.mostrar_cenarios_salvos('finance_app', dict(
+            principal=principal, prazo=months,
+            parametros={'principal': principal, 'months': months, 'admin_fee': admin_fee, 'agio': agio, 'tlr': tlr,
+                        'correcao': plano['correcao'], 'meses_correcao': plano['meses_correcao'],
+                        'parcela_minima': plano['parcela_minima'], 'dropdowns': st.session_state.dropdowns},
+            series={'Parcelas com Dropdowns': payments_with_drops, 'Saldo com Dropdowns': balances_with_drops,
+                    'Parcelas sem Dropdowns': payments_no_drops, 'Saldo sem Dropdowns': balances_no_drops},
+            indicadores={'Quitação (meses)': len(payments_with_drops), 'P/CL (%)': p_cl, 'CET Total (%)': cet_total,
+                         'CET Anual (%)': indicadores['cet_anual'] * 100, 'VPL (R$)': indicadores['vpl'],
+                         'Ganho na Arbitragem (R$)': ganho_arbitragem,
+                         'Desconto Efetivo (%)': desconto_efetivo_percentual},
+        ), painel_cenarios.aplicar_parametros_cota, ('principal', 'prazo'))
+
+    painel_desempenho.finalizar()
+
 if __name__ == "__main__":
     main()
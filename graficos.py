@@ -0,0 +1,34 @@
+import numpy as np
+import plotly.graph_objects as go
+
+from constructa.reducao import indices_lttb
+
+# Acima deste número de pontos cada série é reduzida por LTTB antes de ir ao navegador
+PONTOS_POR_SERIE = 1000
+# A partir deste total de pontos na figura os traços passam a usar WebGL (Scattergl)
+PONTOS_WEBGL = 5000
+
+
+def serie_compacta(x, y, limite=PONTOS_POR_SERIE):
+    # Arrays numpy viram arrays tipados em base64 no JSON do Plotly; float64 para os valores em R$
+    # manterem os centavos nos hovers e nos dados baixados da figura
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    validos = np.isfinite(y)
+    if not validos.all():
+        x, y = x[validos], y[validos]
+    # Eixo de datas (fluxo diário): o LTTB mede a distância em x pela contagem de tempo
+    posicoes = x.astype(np.int64) if np.issubdtype(x.dtype, np.datetime64) else x
+    indices = indices_lttb(posicoes, y, limite)
+    return x[indices], y[indices]
+
+
+def adicionar_linhas(figura, series, limite=PONTOS_POR_SERIE, webgl=None):
+    # series: [(x, y, argumentos do traço), ...]; webgl=None decide pelo total de pontos
+    compactas = [(serie_compacta(x, y, limite), opcoes) for x, y, opcoes in series]
+    if webgl is None:
+        webgl = sum(len(x) for (x, _), _ in compactas) > PONTOS_WEBGL
+    traco = go.Scattergl if webgl else go.Scatter
+    # add_traces valida a figura uma vez só, em vez de uma vez por traço
+    figura.add_traces([traco(x=x, y=y, **opcoes) for (x, y), opcoes in compactas])
+    return figura
@@ -0,0 +1,147 @@
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+
+from constructa.armazenamento import RepositorioCenarios, comparar_cenarios
+from constructa.cache import congelar
+from constructa.instrumentacao import etapa
+import painel_desempenho
+from graficos import adicionar_linhas
+
+# Campos da sidebar de finance_app e analise_dados, com as chaves versionadas dos widgets
+CAMPOS_COTA = ('principal', 'months', 'admin_fee', 'agio', 'tlr', 'correcao', 'meses_correcao', 'parcela_minima')
+ROTULOS_FAIXAS = {'principal': 'Crédito (R$)', 'prazo': 'Prazo (meses)', 'vgv': 'VGV (milhões R$)'}
+
+
+@st.cache_resource
+def repositorio():
+    # Um repositório por processo, no arquivo de CONSTRUCTA_CENARIOS_DB (cenarios.db por padrão)
+    return RepositorioCenarios()
+
+
+def _filtros(tipo, faixas):
+    # Campos vazios deixam a faixa aberta; a busca usa os índices da tabela
+    filtros = {}
+    for coluna, destino in zip(faixas, st.columns(len(faixas))):
+        rotulo = ROTULOS_FAIXAS[coluna]
+        minimo = destino.number_input(f"{rotulo} - mínimo", value=None, key=f"filtro_min_{tipo}_{coluna}")
+        maximo = destino.number_input(f"{rotulo} - máximo", value=None, key=f"filtro_max_{tipo}_{coluna}")
+        filtros[coluna] = (minimo, maximo)
+    return filtros
+
+
+def _salvar(tipo, atual):
+    nome = st.session_state[f"nome_cenario_{tipo}"].strip()
+    if not nome:
+        st.session_state[f"aviso_cenario_{tipo}"] = "Informe um nome para o cenário"
+        return
+    with etapa("salvar_cenario"):
+        repositorio().salvar(nome, tipo, **atual)
+    st.session_state[f"aviso_cenario_{tipo}"] = f"Cenário '{nome}' salvo"
+
+
+def _carregar(tipo, identificador, aplicar):
+    # Roda como callback, antes do script: os widgets já nascem com os valores do cenário
+    aplicar(repositorio().carregar(identificador))
+    st.session_state[f"cenario_carregado_{tipo}"] = {'id': identificador}
+
+
+def _conferir_carregado(tipo, atual):
+    # O cenário carregado é recalculado pelos motores atuais: se as regras mudaram depois que ele foi
+    # salvo, os indicadores da tela diferem dos gravados. Os parâmetros da primeira execução depois de
+    # carregar ficam guardados congelados (os dropdowns são o próprio dicionário do session_state, que
+    # muda no lugar), e o aviso some quando o usuário muda algum deles
+    carregado = st.session_state.get(f"cenario_carregado_{tipo}")
+    if carregado is None:
+        return
+    parametros = congelar(atual['parametros'])
+    carregado.setdefault('parametros', parametros)
+    try:
+        salvo = repositorio().carregar(carregado['id'])
+    except KeyError:
+        salvo = None
+    if salvo is None or carregado['parametros'] != parametros:
+        del st.session_state[f"cenario_carregado_{tipo}"]
+        return
+    indicadores = comparar_cenarios(salvo, {'parametros': {}, 'indicadores': atual['indicadores'],
+                                            'series': {}})['indicadores']
+    divergentes = indicadores[~np.isclose(indicadores['A'], indicadores['B'], rtol=1e-9, equal_nan=True)]
+    if len(divergentes):
+        st.warning(f"Os indicadores recalculados diferem dos gravados em '{salvo['nome']}' "
+                   f"({salvo['criado_em']}): as regras de cálculo mudaram desde que ele foi salvo")
+        st.dataframe(divergentes.rename(columns={'A': 'Gravado', 'B': 'Recalculado'}).style.format("{:,.2f}"),
+                     use_container_width=True)
+
+
+def aplicar_parametros_cota(cenario):
+    # finance_app e analise_dados: taxas gravadas em fração voltam aos widgets em %, e a nova
+    # versão das chaves faz a sidebar nascer com os valores do cenário
+    parametros = cenario['parametros']
+    st.session_state.parametros_carregados = {
+        'principal': parametros['principal'], 'months': parametros['months'],
+        'admin_fee': round(parametros['admin_fee'] * 100, 10), 'agio': parametros['agio'],
+        'tlr': round(parametros['tlr'] * 100, 10),
+    }
+    # Regras do cronograma, ausentes nos cenários gravados antes delas
+    if 'correcao' in parametros:
+        st.session_state.parametros_carregados.update({
+            'correcao': round((parametros['correcao'] - 1) * 100, 10),
+            'meses_correcao': int(parametros['meses_correcao']), 'parcela_minima': parametros['parcela_minima'],
+        })
+    st.session_state.versao_parametros = st.session_state.get('versao_parametros', 0) + 1
+    st.session_state.dropdowns = {int(mes): valor for mes, valor in parametros['dropdowns'].items()}
+
+
+def aplicar_campos_cota(**valores):
+    # Troca alguns campos da sidebar (nas unidades dos widgets) e mantém os demais como estão na tela
+    versao = st.session_state.get('versao_parametros', 0)
+    atuais = {campo: st.session_state[f"{campo}_{versao}"] for campo in CAMPOS_COTA
+              if f"{campo}_{versao}" in st.session_state}
+    st.session_state.parametros_carregados = {**atuais, **valores}
+    st.session_state.versao_parametros = versao + 1
+
+
+def mostrar_cenarios_salvos(tipo, atual, aplicar, faixas):
+    # atual: argumentos de RepositorioCenarios.salvar (exceto nome e tipo) do cenário na tela;
+    # aplicar(cenario): devolve ao session_state os parâmetros de um cenário salvo
+    col1, col2 = st.columns([3, 1])
+    col1.text_input("Nome do Cenário", key=f"nome_cenario_{tipo}")
+    col2.button("Salvar Cenário", key=f"salvar_cenario_{tipo}", on_click=_salvar, args=(tipo, atual))
+    if f"aviso_cenario_{tipo}" in st.session_state:
+        st.caption(st.session_state.pop(f"aviso_cenario_{tipo}"))
+    _conferir_carregado(tipo, atual)
+
+    filtros = _filtros(tipo, faixas)
+    with etapa("listar_cenarios"):
+        tabela = repositorio().listar(tipo, **filtros)
+    if tabela.empty:
+        st.info("Nenhum cenário salvo com esses filtros")
+        return
+    st.dataframe(tabela.drop(columns=['tipo']), hide_index=True, use_container_width=True)
+
+    # Nomes são únicos por tipo, então o rótulo identifica o cenário
+    ids = dict(zip((tabela['nome'] + " (" + tabela['criado_em'] + ")").tolist(), tabela['id'].tolist()))
+    col1, col2 = st.columns(2)
+    rotulo_a = col1.selectbox("Cenário A", list(ids), key=f"cenario_a_{tipo}")
+    rotulo_b = col2.selectbox("Cenário B", list(ids), index=min(1, len(ids) - 1), key=f"cenario_b_{tipo}")
+    id_a, id_b = ids[rotulo_a], ids[rotulo_b]
+    col1, col2 = st.columns(2)
+    col1.button("Carregar Cenário A", key=f"carregar_cenario_{tipo}", on_click=_carregar, args=(tipo, id_a, aplicar))
+    col2.button("Excluir Cenário A", key=f"excluir_cenario_{tipo}", on_click=repositorio().excluir, args=(id_a,))
+
+    # A comparação usa só o que foi gravado: nenhum motor de cálculo roda aqui
+    with etapa("comparar_cenarios"):
+        diferencas = comparar_cenarios(repositorio().carregar(id_a), repositorio().carregar(id_b))
+    col1, col2 = st.columns(2)
+    col1.dataframe(diferencas['indicadores'].style.format("{:,.2f}"), use_container_width=True)
+    col2.dataframe(diferencas['parametros'].astype({'A': str, 'B': str}), use_container_width=True)
+
+    serie = st.selectbox("Série", list(diferencas['series']), key=f"serie_cenario_{tipo}")
+    valores = diferencas['series'][serie]
+    fig = adicionar_linhas(go.Figure(), [
+        (valores.index.to_numpy(), valores['A'], dict(mode='lines', name=f"A: {rotulo_a}")),
+        (valores.index.to_numpy(), valores['B'], dict(mode='lines', name=f"B: {rotulo_b}")),
+        (valores.index.to_numpy(), valores['Diferença'], dict(mode='lines', name='B - A', line=dict(dash='dot'))),
+    ])
+    fig.update_layout(xaxis_title='Mês', yaxis_title=serie)
+    painel_desempenho.exibir_plotly(fig, "comparacao_cenarios", use_container_width=True)
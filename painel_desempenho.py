@@ -0,0 +1,56 @@
+import json
+import os
+
+import pandas as pd
+import streamlit as st
+
+from constructa import instrumentacao
+
+
+def iniciar(pagina):
+    # Liga por variável de ambiente (CONSTRUCTA_INSTRUMENTAR=1) ou por ?debug=1 na URL
+    ativo = instrumentacao.ativo_por_ambiente() or st.query_params.get("debug") == "1"
+    return instrumentacao.iniciar(pagina, ativo)
+
+
+def exibir_plotly(figura, nome, destino=st, **kwargs):
+    if instrumentacao.medidor_atual() is not None:
+        instrumentacao.registrar_carga(nome, len(figura.to_json()))
+    # O Streamlit serializa a figura dentro de plotly_chart, então o tempo de envio inclui a serialização;
+    # com on_select, devolve a seleção do usuário
+    with instrumentacao.etapa(f"envio: {nome}"):
+        return destino.plotly_chart(figura, **kwargs)
+
+
+def exibir_altair(grafico, nome, destino=st, **kwargs):
+    if instrumentacao.medidor_atual() is not None:
+        instrumentacao.registrar_carga(nome, len(json.dumps(grafico.to_dict(), default=str)))
+    with instrumentacao.etapa(f"envio: {nome}"):
+        destino.altair_chart(grafico, **kwargs)
+
+
+def finalizar():
+    # Chamado no fim do rerun: mostra o painel na sidebar e grava o resumo no log, se configurado
+    medidor = instrumentacao.medidor_atual()
+    if medidor is None:
+        return
+    resumo = medidor.resumo()
+    caminho = os.environ.get(instrumentacao.VARIAVEL_LOG)
+    if caminho:
+        instrumentacao.gravar_jsonl(resumo, caminho)
+
+    with st.sidebar.expander("Desempenho (depuração)", expanded=True):
+        st.metric("Tempo do Rerun", f"{resumo['duracao_total_s'] * 1000:,.0f} ms")
+        if resumo['etapas']:
+            etapas = pd.DataFrame(resumo['etapas']).sort_values('total_s', ascending=False)
+            etapas['total (ms)'] = etapas.pop('total_s') * 1000
+            st.dataframe(etapas.style.format({'total (ms)': '{:,.1f}'}), hide_index=True)
+        if resumo['cargas']:
+            cargas = pd.DataFrame(resumo['cargas'])
+            cargas['KB'] = cargas.pop('bytes') / 1024
+            st.dataframe(cargas.style.format({'KB': '{:,.1f}'}), hide_index=True)
+        cache = resumo['cache']
+        st.write(f"Cache: {cache['hits']} acertos, {cache['misses']} faltas, {cache['evictions']} despejos; "
+                 f"{cache['itens']} itens ({cache['bytes'] / 1024 ** 2:,.1f} MB)")
+        if caminho:
+            st.caption(f"Registrado em {caminho}")
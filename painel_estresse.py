@@ -0,0 +1,75 @@
+import os
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from constructa.estresse import CHOQUES, INDICADORES, PACOTE_PADRAO, executar_pacote, grade_choques, montar_pacote, piores_casos
+import painel_desempenho
+import painel_tarefas
+
+# Cenários mostrados no gráfico de exposição quando o pacote é grande
+MAX_BARRAS = 30
+
+
+def _niveis(texto):
+    return [float(valor) for valor in texto.split(',') if valor.strip()]
+
+
+def mostrar_estresse(tipo, base):
+    # Pacote declarativo editável (um cenário por linha, choques em branco = 0) e grade opcional com
+    # todas as combinações dos níveis informados; base = {'projeto', 'cota', 'saida'} de constructa.estresse
+    rotulos = {'cenario': 'Cenário', **CHOQUES}
+    editado = st.data_editor(montar_pacote(PACOTE_PADRAO).rename(columns=rotulos), num_rows="dynamic",
+                             use_container_width=True, key=f"pacote_estresse_{tipo}")
+    with st.expander("Grade de Choques"):
+        st.caption("Níveis separados por vírgula; o pacote ganha todas as combinações dos choques preenchidos")
+        colunas = st.columns(len(CHOQUES))
+        textos = {nome: coluna.text_input(rotulo, "", key=f"grade_{nome}_{tipo}")
+                  for (nome, rotulo), coluna in zip(CHOQUES.items(), colunas)}
+    try:
+        pacote = montar_pacote(editado.rename(columns={rotulo: nome for nome, rotulo in rotulos.items()}))
+        niveis = {nome: _niveis(texto) for nome, texto in textos.items() if texto.strip()}
+        if niveis:
+            pacote = pd.concat([pacote, grade_choques(**niveis)], ignore_index=True)
+    except ValueError as erro:
+        st.error(f"Pacote inválido: {erro}")
+        return
+
+    col1, col2 = st.columns(2)
+    col1.write(f"{len(pacote):,} cenários no pacote")
+    processos = col2.number_input("Processos", min_value=1, value=os.cpu_count() or 1, step=1, key=f"processos_estresse_{tipo}")
+    argumentos = (base, pacote.to_dict('records'))
+    opcoes = dict(processos=int(processos))
+    if st.button("Rodar Pacote", key=f"rodar_estresse_{tipo}"):
+        tarefa = painel_tarefas.submeter(f"tarefa_estresse_{tipo}", "executar_pacote", executar_pacote, *argumentos, **opcoes)
+    else:
+        tarefa = painel_tarefas.obter("executar_pacote", *argumentos, **opcoes)
+
+    def mostrar(resultado, final):
+        if not final:
+            st.write(f"{len(resultado):,} de {len(pacote):,} cenários avaliados")
+            return
+        adiados = (resultado[['dropdowns_fora_cota', 'dropdowns_fora_saida']] > 0).any(axis=1).sum()
+        if adiados:
+            st.warning(f"{adiados:,} cenários empurram dropdowns para depois do prazo: eles não são feitos "
+                       "e ficam fora dos indicadores (veja as colunas de dropdowns após o prazo)")
+        st.subheader("Pior Caso por Indicador")
+        piores = piores_casos(resultado).rename(columns={
+            'indicador': 'Indicador', 'base': 'Base', 'pior': 'Pior Caso', 'cenario': 'Cenário', 'variacao': 'Variação'})
+        st.dataframe(piores.style.format({'Base': '{:,.2f}', 'Pior Caso': '{:,.2f}', 'Variação': '{:+,.2f}'},
+                                         na_rep='nunca'), hide_index=True)
+
+        maiores = resultado.nlargest(MAX_BARRAS, 'exposicao_conjunta')
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=maiores['cenario'], y=maiores['exposicao_conjunta'], name='Exposição Conjunta'))
+        fig.add_trace(go.Bar(x=maiores['cenario'], y=maiores['exposicao_projeto'], name='Exposição do Projeto'))
+        fig.update_layout(yaxis_title='Exposição (milhões R$)', barmode='group')
+        painel_desempenho.exibir_plotly(fig, "estresse", use_container_width=True)
+
+        tabela = resultado.rename(columns={**rotulos, **{nome: rotulo for nome, (rotulo, _) in INDICADORES.items()}})
+        st.dataframe(tabela, hide_index=True)
+        st.download_button("Baixar Resultado (CSV)", resultado.to_csv(index=False).encode('utf-8'),
+                           file_name="estresse.csv", mime="text/csv", key=f"baixar_estresse_{tipo}")
+
+    painel_tarefas.acompanhar(tarefa, mostrar, "Teste de Estresse")
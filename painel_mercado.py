@@ -0,0 +1,87 @@
+import io
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from constructa.livro_ofertas import COMPRA, VENDA, cenarios_agio, gerar_ordens, ler_ordens, simular_mercado
+import painel_desempenho
+import painel_tarefas
+
+
+def casar_ordens(conteudo=None, progresso=None, **gerador):
+    # Roda no pool de tarefas: o CSV chega como bytes (a chave da tarefa precisa ser imutável)
+    # e o fluxo sintético é gerado dentro da tarefa
+    ordens = ler_ordens(io.BytesIO(conteudo)) if conteudo is not None else gerar_ordens(**gerador)
+    return simular_mercado(ordens, progresso=progresso)
+
+
+def mostrar_mercado(tipo, agio, aplicar, cenario=None):
+    # Livro de ofertas do mercado secundário de cotas contempladas; aplicar(agio) leva o ágio médio
+    # negociado para a página e cenario = (principal, months, admin_fee, dropdowns, plano) mostra a
+    # cota sob o ágio médio e os percentis negociados
+    origem = st.radio("Origem das Ordens", ["Fluxo sintético", "Arquivo CSV"], horizontal=True, key=f"origem_ordens_{tipo}")
+    if origem == "Arquivo CSV":
+        arquivo = st.file_uploader("Ordens (CSV com tipo, agio, credito e id opcional)", type="csv", key=f"ordens_{tipo}")
+        if arquivo is None:
+            st.info("Carregue um arquivo de ordens ou use o fluxo sintético.")
+            return
+        argumentos = dict(conteudo=arquivo.getvalue())
+    else:
+        col1, col2, col3, col4 = st.columns(4)
+        num_ordens = col1.number_input("Número de Ordens", min_value=1000, value=100000, step=10000, key=f"num_ordens_{tipo}")
+        agio_medio = col2.number_input("Ágio Médio (%)", min_value=0.0, value=float(agio), step=1.0, key=f"agio_medio_{tipo}")
+        dispersao = col3.number_input("Dispersão do Ágio (p.p.)", min_value=0.0, value=5.0, step=0.5, key=f"dispersao_{tipo}")
+        semente = col4.number_input("Semente", min_value=0, value=0, step=1, key=f"semente_ordens_{tipo}")
+        argumentos = dict(num_ordens=int(num_ordens), agio_medio=agio_medio, dispersao=dispersao, semente=int(semente))
+
+    if st.button("Casar Ordens", key=f"casar_ordens_{tipo}"):
+        tarefa = painel_tarefas.submeter(f"tarefa_mercado_{tipo}", "casar_ordens", casar_ordens, **argumentos)
+    else:
+        tarefa = painel_tarefas.obter("casar_ordens", **argumentos)
+
+    def mostrar(resultado, final):
+        if not final:
+            st.write(f"{resultado['processadas']:,} de {resultado['total']:,} ordens processadas")
+            return
+        resumo = resultado['resumo']
+        st.write(f"{resultado['ordens']:,} ordens casadas ({resultado['ordens_por_segundo']:,.0f} por segundo), "
+                 f"{resultado['em_aberto']:,} ofertas em aberto")
+        if resultado['rejeitadas']:
+            st.warning(f"{resultado['rejeitadas']:,} ordens rejeitadas: o id já era de uma oferta em aberto no livro")
+        if not resumo['negocios']:
+            st.info("Nenhum negócio fechado: as ofertas de compra e venda não se cruzaram.")
+            return
+        percentis = resumo['percentis']
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Negócios", f"{resumo['negocios']:,}")
+        col2.metric("Crédito Negociado", f"R$ {resumo['credito']/1e6:,.1f}M")
+        col3.metric("Ágio Médio", f"{resumo['agio_medio']:.2f}%")
+        col4.metric(f"Ágio P{min(percentis)}-P{max(percentis)}", f"{min(percentis.values()):.1f}% - {max(percentis.values()):.1f}%")
+        st.button("Usar Ágio Negociado", key=f"usar_agio_{tipo}", on_click=aplicar, args=(round(resumo['agio_medio'], 2),))
+
+        if cenario is not None:
+            tabela = cenarios_agio(resumo, *cenario)
+            st.dataframe(pd.DataFrame({
+                'Cenário': tabela['cenario'], 'Ágio (%)': tabela['agio'], 'Quitação (meses)': tabela['quitacao'],
+                'CET Total (%)': tabela['cet_total'], 'Ganho na Arbitragem (R$)': tabela['ganho_arbitragem'],
+            }).style.format({'Ágio (%)': '{:.2f}', 'CET Total (%)': '{:.2f}', 'Ganho na Arbitragem (R$)': '{:,.2f}'}),
+                hide_index=True)
+
+        col1, col2 = st.columns(2)
+        contagem, bordas = resultado['histograma']
+        fig_negocios = go.Figure(go.Bar(x=(bordas[:-1] + bordas[1:]) / 2, y=contagem, name='Crédito Negociado'))
+        fig_negocios.update_layout(xaxis_title='Ágio (%)', yaxis_title='Crédito Negociado (R$)', bargap=0)
+        with col1:
+            painel_desempenho.exibir_plotly(fig_negocios, "negocios_agio", use_container_width=True)
+
+        profundidade = resultado['profundidade']
+        fig_livro = go.Figure()
+        for lado, nome in ((COMPRA, 'Compra'), (VENDA, 'Venda')):
+            niveis = profundidade[profundidade['lado'] == lado]
+            fig_livro.add_trace(go.Bar(x=niveis['agio'], y=niveis['credito'], name=nome))
+        fig_livro.update_layout(xaxis_title='Ágio (%)', yaxis_title='Crédito em Aberto (R$)')
+        with col2:
+            painel_desempenho.exibir_plotly(fig_livro, "livro_ofertas", use_container_width=True)
+
+    painel_tarefas.acompanhar(tarefa, mostrar, "Livro de Ofertas")
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+
+from constructa.cache import memoizar
+from constructa.instrumentacao import etapa, medir
+from constructa.resultados import ARQUIVO_METADADOS, ResultadosColunares
+import painel_desempenho
+from graficos import adicionar_linhas
+
+# Variável de ambiente com o diretório .colunar aberto por padrão
+VARIAVEL_CAMINHO = "CONSTRUCTA_RESULTADOS"
+
+
+@st.cache_resource
+def abrir(caminho, modificado):
+    # Só os memmaps e o metadado: abrir é instantâneo mesmo com vários GB; `modificado` reabre o
+    # lote quando ele é regravado
+    return ResultadosColunares(caminho)
+
+
+@medir("faixas_resultados")
+@memoizar("painel_resultados.faixas")
+def faixas(caminho, modificado, serie, cenarios):
+    return abrir(caminho, modificado).faixas(serie, cenarios=cenarios)
+
+
+def _filtro(resultados, tipo):
+    # Faixa opcional em um parâmetro numérico; campos vazios deixam a faixa aberta
+    numericos = [nome for nome in resultados.metadados['parametros']
+                 if np.issubdtype(resultados.parametro(nome).dtype, np.number)]
+    col1, col2, col3 = st.columns(3)
+    nome = col1.selectbox("Filtrar por", ["(todos)", *numericos], key=f"filtro_resultados_{tipo}")
+    if nome == "(todos)":
+        return None
+    minimo = col2.number_input("Mínimo", value=None, key=f"filtro_min_resultados_{tipo}")
+    maximo = col3.number_input("Máximo", value=None, key=f"filtro_max_resultados_{tipo}")
+    return resultados.selecionar(**{nome: (minimo, maximo)})
+
+
+def mostrar_resultados_lote(tipo):
+    # Lê um lote gravado com `python -m constructa cronogramas|fluxos entrada saida.colunar`
+    # sem carregá-lo: faixas de percentis por mês, um cenário e um mês de todos os cenários
+    caminho = st.text_input("Diretório dos Resultados (.colunar)", value=os.environ.get(VARIAVEL_CAMINHO, ""),
+                            key=f"caminho_resultados_{tipo}")
+    st.caption("Gerado por: python -m constructa cronogramas|fluxos entrada.csv saida.colunar")
+    if not caminho:
+        st.info("Informe o diretório de um lote gravado em formato colunar.")
+        return
+    try:
+        modificado = os.path.getmtime(os.path.join(caminho, ARQUIVO_METADADOS))
+        resultados = abrir(caminho, modificado)
+    except (OSError, ValueError) as erro:
+        st.error(str(erro))
+        return
+
+    st.write(f"{len(resultados):,} cenários × {resultados.horizonte} meses, gravados em "
+             f"{resultados.metadados['criado_em']}")
+    serie = st.selectbox("Série", list(resultados.series), key=f"serie_resultados_{tipo}")
+    cenarios = _filtro(resultados, tipo)
+    if cenarios is not None:
+        st.write(f"{len(cenarios):,} cenários no filtro")
+        if not len(cenarios):
+            return
+
+    with etapa("faixas_resultados"):
+        bandas = faixas(caminho, modificado, serie, cenarios)
+    fig_faixas = go.Figure()
+    for baixo, alto, opacidade in (('P5', 'P95', 0.15), ('P25', 'P75', 0.3)):
+        fig_faixas.add_trace(go.Scatter(x=bandas['Mês'], y=bandas[alto], mode='lines', line=dict(width=0),
+                                        showlegend=False, hoverinfo='skip'))
+        fig_faixas.add_trace(go.Scatter(x=bandas['Mês'], y=bandas[baixo], mode='lines', line=dict(width=0),
+                                        fill='tonexty', fillcolor=f'rgba(31, 119, 180, {opacidade})',
+                                        name=f"{baixo}-{alto}"))
+    fig_faixas.add_trace(go.Scatter(x=bandas['Mês'], y=bandas['P50'], mode='lines', name='Mediana'))
+    fig_faixas.update_layout(xaxis_title='Mês', yaxis_title=serie)
+    painel_desempenho.exibir_plotly(fig_faixas, "faixas_resultados", use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        maximo = len(resultados) - 1 if cenarios is None else len(cenarios) - 1
+        posicao = st.number_input("Cenário", min_value=0, max_value=maximo, value=0, step=1,
+                                  key=f"cenario_resultados_{tipo}")
+        indice = int(posicao) if cenarios is None else int(cenarios[int(posicao)])
+        cenario = resultados.cenario(indice)
+        st.dataframe(resultados.parametros.iloc[[indice]], hide_index=True)
+        fig_cenario = adicionar_linhas(go.Figure(), [(cenario['Mês'], cenario[serie], dict(mode='lines', name=serie))])
+        fig_cenario.update_layout(xaxis_title='Mês', yaxis_title=serie)
+        painel_desempenho.exibir_plotly(fig_cenario, "cenario_resultados", use_container_width=True)
+    with col2:
+        mes = st.slider("Mês", min_value=1, max_value=resultados.horizonte, value=1, key=f"mes_resultados_{tipo}")
+        valores = resultados.mes(mes, cenarios)[serie].dropna()
+        st.write(f"{len(valores):,} cenários ativos no mês {mes}")
+        contagem, bordas = np.histogram(valores, bins=40)
+        fig_mes = go.Figure(go.Bar(x=(bordas[:-1] + bordas[1:]) / 2, y=contagem, name=serie))
+        fig_mes.update_layout(xaxis_title=serie, yaxis_title='Cenários', bargap=0)
+        painel_desempenho.exibir_plotly(fig_mes, "mes_resultados", use_container_width=True)
@@ -0,0 +1,87 @@
+import uuid
+
+import streamlit as st
+
+from constructa.tarefas import CANCELADA, CONCLUIDA, GerenciadorTarefas, chave_tarefa
+
+# Intervalo, em segundos, entre as atualizações do andamento de uma tarefa em execução
+INTERVALO_ATUALIZACAO = 1.0
+# Tarefas que terminam dentro desta espera são desenhadas direto, sem barra de progresso
+ESPERA_INICIAL = 0.3
+
+
+@st.cache_resource
+def gerenciador():
+    # Um pool por processo, compartilhado pelas sessões: resultados iguais são reaproveitados
+    return GerenciadorTarefas()
+
+
+def _sessao():
+    # Identifica a sessão do navegador entre os assinantes das tarefas compartilhadas
+    if 'sessao_tarefas' not in st.session_state:
+        st.session_state.sessao_tarefas = uuid.uuid4().hex
+    return st.session_state.sessao_tarefas
+
+
+def _canceladas():
+    # Chaves das tarefas que esta sessão cancelou, mesmo que outra sessão as mantenha rodando
+    return st.session_state.setdefault('tarefas_canceladas', set())
+
+
+def cancelar(tarefa):
+    # Só esta sessão desiste: a tarefa para quando nenhuma outra sessão que a submeteu a quiser mais
+    tarefa.cancelar(_sessao())
+    _canceladas().add(tarefa.chave)
+
+
+def obter(nome, *args, **kwargs):
+    return gerenciador().obter(nome, *args, **kwargs)
+
+
+def submeter(vaga, nome, funcao, *args, **kwargs):
+    # vaga: chave do session_state com a tarefa atual daquele ponto da página (ou None); uma tarefa
+    # nova na mesma vaga cancela a anterior que ainda estiver rodando, e uma tarefa cancelada pelo
+    # usuário só volta a rodar quando os argumentos mudam
+    chave = chave_tarefa(nome, args, kwargs)
+    anterior = st.session_state.get(vaga) if vaga is not None else None
+    if anterior is not None and anterior.chave == chave and chave in _canceladas():
+        return anterior
+    tarefa = gerenciador().submeter(nome, funcao, *args, **kwargs)
+    while not tarefa.assinar(_sessao()):
+        # Cancelada pelas outras sessões entre a busca e a assinatura: o gerenciador cria outra
+        tarefa = gerenciador().submeter(nome, funcao, *args, **kwargs)
+    _canceladas().discard(chave)
+    if vaga is not None:
+        if anterior is not None and anterior is not tarefa and not anterior.terminada:
+            cancelar(anterior)
+        st.session_state[vaga] = tarefa
+    return tarefa
+
+
+def acompanhar(tarefa, mostrar, rotulo=None):
+    # mostrar(valor, final): desenha o resultado parcial durante a execução e o final ao terminar
+    if tarefa is None:
+        return
+    if tarefa.chave in _canceladas():
+        st.info(f"{rotulo or tarefa.nome}: cancelada")
+        return
+    if tarefa.aguardar(ESPERA_INICIAL):
+        if tarefa.estado == CONCLUIDA:
+            mostrar(tarefa.resultado, True)
+        elif tarefa.estado == CANCELADA:
+            st.info(f"{rotulo or tarefa.nome}: cancelada")
+        else:
+            st.error(str(tarefa.erro))
+        return
+
+    # Só este trecho é reexecutado a cada intervalo; ao terminar, a página inteira é redesenhada
+    @st.fragment(run_every=INTERVALO_ATUALIZACAO)
+    def andamento():
+        if tarefa.terminada or tarefa.chave in _canceladas():
+            st.rerun()
+        st.progress(tarefa.progresso, text=f"{rotulo or tarefa.nome}: {tarefa.progresso:.0%}")
+        st.button("Cancelar", key=f"cancelar_{id(tarefa)}", on_click=cancelar, args=(tarefa,))
+        if tarefa.parcial is not None:
+            mostrar(tarefa.parcial, False)
+
+    andamento()
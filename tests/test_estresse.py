@@ -0,0 +1,21 @@
+from constructa.estresse import BASE_PADRAO, executar_pacote, montar_pacote
+
+
+def test_cenario_sem_nome_recebe_nome_padrao():
+    pacote = montar_pacote([{'cenario': 'Base'}, {'cenario': None, 'sobrecusto': 10}, {'cenario': ' ', 'queda_agio': 50}])
+    assert pacote['cenario'].tolist() == ['Base', 'Cenário 2', 'Cenário 3']
+    assert pacote['sobrecusto'].tolist() == [0.0, 10.0, 0.0]
+
+
+def test_dropdowns_adiados_alem_do_prazo_sao_contados():
+    # A cota (240 meses) e a saída (prazo 200) seguem a mesma regra: o dropdown adiado para depois
+    # do prazo não é feito nem fundido no último mês, e aparece nos indicadores
+    base = dict(BASE_PADRAO,
+                cota=dict(BASE_PADRAO['cota'], dropdowns={12: 500_000.0, 235: 100_000.0}),
+                saida=dict(BASE_PADRAO['saida'], estrategia=[(12, 100_000.0, 20.0), (195, 50_000.0, 20.0)]))
+    resultado = executar_pacote(base, [{'cenario': 'Base'}, {'cenario': 'Atraso', 'atraso_vendas': 12}], processos=1)
+    assert resultado['dropdowns_fora_cota'].tolist() == [0, 1]
+    assert resultado['dropdowns_fora_saida'].tolist() == [0, 1]
+    # Só o dropdown de 50 mil (ágio de 20%) sai da saída
+    impacto = resultado['impacto_saida'].to_numpy()
+    assert impacto[0] - impacto[1] == 60_000.0
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from constructa.fluxo import SERIES_FLUXO, calcular_fluxo_auto_financiado, calcular_fluxos_lote
+
+
+# Fórmula original de cenarios.py, copiada do código anterior ao motor em lote; a única mudança é
+# Receitas começar em 0.0, porque o pandas 3 não aceita somar floats a uma coluna inteira
+def original_cenarios(vgv, custo_construcao, prazo_meses,
+                      percentual_inicio, percentual_meio, percentual_fim,
+                      percentual_lancamento, percentual_baloes, percentual_parcelas,
+                      prazo_parcelas):
+    fluxo = pd.DataFrame(index=range(prazo_meses), columns=['Mês', 'Receitas', 'Custos', 'Saldo Mensal', 'Saldo Acumulado'])
+
+    custos = np.zeros(prazo_meses)
+    tercio_obra = prazo_meses // 3
+    custos[:tercio_obra] = custo_construcao * percentual_inicio / 100 / tercio_obra
+    custos[tercio_obra:2*tercio_obra] = custo_construcao * percentual_meio / 100 / tercio_obra
+    custos[2*tercio_obra:] = custo_construcao * percentual_fim / 100 / (prazo_meses - 2*tercio_obra)
+    fluxo['Custos'] = custos
+
+    fluxo['Receitas'] = 0.0
+    fluxo.loc[0, 'Receitas'] += vgv * percentual_lancamento / 100
+
+    valor_baloes = vgv * percentual_baloes / 100
+    num_baloes = 3
+    for i in range(1, num_baloes + 1):
+        mes_balao = i * prazo_meses // (num_baloes + 1)
+        fluxo.loc[mes_balao, 'Receitas'] += valor_baloes / num_baloes
+
+    valor_parcelas = vgv * percentual_parcelas / 100
+    parcela_mensal = valor_parcelas / min(prazo_parcelas, prazo_meses)
+    fluxo.loc[:min(prazo_parcelas, prazo_meses)-1, 'Receitas'] += parcela_mensal
+
+    fluxo['Saldo Mensal'] = fluxo['Receitas'] - fluxo['Custos']
+    fluxo['Saldo Acumulado'] = fluxo['Saldo Mensal'].cumsum()
+
+    fluxo['Mês'] = range(1, prazo_meses + 1)
+
+    return fluxo
+
+
+PROJETOS = [
+    (35.0, 24.5, 48, 30, 40, 30, 20, 30, 50, 48),
+    (35.0, 24.5, 48, 30, 40, 30, 20, 30, 50, 24),
+    (120.0, 78.0, 37, 25, 50, 25, 10, 40, 50, 60),
+    (8.0, 6.4, 12, 40, 40, 20, 100, 0, 0, 12),
+    (500.0, 350.0, 601, 20, 30, 50, 15, 25, 60, 120),
+]
+
+
+@pytest.mark.parametrize('projeto', PROJETOS)
+def test_fluxo_reproduz_formula_original(projeto):
+    esperado = original_cenarios(*projeto)
+    obtido = calcular_fluxo_auto_financiado(*projeto)
+    np.testing.assert_array_equal(obtido['Mês'], esperado['Mês'].astype(np.int64))
+    for serie in SERIES_FLUXO:
+        np.testing.assert_array_equal(obtido[serie].to_numpy(), esperado[serie].to_numpy(dtype=np.float64))
+
+
+def test_lote_igual_a_projetos_avulsos():
+    # Projetos de prazos diferentes no mesmo lote: meses além do prazo ficam zerados
+    colunas = [np.array(valores) for valores in zip(*PROJETOS)]
+    fluxos = calcular_fluxos_lote(*colunas)
+    for linha, projeto in enumerate(PROJETOS):
+        esperado = original_cenarios(*projeto)
+        prazo = projeto[2]
+        for serie in SERIES_FLUXO:
+            np.testing.assert_array_equal(fluxos[serie][linha, :prazo], esperado[serie].to_numpy(dtype=np.float64))
+        assert not fluxos['Saldo Mensal'][linha, prazo:].any()
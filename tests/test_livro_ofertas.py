@@ -0,0 +1,26 @@
+import io
+
+from constructa.livro_ofertas import LivroOfertas, ler_ordens, reproduzir_ordens, simular_mercado
+
+
+def test_id_repetido_e_rejeitado():
+    # O id 1 ainda está no livro na segunda linha; depois do cancelamento ele volta a valer
+    csv = "tipo,id,agio,credito\ncompra,1,10,100\ncompra,1,11,100\nvenda,2,30,50\ncancelar,1,,\ncompra,1,12,100\n"
+    resultado = simular_mercado(ler_ordens(io.StringIO(csv)))
+    assert resultado['rejeitadas'] == 1
+    assert resultado['em_aberto'] == 2
+
+
+def test_livro_vazio_do_chamador_e_usado():
+    livro = LivroOfertas()
+    ordens = ler_ordens(io.StringIO("tipo,agio,credito\ncompra,10,100\n"))
+    assert reproduzir_ordens(ordens, livro=livro) is livro
+    assert len(livro) == 1
+
+
+def test_ids_automaticos_nao_colidem_com_explicitos():
+    livro = LivroOfertas()
+    livro.enviar('compra', 10.0, 100.0, id=0)
+    livro.enviar('compra', 10.0, 100.0, id=5)
+    automatico, _ = livro.enviar('compra', 10.0, 100.0)
+    assert automatico == 6 and len(livro) == 3
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from constructa import monte_carlo
+from constructa.regras import PLANOS
+
+# Índice quase sempre em 5% a.a. com um ano raro de 200%: o bloco piloto não o sorteia, então as
+# caudas dos demais blocos caem fora das faixas do histograma
+FATORES = np.r_[np.full(199, 1.05), 3.0]
+ARGUMENTOS = (500_000, 240, 0.0012, {24: 50_000, 60: 80_000}, FATORES, {'tipo': 'normal', 'media': 10, 'desvio': 15})
+NUM_CAMINHOS, TAMANHO_BLOCO = 5_000, 10
+
+
+def _caminhos():
+    sementes = np.random.SeedSequence(0).spawn(NUM_CAMINHOS // TAMANHO_BLOCO)
+    blocos = [monte_carlo._simular_caminhos(semente, TAMANHO_BLOCO, *ARGUMENTOS, PLANOS['finance_app'])
+              for semente in sementes]
+    return {indicador: np.concatenate([bloco[indicador] for bloco in blocos]) for indicador in monte_carlo.INDICADORES}
+
+
+@pytest.mark.parametrize("indicador", ['cet_total', 'ganho_arbitragem'])
+def test_caudas_fora_do_piloto(indicador):
+    risco = monte_carlo.simular_monte_carlo(*ARGUMENTOS, num_caminhos=NUM_CAMINHOS, tamanho_bloco=TAMANHO_BLOCO,
+                                            processos=1)
+    valores = _caminhos()[indicador]
+    contagem, bordas = risco[indicador]['histograma']
+    assert contagem.sum() == NUM_CAMINHOS
+    assert bordas[0] <= valores.min() and bordas[-1] >= valores.max()
+    # Dentro das faixas o percentil é interpolado: erro de até uma faixa; fora delas é exato
+    largura = np.diff(bordas)[1:-1].max()
+    for p in (1, 99):
+        exato = np.percentile(valores, p, method='inverted_cdf')
+        assert risco[indicador]['percentis'][p] == pytest.approx(exato, abs=largura)
+
+
+def test_caudas_limitadas(monkeypatch):
+    # As caudas guardam só os valores que os percentis pedidos podem ler: com mais caminhos fora das
+    # faixas que o buffer, ele não passa do limite e os percentis lidos nas caudas continuam exatos
+    juntar, caudas = monte_carlo._juntar_cauda, []
+
+    def espiar(cauda, nova, limite, menores):
+        caudas.append((*juntar(cauda, nova, limite, menores), limite))
+        return caudas[-1][:2]
+
+    monkeypatch.setattr(monte_carlo, '_juntar_cauda', espiar)
+    risco = monte_carlo.simular_monte_carlo(*ARGUMENTOS, num_caminhos=NUM_CAMINHOS, tamanho_bloco=TAMANHO_BLOCO,
+                                            processos=1)
+    assert all(valores.size <= limite for _, valores, limite in caudas)
+    assert max(quantidade - limite for quantidade, _, limite in caudas) > 0
+    caminhos = _caminhos()
+    for indicador in ('cet_total', 'ganho_arbitragem'):
+        _, bordas = risco[indicador]['histograma']
+        for p in (1, 99):
+            valor = risco[indicador]['percentis'][p]
+            if valor < bordas[1] or valor > bordas[-2]:
+                assert valor == np.percentile(caminhos[indicador], p, method='inverted_cdf')
+
+
+def test_agio_triangular_sem_largura():
+    # Mínimo = moda = máximo (o formulário de finance_app.py permite) vira ágio constante
+    rng = np.random.default_rng(0)
+    distribuicao = {'tipo': 'triangular', 'minimo': 25.0, 'moda': 25.0, 'maximo': 25.0}
+    assert np.array_equal(monte_carlo.sortear_agio(rng, distribuicao, 4), np.full(4, 25.0))
+    risco = monte_carlo.simular_monte_carlo(*ARGUMENTOS[:5], distribuicao, num_caminhos=20, tamanho_bloco=10,
+                                            processos=1)
+    assert risco['num_caminhos'] == 20
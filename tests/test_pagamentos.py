@@ -0,0 +1,189 @@
+import numpy as np
+import pytest
+
+from constructa.metricas import fluxos_cota
+from constructa.pagamentos import (_calculate_payments_laco, calculate_payments, calculate_payments_batch,
+                                   empacotar_dropdowns)
+from constructa.regras import PLANOS
+
+
+# Fórmulas originais de finance_app.py e analise_dados.py, copiadas do código anterior ao motor
+def original_finance_app(principal, months, admin_fee, dropdowns, agio):
+    balance = principal
+    amortization = principal / months
+    payments = []
+    balances = [principal]
+    total_dropdown_value = 0
+    total_agio = 0
+
+    for month in range(1, months + 1):
+        if month % 12 == 0 and month > 1:
+            balance *= 1.05
+            amortization = balance / (months - month + 1)
+
+        if month in dropdowns:
+            dropdown_value = dropdowns[month]
+            agio_value = dropdown_value * (agio/100)
+            total_dropdown_value += dropdown_value
+            total_agio += agio_value
+            balance -= (dropdown_value + agio_value)
+            amortization = balance / (months - month + 1)
+
+        admin_fee_value = balance * admin_fee
+        monthly_payment = amortization + admin_fee_value
+
+        payments.append(monthly_payment)
+        balance -= amortization
+        balances.append(balance)
+
+        if balance <= 0 or monthly_payment < 500:
+            break
+
+    return payments, balances, total_dropdown_value, total_agio
+
+
+def original_analise_dados(principal, months, admin_fee, dropdowns, agio):
+    balance = principal
+    amortization = principal / months
+    payments = []
+    balances = [principal]
+
+    for month in range(1, months + 1):
+        if month % 12 == 0 and month > 1:
+            balance *= 1.05
+            amortization = balance / (months - month + 1)
+
+        admin_fee_value = balance * admin_fee
+        monthly_payment = amortization + admin_fee_value
+
+        if month in dropdowns:
+            dropdown_value = dropdowns[month]
+            dropdown_impact = dropdown_value * (1 + agio/100)
+            balance -= dropdown_impact
+            amortization = balance / (months - month + 1)
+
+        payments.append(monthly_payment)
+        balance -= amortization
+        balances.append(balance)
+
+        if balance <= 0 or monthly_payment < 500:
+            break
+
+    return payments, balances
+
+
+ORIGINAIS = {'finance_app': original_finance_app, 'analise_dados': original_analise_dados}
+
+# (principal, months, admin_fee, dropdowns, agio)
+CASOS = [
+    pytest.param(5_000_000, 240, 0.0012, {}, 25.0, id='sem-dropdowns'),
+    pytest.param(1_800_000, 210, 0.0012, {12: 200_000, 36: 150_000, 37: 50_000}, 25.0, id='dropdowns'),
+    pytest.param(5_000_000, 60, 0.0015, {24: 1_000_000}, 10.0, id='prazo-curto'),
+    # Dropdown deixa a parcela abaixo de R$ 500 com saldo ainda positivo: a cota é encerrada
+    pytest.param(500_000, 120, 0.0012, {12: 440_000}, 0.0, id='parcela-minima'),
+    # Dropdown maior que o saldo: quitação no próprio mês
+    pytest.param(500_000, 120, 0.0012, {30: 600_000, 60: 10_000}, 20.0, id='quitacao-por-dropdown'),
+    pytest.param(2_000_000, 360, 0.001, {12: 100_000, 24: 100_000, 300: 50_000}, 30.0, id='prazo-longo'),
+    # Dropdown que leva o saldo a zero: o laço deixa um resto de ~1e-12 e a quitação depende da
+    # ordem das subtrações (B - k*A daria zero exato e pararia um mês antes)
+    pytest.param(200_000, 12, 0.0012, {10: 40_000}, 25.0, id='saldo-zerado-prazo-curto'),
+    pytest.param(120_000, 180, 0.0012, {11: 90_666.67}, 25.0, id='saldo-zerado'),
+]
+
+
+def _lote(principal, months, admin_fee, dropdowns, agio, variante):
+    meses, valores = empacotar_dropdowns([dropdowns])
+    payments, balances, total_dropdown_value, total_agio, quitacao = calculate_payments_batch(
+        principal, months, admin_fee, meses, valores, agio, plano=PLANOS[variante])
+    q = int(quitacao[0])
+    return payments[0, :q].tolist(), balances[0, :q + 1].tolist(), total_dropdown_value[0], total_agio[0]
+
+
+@pytest.mark.parametrize('principal, months, admin_fee, dropdowns, agio', CASOS)
+@pytest.mark.parametrize('variante', list(PLANOS))
+def test_laco_reproduz_formula_original(variante, principal, months, admin_fee, dropdowns, agio):
+    esperado = ORIGINAIS[variante](principal, months, admin_fee, dropdowns, agio)
+    obtido = _calculate_payments_laco(principal, months, admin_fee, dropdowns, agio, PLANOS[variante])
+    assert obtido[0] == esperado[0]
+    assert obtido[1] == esperado[1]
+    if variante == 'finance_app':
+        assert obtido[2:] == esperado[2:]
+
+
+@pytest.mark.parametrize('principal, months, admin_fee, dropdowns, agio', CASOS)
+@pytest.mark.parametrize('variante', list(PLANOS))
+@pytest.mark.parametrize('motor', ['escalar', 'lote'])
+def test_motores_seguem_formula_original(motor, variante, principal, months, admin_fee, dropdowns, agio):
+    esperado = ORIGINAIS[variante](principal, months, admin_fee, dropdowns, agio)
+    if motor == 'escalar':
+        obtido = calculate_payments(principal, months, admin_fee, dropdowns, agio, PLANOS[variante])
+    else:
+        obtido = _lote(principal, months, admin_fee, dropdowns, agio, variante)
+    assert obtido[0] == esperado[0]
+    assert obtido[1] == esperado[1]
+    if variante == 'finance_app':
+        assert obtido[2:] == esperado[2:]
+
+
+@pytest.mark.parametrize('variante', list(PLANOS))
+def test_parada_por_parcela_minima(variante):
+    payments, balances, _, _ = calculate_payments(500_000, 120, 0.0012, {12: 440_000}, 0.0, PLANOS[variante])
+    # Em analise_dados.py a parcela do mês do dropdown ainda é a anterior a ele: para um mês depois
+    assert len(payments) == (12 if variante == 'finance_app' else 13)
+    assert balances[-1] > 0
+    assert payments[-1] < 500 <= min(payments[:-1])
+
+
+@pytest.mark.parametrize('variante', list(PLANOS))
+def test_agio_como_receita(variante):
+    # finance_app.py: Ganho na Arbitragem = crédito - (parcelas + dropdowns - ágio);
+    # analise_dados.py: o ágio só abate o saldo e não volta ao tomador
+    principal, months, admin_fee, dropdowns, agio = 1_800_000, 210, 0.0012, {12: 200_000, 36: 150_000}, 25.0
+    plano = PLANOS[variante]
+    payments, _, total_dropdown_value, total_agio = calculate_payments(principal, months, admin_fee, dropdowns,
+                                                                       agio, plano)
+    meses, valores = empacotar_dropdowns([dropdowns])
+    fluxos = fluxos_cota(principal, [payments], meses, valores, agio, plano['agio_como_receita'],
+                         quitacao=len(payments))
+    recebido = total_agio if plano['agio_como_receita'] else 0.0
+    assert total_agio == pytest.approx(sum(dropdowns.values()) * agio / 100)
+    assert fluxos.sum() == pytest.approx(principal - (sum(payments) + total_dropdown_value - recebido), rel=1e-12)
+
+
+def _cotas_aleatorias(n, plano, semente=0):
+    rng = np.random.default_rng(semente)
+    cotas = []
+    for _ in range(n):
+        principal = float(rng.uniform(50_000, 1_000_000))
+        months = int(rng.integers(6, 400))
+        admin_fee, agio = float(rng.uniform(0.0005, 0.002)), float(rng.uniform(0, 30))
+        if rng.random() < 0.5:
+            # Dropdowns até depois do prazo (nunca visitados) e grandes o bastante para quitar ou
+            # derrubar a parcela abaixo do mínimo
+            meses = rng.choice(np.arange(1, months + 21), size=int(rng.integers(0, 5)), replace=False)
+            dropdowns = {int(m): float(rng.uniform(0.01, 0.4) * principal) for m in meses}
+        else:
+            # Um dropdown que paga o saldo restante (em centavos), levando-o a zero ou quase
+            _, saldos, _, _ = _calculate_payments_laco(principal, months, admin_fee, {}, agio, plano)
+            mes = int(rng.integers(1, len(saldos)))
+            dropdowns = {mes: round(saldos[mes - 1] / (1 + agio / 100), 2)}
+        cotas.append((principal, months, admin_fee, dropdowns, agio))
+    return cotas
+
+
+@pytest.mark.parametrize("variante", list(PLANOS))
+def test_motores_seguem_laco(variante):
+    # O laço mensal é a referência: o motor por eventos e o lote fazem as mesmas operações na mesma
+    # ordem, então o resultado é igual bit a bit, inclusive o mês de quitação
+    cotas = _cotas_aleatorias(500, PLANOS[variante])
+    meses, valores = empacotar_dropdowns([dropdowns for _, _, _, dropdowns, _ in cotas])
+    principal, months, admin_fee, _, agio = (np.array(coluna) for coluna in zip(*cotas))
+    payments, balances, total_dropdown_value, total_agio, quitacao = calculate_payments_batch(
+        principal, months, admin_fee, meses, valores, agio, plano=PLANOS[variante])
+    for i, cota in enumerate(cotas):
+        esperado = _calculate_payments_laco(*cota, PLANOS[variante])
+        q = int(quitacao[i])
+        lote = (payments[i, :q].tolist(), balances[i, :q + 1].tolist(), total_dropdown_value[i], total_agio[i])
+        for obtido in (calculate_payments(*cota, PLANOS[variante]), lote):
+            assert obtido == esperado
+        assert np.isnan(payments[i, q:]).all()
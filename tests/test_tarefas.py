@@ -0,0 +1,52 @@
+import threading
+
+from constructa.tarefas import CANCELADA, CONCLUIDA, GerenciadorTarefas
+
+
+def _esperar(liberar, progresso):
+    # Informa o andamento até ser liberada, como os motores longos
+    while not liberar.wait(0.01):
+        progresso(0.5)
+    return 'ok'
+
+
+def test_cancelamento_por_assinante():
+    # Duas sessões com os mesmos argumentos dividem a tarefa; o Cancelar de uma não derruba a outra
+    gerenciador = GerenciadorTarefas(max_trabalhadores=1)
+    liberar = threading.Event()
+    tarefa = gerenciador.submeter('esperar', _esperar, liberar)
+    assert tarefa.assinar('a') and tarefa.assinar('b')
+    assert gerenciador.submeter('esperar', _esperar, liberar) is tarefa
+
+    assert not tarefa.cancelar('a')
+    assert not tarefa.cancelada
+    assert tarefa.cancelar('b')
+    assert tarefa.aguardar(5) and tarefa.estado == CANCELADA
+
+    # Cancelada, a tarefa não é reaproveitada: a próxima submissão roda de novo
+    nova = gerenciador.submeter('esperar', _esperar, liberar)
+    assert nova is not tarefa and nova.assinar('a')
+    liberar.set()
+    assert nova.aguardar(5) and nova.estado == CONCLUIDA and nova.resultado == 'ok'
+    gerenciador.encerrar()
+
+
+def test_cancelada_antes_de_parar_nao_e_reaproveitada():
+    gerenciador = GerenciadorTarefas(max_trabalhadores=1)
+    liberar = threading.Event()
+    tarefa = gerenciador.submeter('esperar', _esperar, liberar)
+    tarefa.cancelar()
+    assert not tarefa.assinar('a')
+    assert gerenciador.submeter('esperar', _esperar, liberar) is not tarefa
+    liberar.set()
+    gerenciador.encerrar()
+
+
+def test_aguardar_com_prazo_curto_em_tarefa_rodando():
+    gerenciador = GerenciadorTarefas(max_trabalhadores=1)
+    liberar = threading.Event()
+    tarefa = gerenciador.submeter('esperar', _esperar, liberar)
+    assert tarefa.aguardar(0.05) is False
+    liberar.set()
+    assert tarefa.aguardar(5) and tarefa.estado == CONCLUIDA
+    gerenciador.encerrar()